@@ -0,0 +1,371 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Annotated
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pymongo import AsyncMongoClient, MongoClient
+from app.api.cache import SnapshotCache, bypasses_cache, request_cache_key
+from app.api.config import (
+    MAX_PAGE_SIZE, MONGO_DB, MONGO_MAX_TIME_MS, MONGO_URI, NDJSON_BATCH_SIZE, mongo_client_options,
+)
+from app.api.http_cache import GZIP_LEVEL, GZIP_MIN_SIZE, SnapshotETagMiddleware
+from app.api.metrics import PROMETHEUS_CONTENT_TYPE, ApiMetrics, MetricsMiddleware
+from app.api.snapshots import SNAPSHOT_PATTERN, SnapshotCollections, snapshot_not_found
+from app.api.queries import (
+    ACTIVE_SUBSCRIPTIONS_FILTER, CHARGES_TOTALS_PIPELINE, CUSTOMER_LIST_PROJECTION, CUSTOMER_PROJECTION,
+    EMPTY_CHARGES_TOTALS,
+    FRAUD_SIGNALS_PROJECTION, MRR_PIPELINE, NDJSON_MEDIA_TYPE, SUBSCRIPTION_STATUS_PIPELINE, THREE_DS_FILTER,
+    TIMESERIES_GRANULARITIES, TIMESERIES_SOURCES, convert_objectid, customer_overview_pipeline,
+    SEARCH_QUERY_PATTERN, customer_search_query, json_default, page_query, parse_fields,
+    summary_from_totals, timeseries_pipeline, top_customers_pipeline,
+    wants_ndjson,
+)
+from scripts.fraud_scoring import (
+    DEFAULT_FRAUD_THRESHOLD, DEFAULT_FRAUD_WINDOW, FRAUD_SIGNALS_COLLECTION, FRAUD_WINDOWS, fraud_signals_query,
+    score_field,
+)
+from scripts.mongo_indexes import check_indexes
+from scripts.snapshot_meta import META_COLLECTION, SNAPSHOT_META_ID, SNAPSHOT_SETS_COLLECTION, collection_set_lookup
+
+# Variante asyncio de app/api/main.py : mêmes routes, mêmes requêtes, driver AsyncMongoClient.
+# Une agrégation lente n'occupe plus un worker du threadpool, seulement une connexion du pool.
+metrics = ApiMetrics()
+client = AsyncMongoClient(MONGO_URI, **mongo_client_options([metrics.mongo_commands]))
+db = client[MONGO_DB]
+cache = SnapshotCache()
+
+
+def verify_indexes():
+    # Vérification ponctuelle au démarrage : un client sync éphémère suffit
+    sync_client = MongoClient(MONGO_URI, **mongo_client_options())
+    try:
+        sync_db = sync_client[MONGO_DB]
+        meta = sync_db[META_COLLECTION].find_one({"_id": SNAPSHOT_META_ID}, {"collections": 1}) or {}
+        report = check_indexes(sync_db, meta.get("collections"))
+        if not report["ok"]:
+            print(f"⚠️ Index spec v{report['expected_version']} expected, missing: {report['missing']}")
+        return report
+    except Exception as e:
+        print(f"⚠️ Could not check MongoDB indexes: {e}")
+        return None
+    finally:
+        sync_client.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.index_report = await asyncio.to_thread(verify_indexes)
+    yield
+    await client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def current_version():
+    return await snapshot_version()
+
+
+# GZip au plus près des routes, ETag/304 en amont pour court-circuiter tout le reste
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+app.add_middleware(SnapshotETagMiddleware, version_getter=current_version)
+# Métriques en tout dernier (le plus à l'extérieur) : les 304 et la compression sont mesurés aussi
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+
+def ndjson_response(request: Request, cursor, headers=None) -> StreamingResponse:
+    async def generate():
+        lines = []
+        count = 0
+        async for doc in cursor.batch_size(NDJSON_BATCH_SIZE):
+            lines.append(json.dumps(convert_objectid(doc), default=json_default))
+            count += 1
+            if len(lines) >= NDJSON_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+        metrics.observe_documents(request, count)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+async def read_snapshot_metadata(projection=None):
+    return await db[META_COLLECTION].find_one({"_id": SNAPSHOT_META_ID}, projection)
+
+
+async def snapshot_version():
+    if cache.needs_version_check():
+        meta = await read_snapshot_metadata({"version": 1, "collections": 1}) or {}
+        cache.observe_version(meta.get("version"), meta.get("collections"))
+    return cache.version
+
+
+async def snapshot_collections(
+    snapshot: str | None = Query(None, pattern=SNAPSHOT_PATTERN),
+    as_of: datetime | None = None,
+) -> SnapshotCollections:
+    """Jeu lu par la route : le courant, ou un jeu conservé (?snapshot=v3, ?as_of=2025-06-01T00:00:00Z)."""
+    if snapshot is None and as_of is None:
+        await snapshot_version()
+        return SnapshotCollections(db, cache.collections)
+    query, sort = collection_set_lookup(snapshot, as_of)
+    entry = await db[SNAPSHOT_SETS_COLLECTION].find_one(query, sort=sort)
+    if entry is None:
+        raise snapshot_not_found(snapshot, as_of)
+    return SnapshotCollections(db, entry.get("collections"))
+
+
+Snapshot = Annotated[SnapshotCollections, Depends(snapshot_collections)]
+
+
+async def cached(request: Request, response: Response, compute):
+    """await compute() -> (body, headers) ; même cache versionné que l'API sync."""
+    if bypasses_cache(request):
+        body, headers = await compute()
+        response.headers.update(headers)
+        response.headers["X-Cache"] = "BYPASS"
+        return body
+    key = request_cache_key(await snapshot_version(), request)
+    found, value = cache.get(key)
+    if not found:
+        value = await compute()
+        cache.set(key, value)
+    body, headers = value
+    response.headers.update(headers)
+    response.headers["X-Cache"] = "HIT" if found else "MISS"
+    return body
+
+
+async def respond(request: Request, response: Response, make_cursor):
+    if wants_ndjson(request):
+        return ndjson_response(request, await make_cursor())
+
+    async def compute():
+        cursor = await make_cursor()
+        docs = [convert_objectid(doc) for doc in await cursor.to_list()]
+        metrics.observe_documents(request, len(docs))
+        return docs, {}
+    return await cached(request, response, compute)
+
+
+async def count_documents(collection, query: dict) -> int:
+    if not query:
+        return await collection.estimated_document_count(maxTimeMS=MONGO_MAX_TIME_MS)
+    return await collection.count_documents(query, maxTimeMS=MONGO_MAX_TIME_MS)
+
+
+async def aggregate(collection, pipeline: list):
+    return await collection.aggregate(pipeline, maxTimeMS=MONGO_MAX_TIME_MS)
+
+
+async def aggregate_first(collection, pipeline: list, default: dict) -> dict:
+    docs = await (await aggregate(collection, pipeline)).to_list(1)
+    return docs[0] if docs else default
+
+
+async def paginate(collection, query: dict, request: Request, response: Response, limit=None, after=None, fields=None):
+    def make_cursor():
+        if not (limit or after):
+            return collection.find(query, parse_fields(fields), max_time_ms=MONGO_MAX_TIME_MS)
+        cursor = collection.find(page_query(query, after), parse_fields(fields), max_time_ms=MONGO_MAX_TIME_MS)
+        cursor = cursor.sort("id", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    if wants_ndjson(request):
+        total = str(await count_documents(collection, query))
+        return ndjson_response(request, make_cursor(), headers={"X-Total-Count": total})
+
+    async def compute():
+        docs, total = await asyncio.gather(make_cursor().to_list(), count_documents(collection, query))
+        docs = [convert_objectid(doc) for doc in docs]
+        metrics.observe_documents(request, len(docs))
+        headers = {"X-Total-Count": str(total)}
+        if limit and len(docs) == limit:
+            headers["X-Next-Cursor"] = str(docs[-1]["id"])
+        return docs, headers
+
+    return await cached(request, response, compute)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/")
+async def root():
+    return {"status": "API is live"}
+
+@app.get("/ping-mongo")
+async def test_mongo():
+    try:
+        await db.command("ping")
+        return {"status": "MongoDB connection OK", "indexes": app.state.index_report}
+    except Exception as e:
+        return {"status": "FAILED", "error": str(e)}
+
+@app.get("/snapshot")
+async def get_snapshot():
+    return convert_objectid(await read_snapshot_metadata())
+
+@app.get("/snapshots")
+async def get_snapshot_sets():
+    # Jeux conservés (?snapshot=, ?as_of=), du plus récent au plus ancien
+    current = ((await read_snapshot_metadata({"collection_set": 1})) or {}).get("collection_set")
+    sets = await db[SNAPSHOT_SETS_COLLECTION].find({}, {"timings": 0}).sort("seq", -1).to_list()
+    return {"current": current, "sets": [convert_objectid(entry) for entry in sets]}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return cache.stats()
+
+@app.get("/charges/fraud")
+async def get_fraudulent_charges(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    window: str = Query(DEFAULT_FRAUD_WINDOW, pattern="^(" + "|".join(FRAUD_WINDOWS) + ")$"),
+    threshold: float = Query(DEFAULT_FRAUD_THRESHOLD, ge=0, le=100),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    # Scores calculés au chargement (scripts/fraud_scoring.py) : lecture indexée, triée par score
+    async def make_cursor():
+        return snap[FRAUD_SIGNALS_COLLECTION].find(
+            fraud_signals_query(window, threshold), FRAUD_SIGNALS_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS
+        ).sort(score_field(window), -1).limit(limit)
+    return await respond(request, response, make_cursor)
+
+@app.get("/subscriptions/active")
+async def get_active_subscriptions(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return await paginate(snap.subscriptions, ACTIVE_SUBSCRIPTIONS_FILTER, request, response, limit, after, fields)
+
+@app.get("/subscriptions")
+async def get_all_subscriptions(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return await paginate(snap.subscriptions, {}, request, response, limit, after, fields)
+
+@app.get("/charges")
+async def get_all_charges(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return await paginate(snap.charges, {}, request, response, limit, after, fields)
+
+async def find(collection, query: dict, projection=None):
+    return collection.find(query, projection, max_time_ms=MONGO_MAX_TIME_MS)
+
+@app.get("/payment_intents/3ds")
+async def get_3ds_payment_intents(request: Request, response: Response, snap: Snapshot):
+    return await respond(request, response, lambda: find(snap.payment_intents, THREE_DS_FILTER))
+
+@app.get("/customers")
+async def list_customers(request: Request, response: Response, snap: Snapshot):
+    return await respond(request, response, lambda: find(snap.customers, {}, CUSTOMER_LIST_PROJECTION))
+
+# Déclarée avant /customers/{customer_id}, sinon "search" serait pris pour un id
+@app.get("/customers/search")
+async def search_customers(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    q: str = Query(..., min_length=1, max_length=100, pattern=SEARCH_QUERY_PATTERN),
+    limit: int = Query(20, ge=1, le=100),
+):
+    async def make_cursor():
+        cursor = await find(snap.customers, customer_search_query(q), CUSTOMER_LIST_PROJECTION)
+        return cursor.sort("id", 1).limit(limit)
+    return await respond(request, response, make_cursor)
+
+@app.get("/customers/{customer_id}")
+async def get_customer(customer_id: str, request: Request, response: Response, snap: Snapshot):
+    async def compute():
+        result = await snap.customers.find_one({"id": customer_id}, CUSTOMER_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS)
+        return convert_objectid(result), {}
+    return await cached(request, response, compute)
+
+@app.get("/customers/{customer_id}/overview")
+async def get_customer_overview(
+    customer_id: str, request: Request, response: Response, snap: Snapshot, limit: int = Query(10, ge=1, le=100)
+):
+    async def compute():
+        pipeline = customer_overview_pipeline(customer_id, limit, snap.collections)
+        return await aggregate_first(snap.customers, pipeline, None), {}
+    return await cached(request, response, compute)
+
+async def compute_mrr(snap: SnapshotCollections):
+    result = await aggregate_first(snap.subscriptions, MRR_PIPELINE, {"mrr": 0})
+    return round(result["mrr"], 2)
+
+@app.get("/stats/summary")
+async def get_summary_stats(request: Request, response: Response, snap: Snapshot):
+    async def compute():
+        # Les quatre requêtes sont indépendantes : elles partent en parallèle sur le pool
+        totals, customers, active_subscriptions, mrr = await asyncio.gather(
+            aggregate_first(snap.charges, CHARGES_TOTALS_PIPELINE, EMPTY_CHARGES_TOTALS),
+            snap.customers.estimated_document_count(maxTimeMS=MONGO_MAX_TIME_MS),
+            count_documents(snap.subscriptions, ACTIVE_SUBSCRIPTIONS_FILTER),
+            compute_mrr(snap),
+        )
+        return summary_from_totals(customers, active_subscriptions, totals, mrr), {}
+    return await cached(request, response, compute)
+
+@app.get("/stats/revenue/top")
+async def get_top_customers_by_revenue(
+    request: Request, response: Response, snap: Snapshot, limit: int = Query(5, ge=1, le=100)
+):
+    async def compute():
+        return await (await aggregate(snap.charges, top_customers_pipeline(limit))).to_list(), {}
+    return await cached(request, response, compute)
+
+@app.get("/stats/mrr")
+async def get_mrr(request: Request, response: Response, snap: Snapshot):
+    async def compute():
+        return {"mrr": await compute_mrr(snap)}, {}
+    return await cached(request, response, compute)
+
+@app.get("/stats/subscriptions/status")
+async def get_subscription_status_counts(request: Request, response: Response, snap: Snapshot):
+    async def compute():
+        docs = await (await aggregate(snap.subscriptions, SUBSCRIPTION_STATUS_PIPELINE)).to_list()
+        return {doc["_id"]: doc["count"] for doc in docs}, {}
+    return await cached(request, response, compute)
+
+@app.get("/stats/timeseries")
+async def get_timeseries(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    granularity: str = Query("day", pattern="^(" + "|".join(TIMESERIES_GRANULARITIES) + ")$"),
+    source: str = Query("charges", pattern="^(" + "|".join(TIMESERIES_SOURCES) + ")$"),
+    status: str | None = None,
+    customer_id: str | None = None,
+):
+    # Une ligne par tranche [start, end[ : le coût suit le nombre de tranches, pas la taille de charges
+    async def compute():
+        pipeline = timeseries_pipeline(source, granularity, start, end, status, customer_id)
+        buckets = await (await aggregate(snap[source], pipeline)).to_list()
+        return {"source": source, "granularity": granularity, "buckets": buckets}, {}
+    return await cached(request, response, compute)
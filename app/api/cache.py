@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Cache LRU/TTL en mémoire des réponses, indexé sur la version du snapshot Mongo
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 256))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 600))
+# Budget mémoire (taille JSON des réponses) : une liste non paginée peut peser des dizaines de Mo.
+# CACHE_MAX_ENTRIES=0 ou CACHE_MAX_BYTES=0 désactive le cache.
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 ** 2))
+# Fréquence maximale de lecture de _meta.snapshot pour détecter un nouveau chargement
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", 5))
+
+
+class SnapshotCache:
+    """
+    Les clés incluent la version du snapshot : dès qu'une nouvelle version est observée,
+    toutes les entrées sont purgées. Borné en nombre d'entrées et en octets (LRU), et en durée (TTL).
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, poll_seconds=None, max_bytes=None):
+        self.max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.poll_seconds = SNAPSHOT_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = None
+            # Collections physiques du jeu courant, lues avec la version
+            self.collections = {}
+            self.checked_at = None
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def needs_version_check(self) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.poll_seconds
+
+    def observe_version(self, version, collections: dict = None):
+        with self._lock:
+            self.checked_at = time.monotonic()
+            self.collections = collections or {}
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.bytes = 0
+                self.version = version
+
+    def get(self, key):
+        """Renvoie (trouvé, valeur)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def set(self, key, value):
+        if not self.enabled():
+            return
+        size = len(json.dumps(value, default=str))
+        with self._lock:
+            # Résultat calculé pendant un changement de version, ou plus gros que tout le budget : pas gardé
+            if key[0] != self.version or size > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def bypasses_cache(request) -> bool:
+    """Cache-Control: no-cache : réponse recalculée et non mémorisée (load tests, benchmarks)."""
+    return "no-cache" in request.headers.get("cache-control", "")
+
+
+def request_cache_key(version, request) -> tuple:
+    return (version, request.url.path, tuple(sorted(request.query_params.multi_items())))
@@ -0,0 +1,38 @@
+import os
+import certifi
+
+ENV = os.getenv("ENV", "DEV").upper()
+
+# MongoDB connection
+if ENV == "DEV":
+    MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+elif ENV == "PROD":
+    MONGO_URI = os.getenv("MONGO_URI")
+
+MONGO_DB = os.getenv("MONGO_DB", "supabase_snapshot")
+
+# Pool de connexions et timeouts, partagés par l'API sync et l'API async
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+# Budget serveur de chaque requête (maxTimeMS) : une agrégation lente est coupée côté Mongo
+MONGO_MAX_TIME_MS = int(os.getenv("MONGO_MAX_TIME_MS", 10000))
+
+# Crée les index manquants au démarrage plutôt que de seulement les signaler
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "false").lower() == "true"
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+# Streaming NDJSON (Accept: application/x-ndjson) : documents lus et écrits par paquets
+NDJSON_BATCH_SIZE = int(os.getenv("NDJSON_BATCH_SIZE", 500))
+
+
+def mongo_client_options(event_listeners=()) -> dict:
+    # event_listeners : listeners PyMongo (monitoring), ex. la latence des commandes pour /metrics
+    return {
+        "event_listeners": list(event_listeners),
+        "tlsCAFile": certifi.where(),
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
@@ -0,0 +1,70 @@
+import os
+import hashlib
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+# Réponses plus petites que ce seuil envoyées telles quelles (GZipMiddleware)
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+
+# Routes dont la réponse ne dépend pas uniquement du snapshot ; /snapshot et /snapshots changent à chaque
+# activation (activated_at, jeu courant) alors qu'un rollback remet en place une version déjà servie
+ETAG_EXCLUDED_PATHS = {
+    "/", "/ping-mongo", "/cache/stats", "/metrics", "/docs", "/openapi.json", "/redoc", "/snapshot", "/snapshots",
+}
+
+
+def compute_etag(version: str, request) -> str:
+    """
+    ETag fort : même version de snapshot + mêmes paramètres => mêmes octets.
+    Accept et Accept-Encoding en font partie (NDJSON vs JSON, gzip vs identité).
+    """
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    parts = [
+        version,
+        request.url.path,
+        "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items())),
+        request.headers.get("accept", ""),
+        "gzip" if accepts_gzip else "identity",
+    ]
+    return '"' + hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class SnapshotETagMiddleware(BaseHTTPMiddleware):
+    """
+    Répond 304 à un GET conditionnel (If-None-Match) tant que le snapshot n'a pas changé,
+    sans exécuter la requête Mongo ni sérialiser la réponse.
+    version_getter : coroutine renvoyant la version courante du snapshot (ou None).
+    """
+
+    def __init__(self, app, version_getter):
+        super().__init__(app)
+        self.version_getter = version_getter
+
+    async def dispatch(self, request, call_next):
+        if request.method not in ("GET", "HEAD") or request.url.path in ETAG_EXCLUDED_PATHS:
+            return await call_next(request)
+
+        try:
+            version = await self.version_getter()
+        except Exception:
+            version = None
+        if not version:
+            return await call_next(request)
+
+        etag = compute_etag(version, request)
+        headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
@@ -1,28 +1,202 @@
-from fastapi import FastAPI
+import json
+from datetime import datetime
+from typing import Annotated
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pymongo import MongoClient
-from bson import ObjectId
-import os
-import certifi
+from app.api.cache import SnapshotCache, bypasses_cache, request_cache_key
+from app.api.config import (
+    ENSURE_INDEXES, MAX_PAGE_SIZE, MONGO_DB, MONGO_MAX_TIME_MS, MONGO_URI, NDJSON_BATCH_SIZE,
+    mongo_client_options,
+)
+from app.api.http_cache import GZIP_LEVEL, GZIP_MIN_SIZE, SnapshotETagMiddleware
+from app.api.metrics import PROMETHEUS_CONTENT_TYPE, ApiMetrics, MetricsMiddleware
+from app.api.snapshots import SNAPSHOT_PATTERN, SnapshotCollections, snapshot_not_found
+from app.api.queries import (
+    ACTIVE_SUBSCRIPTIONS_FILTER, CHARGES_TOTALS_PIPELINE, CUSTOMER_LIST_PROJECTION, CUSTOMER_PROJECTION,
+    EMPTY_CHARGES_TOTALS,
+    FRAUD_SIGNALS_PROJECTION, MRR_PIPELINE, NDJSON_MEDIA_TYPE, SUBSCRIPTION_STATUS_PIPELINE, THREE_DS_FILTER,
+    TIMESERIES_GRANULARITIES, TIMESERIES_SOURCES, convert_objectid, customer_overview_pipeline,
+    SEARCH_QUERY_PATTERN, customer_search_query, json_default, page_query, parse_fields,
+    summary_from_totals, timeseries_pipeline, top_customers_pipeline,
+    wants_ndjson,
+)
+from scripts.fraud_scoring import (
+    DEFAULT_FRAUD_THRESHOLD, DEFAULT_FRAUD_WINDOW, FRAUD_SIGNALS_COLLECTION, FRAUD_WINDOWS, fraud_signals_query,
+    score_field,
+)
+from scripts.mongo_indexes import INDEXES, apply_indexes, check_indexes, record_index_version
+from scripts.snapshot_meta import find_collection_set, list_collection_sets, read_snapshot_metadata
 
-app = FastAPI()
+metrics = ApiMetrics()
+client = MongoClient(MONGO_URI, **mongo_client_options([metrics.mongo_commands]))
+db = client[MONGO_DB]
+cache = SnapshotCache()
 
-ENV = os.getenv("ENV", "DEV").upper()
 
-# MongoDB connection
-if ENV == "DEV":
-    MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-elif ENV == "PROD":
-    MONGO_URI = os.getenv("MONGO_URI")
+def verify_indexes():
+    try:
+        collections = (read_snapshot_metadata(db, {"collections": 1}) or {}).get("collections")
+        report = check_indexes(db, collections)
+    except Exception as e:
+        print(f"⚠️ Could not check MongoDB indexes: {e}")
+        return None
+
+    if not report["ok"]:
+        print(
+            f"⚠️ Index spec v{report['expected_version']} expected, "
+            f"v{report['applied_version']} applied; missing: {report['missing']}"
+        )
+        if ENSURE_INDEXES:
+            snap = SnapshotCollections(db, collections)
+            for collection_name in INDEXES:
+                if snap.name(collection_name) in db.list_collection_names():
+                    apply_indexes(db, collection_name, snap.name(collection_name))
+            record_index_version(db)
+            print("🗂️ Missing indexes created.")
+            report = check_indexes(db, collections)
+    return report
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.index_report = verify_indexes()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def current_version():
+    return await run_in_threadpool(snapshot_version)
+
+
+# GZip au plus près des routes, ETag/304 en amont pour court-circuiter tout le reste
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+app.add_middleware(SnapshotETagMiddleware, version_getter=current_version)
+# Métriques en tout dernier (le plus à l'extérieur) : les 304 et la compression sont mesurés aussi
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+
+def ndjson_response(request: Request, cursor, headers=None) -> StreamingResponse:
+    """Écrit le curseur ligne par ligne au fil des batches Mongo, sans matérialiser la liste."""
+    def generate():
+        lines = []
+        count = 0
+        for doc in cursor.batch_size(NDJSON_BATCH_SIZE):
+            lines.append(json.dumps(convert_objectid(doc), default=json_default))
+            count += 1
+            if len(lines) >= NDJSON_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+        metrics.observe_documents(request, count)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def snapshot_version():
+    # Lecture de _meta throttlée : une nouvelle version purge le cache
+    if cache.needs_version_check():
+        meta = read_snapshot_metadata(db, {"version": 1, "collections": 1}) or {}
+        cache.observe_version(meta.get("version"), meta.get("collections"))
+    return cache.version
+
+
+def snapshot_collections(
+    snapshot: str | None = Query(None, pattern=SNAPSHOT_PATTERN),
+    as_of: datetime | None = None,
+) -> SnapshotCollections:
+    """Jeu lu par la route : le courant, ou un jeu conservé (?snapshot=v3, ?as_of=2025-06-01T00:00:00Z)."""
+    if snapshot is None and as_of is None:
+        snapshot_version()
+        return SnapshotCollections(db, cache.collections)
+    entry = find_collection_set(db, snapshot, as_of)
+    if entry is None:
+        raise snapshot_not_found(snapshot, as_of)
+    return SnapshotCollections(db, entry.get("collections"))
+
+
+Snapshot = Annotated[SnapshotCollections, Depends(snapshot_collections)]
+
+
+def cached(request: Request, response: Response, compute):
+    """compute() -> (body, headers) ; résultat mémorisé par version de snapshot + paramètres."""
+    if bypasses_cache(request):
+        body, headers = compute()
+        response.headers.update(headers)
+        response.headers["X-Cache"] = "BYPASS"
+        return body
+    key = request_cache_key(snapshot_version(), request)
+    found, value = cache.get(key)
+    if not found:
+        value = compute()
+        cache.set(key, value)
+    body, headers = value
+    response.headers.update(headers)
+    response.headers["X-Cache"] = "HIT" if found else "MISS"
+    return body
 
-#client = MongoClient(MONGO_URI)
-client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
-db = client["supabase_snapshot"]
 
-def convert_objectid(doc):
-    if not doc:
-        return doc
-    doc["_id"] = str(doc["_id"])
-    return doc
+def respond(request: Request, response: Response, make_cursor):
+    if wants_ndjson(request):
+        return ndjson_response(request, make_cursor())
+
+    def compute():
+        docs = [convert_objectid(doc) for doc in make_cursor()]
+        metrics.observe_documents(request, len(docs))
+        return docs, {}
+    return cached(request, response, compute)
+
+
+def count_documents(collection, query: dict) -> int:
+    # Sans filtre, les métadonnées de la collection suffisent
+    if not query:
+        return collection.estimated_document_count(maxTimeMS=MONGO_MAX_TIME_MS)
+    return collection.count_documents(query, maxTimeMS=MONGO_MAX_TIME_MS)
+
+
+def aggregate(collection, pipeline: list):
+    return collection.aggregate(pipeline, maxTimeMS=MONGO_MAX_TIME_MS)
+
+
+def paginate(collection, query: dict, request: Request, response: Response, limit=None, after=None, fields=None):
+    """
+    Pagination par clé sur "id" : ?limit=N renvoie N documents triés par id,
+    et l'en-tête X-Next-Cursor donne la valeur à passer dans ?after= pour la page suivante.
+    X-Total-Count porte le nombre total de documents correspondant au filtre.
+    En NDJSON, X-Next-Cursor n'est pas connu avant la fin : c'est l'id de la dernière ligne.
+    """
+    def make_cursor():
+        if not (limit or after):
+            return collection.find(query, parse_fields(fields), max_time_ms=MONGO_MAX_TIME_MS)
+        cursor = collection.find(page_query(query, after), parse_fields(fields), max_time_ms=MONGO_MAX_TIME_MS)
+        cursor = cursor.sort("id", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    if wants_ndjson(request):
+        total = str(count_documents(collection, query))
+        return ndjson_response(request, make_cursor(), headers={"X-Total-Count": total})
+
+    def compute():
+        docs = [convert_objectid(doc) for doc in make_cursor()]
+        metrics.observe_documents(request, len(docs))
+        headers = {"X-Total-Count": str(count_documents(collection, query))}
+        if limit and len(docs) == limit:
+            headers["X-Next-Cursor"] = str(docs[-1]["id"])
+        return docs, headers
+
+    return cached(request, response, compute)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.get("/")
 def root():
@@ -32,44 +206,159 @@ def root():
 def test_mongo():
     try:
         db.command("ping")
-        return {"status": "MongoDB connection OK"}
+        return {"status": "MongoDB connection OK", "indexes": app.state.index_report}
     except Exception as e:
         return {"status": "FAILED", "error": str(e)}
 
+@app.get("/snapshot")
+def get_snapshot():
+    return convert_objectid(read_snapshot_metadata(db))
+
+@app.get("/snapshots")
+def get_snapshot_sets():
+    # Jeux conservés (?snapshot=, ?as_of=), du plus récent au plus ancien
+    current = (read_snapshot_metadata(db, {"collection_set": 1}) or {}).get("collection_set")
+    return {"current": current, "sets": [convert_objectid(entry) for entry in list_collection_sets(db)]}
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
 @app.get("/charges/fraud")
-def get_fraudulent_charges():
-    pipeline = [
-        {"$match": {"amount": {"$gt": 1000}, "paid": True}},
-        {"$group": {"_id": "$payment_method", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
-        {"$match": {"count": {"$gt": 1}}},
-        {"$sort": {"total": -1}}
-    ]
-    return [convert_objectid(doc) for doc in db.charges.aggregate(pipeline)]
+def get_fraudulent_charges(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    window: str = Query(DEFAULT_FRAUD_WINDOW, pattern="^(" + "|".join(FRAUD_WINDOWS) + ")$"),
+    threshold: float = Query(DEFAULT_FRAUD_THRESHOLD, ge=0, le=100),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    # Scores calculés au chargement (scripts/fraud_scoring.py) : lecture indexée, triée par score
+    def make_cursor():
+        return snap[FRAUD_SIGNALS_COLLECTION].find(
+            fraud_signals_query(window, threshold), FRAUD_SIGNALS_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS
+        ).sort(score_field(window), -1).limit(limit)
+    return respond(request, response, make_cursor)
 
 @app.get("/subscriptions/active")
-def get_active_subscriptions():
-    return [convert_objectid(doc) for doc in db.subscriptions.find({"status": "active"})]
+def get_active_subscriptions(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return paginate(snap.subscriptions, ACTIVE_SUBSCRIPTIONS_FILTER, request, response, limit, after, fields)
 
 @app.get("/subscriptions")
-def get_all_subscriptions():
-    return [convert_objectid(doc) for doc in db.subscriptions.find({})]
+def get_all_subscriptions(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return paginate(snap.subscriptions, {}, request, response, limit, after, fields)
 
-@app.get("/charges")  
-def get_all_charges():
-    return [convert_objectid(doc) for doc in db.charges.find({})]
+@app.get("/charges")
+def get_all_charges(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    fields: str | None = None,
+):
+    return paginate(snap.charges, {}, request, response, limit, after, fields)
 
 @app.get("/payment_intents/3ds")
-def get_3ds_payment_intents():
-    return [convert_objectid(doc) for doc in db.payment_intents.find({
-        "payment_method_options.card.request_three_d_secure": "automatic"
-    })]
+def get_3ds_payment_intents(request: Request, response: Response, snap: Snapshot):
+    return respond(
+        request, response, lambda: snap.payment_intents.find(THREE_DS_FILTER, max_time_ms=MONGO_MAX_TIME_MS)
+    )
 
 @app.get("/customers")
-def list_customers():
-    cursor = db.customers.find({}, {"id": 1, "name": 1, "email": 1, "_id": 0})
-    return list(cursor)
+def list_customers(request: Request, response: Response, snap: Snapshot):
+    return respond(
+        request, response, lambda: snap.customers.find({}, CUSTOMER_LIST_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS)
+    )
+
+# Déclarée avant /customers/{customer_id}, sinon "search" serait pris pour un id
+@app.get("/customers/search")
+def search_customers(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    q: str = Query(..., min_length=1, max_length=100, pattern=SEARCH_QUERY_PATTERN),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return respond(request, response, lambda: snap.customers.find(
+        customer_search_query(q), CUSTOMER_LIST_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS
+    ).sort("id", 1).limit(limit))
 
 @app.get("/customers/{customer_id}")
-def get_customer(customer_id: str):
-    result = db.customers.find_one({"id": customer_id})
-    return convert_objectid(result)
+def get_customer(customer_id: str, request: Request, response: Response, snap: Snapshot):
+    return cached(request, response, lambda: (convert_objectid(
+        snap.customers.find_one({"id": customer_id}, CUSTOMER_PROJECTION, max_time_ms=MONGO_MAX_TIME_MS)
+    ), {}))
+
+@app.get("/customers/{customer_id}/overview")
+def get_customer_overview(
+    customer_id: str, request: Request, response: Response, snap: Snapshot, limit: int = Query(10, ge=1, le=100)
+):
+    # Client + abonnements, charges, payment_intents et factures récents : un seul aller-retour Mongo
+    return cached(request, response, lambda: (
+        next(aggregate(snap.customers, customer_overview_pipeline(customer_id, limit, snap.collections)), None), {}
+    ))
+
+def compute_mrr(snap: SnapshotCollections):
+    result = next(aggregate(snap.subscriptions, MRR_PIPELINE), {"mrr": 0})
+    return round(result["mrr"], 2)
+
+@app.get("/stats/summary")
+def get_summary_stats(request: Request, response: Response, snap: Snapshot):
+    def compute():
+        totals = next(aggregate(snap.charges, CHARGES_TOTALS_PIPELINE), EMPTY_CHARGES_TOTALS)
+        return summary_from_totals(
+            snap.customers.estimated_document_count(maxTimeMS=MONGO_MAX_TIME_MS),
+            count_documents(snap.subscriptions, ACTIVE_SUBSCRIPTIONS_FILTER),
+            totals,
+            compute_mrr(snap),
+        ), {}
+    return cached(request, response, compute)
+
+@app.get("/stats/revenue/top")
+def get_top_customers_by_revenue(
+    request: Request, response: Response, snap: Snapshot, limit: int = Query(5, ge=1, le=100)
+):
+    return cached(request, response, lambda: (list(aggregate(snap.charges, top_customers_pipeline(limit))), {}))
+
+@app.get("/stats/mrr")
+def get_mrr(request: Request, response: Response, snap: Snapshot):
+    return cached(request, response, lambda: ({"mrr": compute_mrr(snap)}, {}))
+
+@app.get("/stats/subscriptions/status")
+def get_subscription_status_counts(request: Request, response: Response, snap: Snapshot):
+    return cached(request, response, lambda: (
+        {doc["_id"]: doc["count"] for doc in aggregate(snap.subscriptions, SUBSCRIPTION_STATUS_PIPELINE)}, {}
+    ))
+
+@app.get("/stats/timeseries")
+def get_timeseries(
+    request: Request,
+    response: Response,
+    snap: Snapshot,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    granularity: str = Query("day", pattern="^(" + "|".join(TIMESERIES_GRANULARITIES) + ")$"),
+    source: str = Query("charges", pattern="^(" + "|".join(TIMESERIES_SOURCES) + ")$"),
+    status: str | None = None,
+    customer_id: str | None = None,
+):
+    # Une ligne par tranche [start, end[ : le coût suit le nombre de tranches, pas la taille de charges
+    pipeline = timeseries_pipeline(source, granularity, start, end, status, customer_id)
+    return cached(request, response, lambda: (
+        {"source": source, "granularity": granularity, "buckets": list(aggregate(snap[source], pipeline))}, {}
+    ))
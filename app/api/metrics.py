@@ -0,0 +1,141 @@
+import time
+import threading
+
+from scripts.mongo_metrics import CommandMetrics
+
+# Métriques Prometheus (format texte 0.0.4) écrites à la main : histogrammes par route, par commande Mongo
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, le: str = None) -> str:
+    pairs = list(zip(names, values)) + ([("le", le)] if le is not None else [])
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            series["sum"] += value
+            series["count"] += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+                    break
+
+    def render(self) -> list:
+        with self._lock:
+            series = {labels: {**data, "buckets": list(data["buckets"])} for labels, data in self._series.items()}
+        return render_histogram(self.name, self.help_text, self.label_names, self.buckets, series)
+
+
+def render_histogram(name, help_text, label_names, buckets, series) -> list:
+    """series : {label_values: {"buckets": [compte par borne, non cumulé], "sum", "count"}}."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for label_values, data in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, data["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(label_names, label_values, repr(float(bound)))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(label_names, label_values, '+Inf')} {data['count']}")
+        lines.append(f"{name}_sum{_labels(label_names, label_values)} {data['sum']}")
+        lines.append(f"{name}_count{_labels(label_names, label_values)} {data['count']}")
+    return lines
+
+
+class ApiMetrics:
+    """Registre d'une application : une instance par API (sync, async)."""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "api_request_duration_seconds", "HTTP request latency by route template.",
+            ("route", "method", "status"), LATENCY_BUCKETS,
+        )
+        self.response_size = Histogram(
+            "api_response_size_bytes", "Response body size on the wire (after gzip).",
+            ("route",), SIZE_BUCKETS,
+        )
+        self.cursor_documents = Histogram(
+            "api_cursor_documents", "Documents read from MongoDB cursors per request (cache misses only).",
+            ("route",), DOCUMENT_BUCKETS,
+        )
+        self.mongo_commands = CommandMetrics(LATENCY_BUCKETS)
+
+    def observe_documents(self, request, count: int):
+        self.cursor_documents.observe(count, route_template(request.scope))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in (self.request_duration, self.response_size, self.cursor_documents):
+            lines += histogram.render()
+
+        commands = self.mongo_commands.snapshot()
+        lines += render_histogram(
+            "mongo_command_duration_seconds", "MongoDB command latency by command name (PyMongo monitoring).",
+            ("command",), self.mongo_commands.buckets,
+            {(name,): {"buckets": entry["bucket_counts"], "sum": entry["seconds"], "count": entry["count"]}
+             for name, entry in commands.items()},
+        )
+        lines += ["# HELP mongo_command_failures_total Failed MongoDB commands.", "# TYPE mongo_command_failures_total counter"]
+        lines += [f'mongo_command_failures_total{{command="{_escape(name)}"}} {entry["failures"]}'
+                  for name, entry in sorted(commands.items())]
+        return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    # Gabarit de la route (/customers/{customer_id}) : cardinalité bornée, contrairement au chemin brut
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI pur : mesure chaque requête HTTP jusqu'au dernier octet envoyé,
+    réponses NDJSON en streaming comprises.
+    """
+
+    def __init__(self, app, metrics: ApiMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            self.metrics.request_duration.observe(time.perf_counter() - started, route, scope["method"], str(status))
+            self.metrics.response_size.observe(size, route)
@@ -0,0 +1,205 @@
+import re
+from datetime import datetime, timezone
+
+# Formes de requêtes partagées par l'API sync (main.py) et l'API async (async_main.py)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+ACTIVE_SUBSCRIPTIONS_FILTER = {"status": "active"}
+THREE_DS_FILTER = {"payment_method_options.card.request_three_d_secure": "automatic"}
+CUSTOMER_LIST_PROJECTION = {"id": 1, "name": 1, "email": 1, "_id": 0}
+# Clés de recherche internes au loader (mongo_normalize.SEARCH_KEYS_FIELD), jamais renvoyées
+CUSTOMER_PROJECTION = {"search_keys": 0}
+
+# Lignes de fraud_signals : le marqueur de run interne au loader n'est pas exposé
+FRAUD_SIGNALS_PROJECTION = {"run": 0}
+
+CHARGES_TOTALS_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "total_revenue": {"$sum": "$amount"},
+        "charges": {"$sum": 1},
+        "paid_charges": {"$sum": {"$cond": [{"$eq": ["$paid", True]}, 1, 0]}},
+    }}
+]
+EMPTY_CHARGES_TOTALS = {"total_revenue": 0, "charges": 0, "paid_charges": 0}
+
+# Premier item de chaque abonnement actif, ramené au mois (intervalle absent = mois)
+MRR_PIPELINE = [
+    {"$match": ACTIVE_SUBSCRIPTIONS_FILTER},
+    {"$project": {"plan": {"$arrayElemAt": ["$items.data.plan", 0]}}},
+    {"$project": {
+        "amount": {"$ifNull": ["$plan.amount", 0]},
+        "interval": {"$ifNull": ["$plan.interval", "month"]},
+    }},
+    {"$group": {"_id": None, "mrr": {"$sum": {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$interval", "month"]}, "then": "$amount"},
+            {"case": {"$eq": ["$interval", "year"]}, "then": {"$divide": ["$amount", 12]}},
+        ],
+        "default": 0,
+    }}}}},
+]
+
+SUBSCRIPTION_STATUS_PIPELINE = [
+    {"$group": {"_id": {"$ifNull": ["$status", "unknown"]}, "count": {"$sum": 1}}},
+    {"$sort": {"count": -1}},
+]
+
+
+def top_customers_pipeline(limit: int) -> list:
+    return [
+        {"$group": {"_id": {"$ifNull": ["$customer_id", "unknown"]}, "revenue": {"$sum": "$amount"}}},
+        {"$sort": {"revenue": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "customer_id": "$_id", "revenue": 1}},
+    ]
+
+
+# /stats/timeseries : montant et succès par source, lus dans l'index couvrant sur created
+TIMESERIES_SOURCES = {
+    "charges": {"amount": "$amount", "succeeded": {"$eq": ["$paid", True]}},
+    "payment_intents": {"amount": "$amount_received", "succeeded": {"$eq": ["$status", "succeeded"]}},
+}
+TIMESERIES_GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def timeseries_pipeline(source: str, granularity: str, start=None, end=None, status=None, customer_id=None) -> list:
+    """
+    Agrège par tranche de created ($dateTrunc, UTC, semaines commençant le lundi) sur [start, end[.
+    created doit être une date BSON (normalisation du loader) : le $match est une plage d'index.
+    """
+    fields = TIMESERIES_SOURCES[source]
+    created = {"$type": "date"}
+    if start:
+        created["$gte"] = _utc(start)
+    if end:
+        created["$lt"] = _utc(end)
+    match = {"created": created}
+    if status:
+        match["status"] = status
+    if customer_id:
+        match["customer_id"] = customer_id
+
+    bucket = {"date": "$created", "unit": granularity, "timezone": "UTC"}
+    if granularity == "week":
+        bucket["startOfWeek"] = "monday"
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateTrunc": bucket},
+            "count": {"$sum": 1},
+            "succeeded": {"$sum": {"$cond": [fields["succeeded"], 1, 0]}},
+            "amount": {"$sum": fields["amount"]},
+            "revenue": {"$sum": {"$cond": [fields["succeeded"], fields["amount"], 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "bucket": "$_id", "count": 1, "succeeded": 1, "amount": 1, "revenue": 1}},
+    ]
+
+
+# /customers/{id}/overview : collections jointes, les plus récents d'abord (index customer_created)
+CUSTOMER_OVERVIEW_COLLECTIONS = ("subscriptions", "charges", "payment_intents", "invoices")
+
+
+def _recent_for_customer(collection: str, limit: int, collections: dict) -> dict:
+    return {"$lookup": {
+        "from": collections.get(collection, collection),
+        "localField": "id",
+        "foreignField": "customer_id",
+        "pipeline": [{"$sort": {"created": -1}}, {"$limit": limit}, {"$project": {"_id": 0}}],
+        "as": collection,
+    }}
+
+
+def customer_overview_pipeline(customer_id: str, limit: int, collections: dict = None) -> list:
+    """
+    Le client, ses documents récents et les totaux de ses charges, en une seule agrégation.
+    collections : noms physiques du jeu de snapshot lu ($lookup vise une collection, pas un nom logique).
+    """
+    collections = collections or {}
+    return [
+        {"$match": {"id": customer_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, **CUSTOMER_PROJECTION}},
+        *[_recent_for_customer(collection, limit, collections) for collection in CUSTOMER_OVERVIEW_COLLECTIONS],
+        {"$lookup": {
+            "from": collections.get("charges", "charges"),
+            "localField": "id",
+            "foreignField": "customer_id",
+            "pipeline": [{"$group": {
+                "_id": None,
+                "charges": {"$sum": 1},
+                "paid_charges": {"$sum": {"$cond": [{"$eq": ["$paid", True]}, 1, 0]}},
+                "revenue": {"$sum": {"$cond": [{"$eq": ["$paid", True]}, "$amount", 0]}},
+            }}, {"$project": {"_id": 0}}],
+            "as": "charge_totals",
+        }},
+        {"$set": {"charge_totals": {"$ifNull": [
+            {"$first": "$charge_totals"}, {"charges": 0, "paid_charges": 0, "revenue": 0},
+        ]}}},
+    ]
+
+
+# /customers/search : au moins un caractère non blanc (un q blanc deviendrait "^", soit tous les clients)
+SEARCH_QUERY_PATTERN = r"^\s*\S"
+
+
+def customer_search_query(prefix: str) -> dict:
+    # Préfixe ancré et sensible à la casse sur des clés déjà en minuscules : parcours d'une plage d'index
+    return {"search_keys": {"$regex": "^" + re.escape(prefix.strip().casefold())}}
+
+
+def summary_from_totals(customers: int, active_subscriptions: int, totals: dict, mrr) -> dict:
+    charges = totals["charges"]
+    return {
+        "customers": customers,
+        "active_subscriptions": active_subscriptions,
+        "total_revenue": totals["total_revenue"],
+        "charges": charges,
+        "paid_charges": totals["paid_charges"],
+        "success_rate": round(totals["paid_charges"] / charges * 100, 2) if charges else 0,
+        "mrr": mrr,
+    }
+
+
+def convert_objectid(doc):
+    if not doc:
+        return doc
+    if "_id" in doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def wants_ndjson(request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def parse_fields(fields):
+    """'id,amount,status' -> projection Mongo ; "id" est toujours inclus pour le curseur."""
+    if not fields:
+        return None
+    projection = {name.strip(): 1 for name in fields.split(",") if name.strip()}
+    projection["id"] = 1
+    return projection
+
+
+def page_query(query: dict, after=None) -> dict:
+    """
+    Pagination par clé sur "id" : les documents strictement après le curseur.
+    Le filtre id $exists, première page comprise, permet d'utiliser l'index partiel id_unique pour le tri.
+    """
+    id_filter = {"$exists": True}
+    if after:
+        id_filter["$gt"] = after
+    return {"$and": [query, {"id": id_filter}]} if query else {"id": id_filter}
@@ -0,0 +1,31 @@
+from fastapi import HTTPException
+
+# ?snapshot=v3 : identifiant d'un jeu conservé (scripts/snapshot_meta.py)
+SNAPSHOT_PATTERN = r"^v\d+$"
+
+
+class SnapshotCollections:
+    """
+    Collections d'un jeu de snapshot par nom logique : snap.charges, snap["charges"].
+    collections : {nom logique: collection physique} ; un nom absent est lu tel quel (snapshot non versionné).
+    """
+
+    def __init__(self, db, collections: dict = None):
+        self.db = db
+        self.collections = dict(collections or {})
+
+    def name(self, collection_name: str) -> str:
+        return self.collections.get(collection_name, collection_name)
+
+    def __getitem__(self, collection_name: str):
+        return self.db[self.name(collection_name)]
+
+    def __getattr__(self, collection_name: str):
+        if collection_name.startswith("_"):
+            raise AttributeError(collection_name)
+        return self[collection_name]
+
+
+def snapshot_not_found(snapshot, as_of) -> HTTPException:
+    wanted = f"snapshot set '{snapshot}'" if snapshot else f"snapshot loaded at or before {as_of.isoformat()}"
+    return HTTPException(status_code=404, detail=f"No retained {wanted}")
@@ -3,8 +3,13 @@ from fastapi import FastAPI
 from pymongo import MongoClient
 from bson import ObjectId
 import os
+from datetime import date, timedelta
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
@@ -20,6 +25,13 @@ elif ENV in ["TEST", "PROD"]:
 else:
     raise ValueError("Invalid ENV variable. Must be DEV, TEST, or PROD.")
 
+# Client HTTP : session keep-alive partagée, timeout, cache par version de snapshot
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 15))
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", 600))
+# Fréquence de vérification de /snapshot : un nouveau chargement invalide le cache local
+SNAPSHOT_CHECK_TTL = int(os.getenv("SNAPSHOT_CHECK_TTL", 30))
+MAX_CONCURRENT_FETCHES = 4
+
 st.title("📊 Supabase Snapshot Explorer")
 
 section = st.sidebar.radio("Select an endpoint", [
@@ -31,28 +43,95 @@ section = st.sidebar.radio("Select an endpoint", [
     "Analytics Dashboard"
 ])
 
+class ApiError(Exception):
+    def __init__(self, message, body=""):
+        super().__init__(message)
+        self.body = body
+
+
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FETCHES, pool_maxsize=MAX_CONCURRENT_FETCHES)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=SNAPSHOT_CHECK_TTL, show_spinner=False)
+def get_snapshot_version():
+    try:
+        resp = get_session().get(f"{API_URL}/snapshot", timeout=API_TIMEOUT)
+        return (resp.json() or {}).get("version") if resp.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        return None
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def fetch_json(endpoint, snapshot_version):
+    # snapshot_version ne sert qu'à la clé de cache : une nouvelle version => nouvel appel
+    try:
+        resp = get_session().get(f"{API_URL}{endpoint}", timeout=API_TIMEOUT)
+    except requests.RequestException as e:
+        raise ApiError(f"Request to {endpoint} failed: {e}")
+    if resp.status_code != 200:
+        raise ApiError(f"HTTP Error {resp.status_code}", resp.text)
+    try:
+        return resp.json()
+    except ValueError:
+        raise ApiError("Error parsing JSON response.", resp.text)
+
+
 def safe_json(endpoint):
-    resp = requests.get(f"{API_URL}{endpoint}")
-    if resp.status_code == 200:
+    return safe_json_many(endpoint)[0]
+
+
+def safe_json_many(*endpoints):
+    """Récupère plusieurs endpoints indépendants en parallèle (None pour ceux en erreur)."""
+    version = get_snapshot_version()
+    ctx = get_script_run_ctx()
+
+    def fetch(endpoint):
+        add_script_run_ctx(ctx=ctx)
+        return fetch_json(endpoint, version)
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES) as executor:
+        futures = [executor.submit(fetch, endpoint) for endpoint in endpoints]
+
+    results = []
+    for future in futures:
         try:
-            return resp.json()
-        except Exception:
-            st.error("Error parsing JSON response.")
-            st.text(resp.text)
-            return None
-    else:
-        st.error(f"HTTP Error {resp.status_code}")
-        st.text(resp.text)
-        return None
+            results.append(future.result())
+        except ApiError as e:
+            st.error(str(e))
+            if e.body:
+                st.text(e.body)
+            results.append(None)
+    return results
 
 if section == "Fraudulent Charges":
     st.header("💥 Potentially Fraudulent Charges")
-    data = safe_json("/charges/fraud")
+    col1, col2 = st.columns(2)
+    window = col1.selectbox("Window", ["1h", "24h", "7d"], index=1)
+    threshold = col2.slider("Minimum score", 0, 100, 50, step=5)
+    data = safe_json(f"/charges/fraud?window={window}&threshold={threshold}&limit=200")
     if data:
-        for item in data:
-            st.write(f"💳 Method: {item['_id']}")
-            st.write(f"💰 Total: €{item['total'] / 100:.2f} ({item['count']} times)")
-            st.divider()
+        rows = [{
+            "charge": item["_id"],
+            "score": item["windows"][window]["score"],
+            "customer": item.get("customer_id"),
+            "payment_method": item.get("payment_method"),
+            "amount (€)": (item.get("amount") or 0) / 100,
+            "paid": item.get("paid"),
+            "method velocity": item["windows"][window]["payment_method_velocity"],
+            "customer velocity": item["windows"][window]["customer_velocity"],
+            "failures": item["windows"][window]["failures"],
+            "amount z-score": item.get("amount_zscore"),
+        } for item in data]
+        st.metric("Flagged charges", len(rows))
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    elif data is not None:
+        st.info(f"No charge scored {threshold} or more over {window}.")
 
 elif section == "Subscription Status":
     st.header("📦 Subscription Status Overview")
@@ -133,69 +212,73 @@ elif section == "3D Secure Payments":
 
 elif section == "Customer by ID":
     st.header("👤 Customer Information")
-    customer_list = safe_json("/customers")
+    # Recherche par préfixe côté API : la liste complète des clients n'est jamais téléchargée
+    query = st.text_input("Search by name or email", placeholder="e.g. alice, martin, alice.martin@")
 
-    if customer_list:
+    matches = safe_json(f"/customers/search?{urlencode({'q': query, 'limit': 20})}") if query.strip() else None
+    if matches:
         options = {
-            f"{c.get('name', 'Unknown')} ({c.get('email', 'no-email')})": c.get('id', '')
-            for c in customer_list if 'id' in c
+            f"{c.get('name', 'Unknown')} ({c.get('email', 'no-email')})": c["id"]
+            for c in matches if 'id' in c
         }
 
         selected_label = st.selectbox("Select a customer", list(options.keys()))
         customer_id = options[selected_label]
 
-        data = safe_json(f"/customers/{customer_id}")
+        data = safe_json(f"/customers/{customer_id}/overview?limit=10")
         if data:
             st.write(f"📧 {data.get('email')} — 👤 {data.get('name')}")
             st.write(f"💳 Payment Method ID: {data.get('default_payment_method_id')}")
             st.write(f"📅 Created: {data.get('created')}")
-            st.write(f"💶 Balance: €{data.get('balance', 0) / 100:.2f}")
+            st.write(f"💶 Balance: €{(data.get('balance') or 0) / 100:.2f}")
+
+            totals = data["charge_totals"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Charges", totals["charges"])
+            col2.metric("Paid", totals["paid_charges"])
+            col3.metric("Revenue", f"€{totals['revenue'] / 100:,.2f}")
+
+            for collection, columns in [
+                ("subscriptions", ["id", "status", "created", "current_period_end"]),
+                ("charges", ["id", "amount", "status", "paid", "created"]),
+                ("payment_intents", ["id", "amount", "status", "created"]),
+                ("invoices", ["id", "amount_due", "amount_paid", "status", "created"]),
+            ]:
+                st.subheader(f"{collection.replace('_', ' ').capitalize()} (latest {len(data[collection])})")
+                if data[collection]:
+                    df = pd.DataFrame(data[collection])
+                    st.dataframe(df[[c for c in columns if c in df.columns]], use_container_width=True, hide_index=True)
+                else:
+                    st.caption("None")
+    elif matches is not None:
+        st.info(f"No customer matches '{query}'.")
 
 elif section == "Summary View":
     st.header("📈 Business Summary")
     
-    # Get data from multiple endpoints
-    customers = safe_json("/customers")
-    all_subs = safe_json("/subscriptions")
-    charges = safe_json("/charges")
+    # Agrégats calculés côté Mongo : quelques octets au lieu des collections complètes
+    summary = safe_json("/stats/summary")
     
-    if customers and all_subs and charges:
+    if summary:
         # Top metrics
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("� Total Customers", len(customers))
+            st.metric("� Total Customers", summary["customers"])
         
         with col2:
-            active_subs = [s for s in all_subs if s.get('status') == 'active']
-            st.metric("📦 Active Subscriptions", len(active_subs))
+            st.metric("📦 Active Subscriptions", summary["active_subscriptions"])
         
         with col3:
-            total_charges = sum([c.get('amount', 0) for c in charges]) / 100
-            st.metric("💰 Total Revenue", f"€{total_charges:.2f}")
+            st.metric("💰 Total Revenue", f"€{summary['total_revenue'] / 100:.2f}")
         
         with col4:
-            paid_charges = [c for c in charges if c.get('paid', False)]
-            st.metric("✅ Successful Charges", len(paid_charges))
+            st.metric("✅ Successful Charges", summary["paid_charges"])
         
         st.divider()
         
-        # Monthly Revenue Estimation
-        monthly_revenue = 0
-        for sub in active_subs:
-            if 'items' in sub and 'data' in sub['items'] and len(sub['items']['data']) > 0:
-                plan = sub['items']['data'][0].get('plan', {})
-                amount = plan.get('amount', 0)
-                interval = plan.get('interval', 'month')
-                
-                # Convert to monthly
-                if interval == 'month':
-                    monthly_revenue += amount
-                elif interval == 'year':
-                    monthly_revenue += amount / 12
-        
         st.subheader("💹 Estimated Monthly Recurring Revenue")
-        st.metric("MRR", f"€{monthly_revenue / 100:.2f}")
+        st.metric("MRR", f"€{summary['mrr'] / 100:.2f}")
         
     else:
         st.error("Unable to load summary data. Check if all endpoints are accessible.")
@@ -204,73 +287,57 @@ elif section == "Analytics Dashboard":
     st.header("📊 Analytics Dashboard")
     
     # Get data
-    all_subs = safe_json("/subscriptions")
-    charges = safe_json("/charges")
-    customers = safe_json("/customers")
+    status_counts, top_customers, summary = safe_json_many(
+        "/stats/subscriptions/status",
+        "/stats/revenue/top?limit=5",
+        "/stats/summary",
+    )
     
-    if all_subs:
+    if status_counts:
         # Subscription Status Pie Chart
         st.subheader("📦 Subscription Status Distribution")
         
-        status_counts = {}
-        for sub in all_subs:
-            status = sub.get('status', 'unknown')
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        if status_counts:
-            fig_pie = px.pie(
-                values=list(status_counts.values()),
-                names=list(status_counts.keys()),
-                title="Subscription Status Breakdown",
-                color_discrete_map={
-                    'active': '#28a745',
-                    'canceled': '#dc3545', 
-                    'incomplete': '#ffc107',
-                    'past_due': '#fd7e14',
-                    'unpaid': '#6f42c1'
-                }
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
+        fig_pie = px.pie(
+            values=list(status_counts.values()),
+            names=list(status_counts.keys()),
+            title="Subscription Status Breakdown",
+            color_discrete_map={
+                'active': '#28a745',
+                'canceled': '#dc3545', 
+                'incomplete': '#ffc107',
+                'past_due': '#fd7e14',
+                'unpaid': '#6f42c1'
+            }
+        )
+        st.plotly_chart(fig_pie, use_container_width=True)
     
-    if charges:
+    if summary and summary["charges"]:
         st.subheader("💰 Revenue Analysis")
         
-        # Revenue by Customer
-        customer_revenue = {}
-        for charge in charges:
-            customer_id = charge.get('customer_id', 'unknown')
-            amount = charge.get('amount', 0) / 100
-            customer_revenue[customer_id] = customer_revenue.get(customer_id, 0) + amount
-        
-        if customer_revenue:
-            # Top 5 customers by revenue
-            top_customers = sorted(customer_revenue.items(), key=lambda x: x[1], reverse=True)[:5]
+        # Top 5 customers by revenue
+        if top_customers:
+            customer_ids = [c["customer_id"] for c in top_customers]
+            revenues = [c["revenue"] / 100 for c in top_customers]
             
-            if top_customers:
-                customer_ids = [c[0] for c in top_customers]
-                revenues = [c[1] for c in top_customers]
-                
-                fig_bar = px.bar(
-                    x=customer_ids,
-                    y=revenues,
-                    title="Top 5 Customers by Revenue (€)",
-                    labels={'x': 'Customer ID', 'y': 'Revenue (€)'}
-                )
-                fig_bar.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig_bar, use_container_width=True)
+            fig_bar = px.bar(
+                x=customer_ids,
+                y=revenues,
+                title="Top 5 Customers by Revenue (€)",
+                labels={'x': 'Customer ID', 'y': 'Revenue (€)'}
+            )
+            fig_bar.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig_bar, use_container_width=True)
         
         # Payment Success Rate
         st.subheader("✅ Payment Success Rate")
         
-        total_charges = len(charges)
-        paid_charges = len([c for c in charges if c.get('paid', False)])
-        success_rate = (paid_charges / total_charges * 100) if total_charges > 0 else 0
+        success_rate = summary["success_rate"]
         
         col1, col2 = st.columns(2)
         with col1:
             st.metric("Success Rate", f"{success_rate:.1f}%")
         with col2:
-            st.metric("Failed Payments", total_charges - paid_charges)
+            st.metric("Failed Payments", summary["charges"] - summary["paid_charges"])
         
         # Success rate gauge
         fig_gauge = go.Figure(go.Indicator(
@@ -295,3 +362,26 @@ elif section == "Analytics Dashboard":
         ))
         fig_gauge.update_layout(height=400)
         st.plotly_chart(fig_gauge, use_container_width=True)
+
+    # Série temporelle agrégée côté serveur (/stats/timeseries) : une ligne par tranche
+    st.subheader("📈 Revenue Over Time")
+    col1, col2, col3, col4 = st.columns(4)
+    start = col1.date_input("From", date.today() - timedelta(days=365))
+    end = col2.date_input("To", date.today())
+    granularity = col3.selectbox("Granularity", ["day", "week", "month"], index=1)
+    source = col4.selectbox("Source", ["charges", "payment_intents"])
+    params = {"start": start.isoformat(), "end": (end + timedelta(days=1)).isoformat(),
+              "granularity": granularity, "source": source}
+    series = safe_json(f"/stats/timeseries?{urlencode(params)}")
+    if series and series["buckets"]:
+        df = pd.DataFrame(series["buckets"])
+        df["bucket"] = pd.to_datetime(df["bucket"])
+        df["revenue (€)"] = df["revenue"] / 100
+        fig_revenue = px.bar(df, x="bucket", y="revenue (€)", title=f"Revenue per {granularity} ({source})",
+                             hover_data=["count", "succeeded"])
+        st.plotly_chart(fig_revenue, use_container_width=True)
+        fig_count = px.line(df, x="bucket", y=["count", "succeeded"], markers=True,
+                            title=f"{source.replace('_', ' ').capitalize()} per {granularity}")
+        st.plotly_chart(fig_count, use_container_width=True)
+    elif series is not None:
+        st.info("No data in this date range.")
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Compare l'API sync (app.api.main) et l'API async (app.api.async_main) sous charge concurrente :
+#   make api        -> http://localhost:8000
+#   make api_async  -> http://localhost:8001
+#   make loadtest
+
+DEFAULT_TARGETS = ["sync=http://localhost:8000", "async=http://localhost:8001"]
+DEFAULT_ENDPOINTS = [
+    "/charges/fraud",
+    "/stats/summary",
+    "/stats/revenue/top",
+    "/subscriptions/active?limit=100",
+    "/payment_intents/3ds",
+]
+# Sans cet en-tête, toutes les requêtes après la première seraient des HIT du cache de l'API
+NO_CACHE_HEADERS = {"Cache-Control": "no-cache"}
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_endpoint(session: requests.Session, url: str, requests_count: int, concurrency: int, timeout: float) -> dict:
+    def call(_):
+        started = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=timeout).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for ok, ms in results if ok]
+    return {
+        "requests": requests_count,
+        "errors": requests_count - len(latencies),
+        "rps": round(requests_count / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+def run_loadtest(
+    targets: list, endpoints: list, requests_count: int, concurrency: int, timeout: float, use_cache: bool = False
+) -> dict:
+    results = {}
+    for target in targets:
+        name, base_url = target.split("=", 1)
+        session = requests.Session()
+        if not use_cache:
+            session.headers.update(NO_CACHE_HEADERS)
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        results[name] = {}
+        for endpoint in endpoints:
+            try:
+                session.get(f"{base_url}{endpoint}", timeout=timeout)  # warm-up
+            except requests.RequestException as e:
+                print(f"⚠️ [{name}] {endpoint} unreachable: {e}")
+            stats = run_endpoint(session, f"{base_url}{endpoint}", requests_count, concurrency, timeout)
+            results[name][endpoint] = stats
+            print(
+                f"⏱️ [{name}] {endpoint}: {stats['rps']} req/s, p50 {stats['p50_ms']}ms, "
+                f"p99 {stats['p99_ms']}ms, {stats['errors']} errors"
+            )
+    return results
+
+
+def print_comparison(results: dict):
+    names = list(results)
+    if len(names) < 2:
+        return
+    baseline, other = names[0], names[1]
+    print(f"\n📊 {other} vs {baseline}")
+    for endpoint, stats in results[baseline].items():
+        candidate = results[other].get(endpoint)
+        if not candidate or not stats["rps"]:
+            continue
+        print(
+            f"  {endpoint}: x{candidate['rps'] / stats['rps']:.2f} req/s, "
+            f"p99 {stats['p99_ms']}ms -> {candidate['p99_ms']}ms"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test of the FastAPI backends.")
+    parser.add_argument("--target", action="append", help="name=base_url (repeatable)")
+    parser.add_argument("--endpoint", action="append", help="path to hit (repeatable)")
+    parser.add_argument("--requests", type=int, default=int(os.getenv("LOADTEST_REQUESTS", 200)))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("LOADTEST_CONCURRENCY", 32)))
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--cached", action="store_true", help="let the API serve cache hits (default: bypass)")
+    args = parser.parse_args(argv)
+
+    results = run_loadtest(
+        args.target or DEFAULT_TARGETS,
+        args.endpoint or DEFAULT_ENDPOINTS,
+        args.requests,
+        args.concurrency,
+        args.timeout,
+        use_cache=args.cached,
+    )
+    print_comparison(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
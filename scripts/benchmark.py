@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+import requests
+from pymongo import MongoClient
+
+from api_loadtest import run_endpoint
+from synth_dump import DUMP_FORMATS, generate_dump
+
+# Benchmark de bout en bout sur un dump synthétique et un mongod local (make up) :
+#   1. génère le dump déterministe (synth_dump) dans un stockage local
+#   2. le charge avec scripts/gcs_to_mongo.py en sous-processus : débit et RSS max
+#   3. lance app.api.main sous uvicorn et mesure p50/p99 de chaque endpoint GET
+#   4. écrit benchmarks/<commit>.json ; --compare pour le comparer à un résultat précédent
+#   make bench
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_STORAGE_DIR = REPO_ROOT / ".cache" / "bench" / "bucket"
+DEFAULT_OUTPUT_DIR = REPO_ROOT / "benchmarks"
+
+
+def git_commit() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True)
+        return result.stdout.strip()
+
+    return {"sha": git("rev-parse", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run_loader(storage_dir: Path, mongo_uri: str, db_name: str, load_mode: str) -> dict:
+    env = {
+        **os.environ,
+        "ENV": "DEV",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": str(storage_dir),
+        "GCS_CACHE_MAX_BYTES": "0",
+        "MONGO_URI": mongo_uri,
+        "MONGO_DB": db_name,
+        "LOAD_MODE": load_mode,
+    }
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "scripts/gcs_to_mongo.py"], cwd=REPO_ROOT, env=env)
+    # wait4 : rusage de ce seul processus fils (ru_maxrss en KB sous Linux, en octets sous macOS)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Loader exited with code {proc.returncode}")
+
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    client = MongoClient(mongo_uri)
+    try:
+        meta = client[db_name]["_meta"].find_one({"_id": "snapshot"}) or {}
+    finally:
+        client.close()
+    docs = sum((meta.get("counts") or {}).values())
+    return {
+        "mode": load_mode,
+        "seconds": round(elapsed, 2),
+        "docs": docs,
+        "docs_per_sec": round(docs / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(peak_rss / 1e6, 1),
+    }
+
+
+def start_api(mongo_uri: str, db_name: str, port: int, timeout: float = 30.0):
+    # Cache de réponses désactivé : chaque requête mesurée va jusqu'à Mongo
+    env = {**os.environ, "ENV": "DEV", "MONGO_URI": mongo_uri, "MONGO_DB": db_name, "CACHE_MAX_ENTRIES": "0"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{base_url}/", timeout=1).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"API did not start on {base_url} within {timeout}s")
+
+
+def list_endpoints(base_url: str, sample_ids: dict) -> list:
+    """Toutes les routes GET déclarées dans l'OpenAPI, paramètres de chemin remplacés par des ids réels."""
+    spec = requests.get(f"{base_url}/openapi.json", timeout=10).json()
+    endpoints = []
+    for path, methods in spec["paths"].items():
+        if "get" not in methods:
+            continue
+        for name, value in sample_ids.items():
+            path = path.replace("{" + name + "}", value)
+        if "{" not in path:
+            endpoints.append(path)
+    return endpoints
+
+
+def bench_api(mongo_uri: str, db_name: str, port: int, requests_count: int, concurrency: int) -> dict:
+    client = MongoClient(mongo_uri)
+    try:
+        # Jeu de snapshot courant : customers__v<n>
+        meta = client[db_name]["_meta"].find_one({"_id": "snapshot"}, {"collections": 1}) or {}
+        customers = (meta.get("collections") or {}).get("customers", "customers")
+        customer = client[db_name][customers].find_one({}, {"id": 1}) or {}
+    finally:
+        client.close()
+
+    proc, base_url = start_api(mongo_uri, db_name, port)
+    try:
+        session = requests.Session()
+        results = {}
+        for endpoint in list_endpoints(base_url, {"customer_id": customer.get("id", "missing")}):
+            # Premier appel : connexions et plans de requête à froid, mesuré à part
+            started = time.perf_counter()
+            session.get(f"{base_url}{endpoint}", timeout=120)
+            first_ms = round((time.perf_counter() - started) * 1000, 2)
+
+            stats = run_endpoint(session, f"{base_url}{endpoint}", requests_count, concurrency, 120)
+            results[endpoint] = {"first_ms": first_ms, **stats}
+            print(f"⏱️ {endpoint}: first {first_ms}ms, p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms")
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list:
+    """Régressions au-delà de threshold (0.2 = +20 % de latence ou -20 % de débit)."""
+    regressions = []
+    old_rate = previous.get("loader", {}).get("docs_per_sec")
+    new_rate = current.get("loader", {}).get("docs_per_sec")
+    if old_rate and new_rate is not None and new_rate < old_rate * (1 - threshold):
+        regressions.append(f"loader docs/s {old_rate} -> {new_rate}")
+
+    for endpoint, stats in current.get("api", {}).items():
+        before = previous.get("api", {}).get(endpoint)
+        if not before:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if before[key] and stats[key] > before[key] * (1 + threshold):
+                regressions.append(f"{endpoint} {key} {before[key]} -> {stats[key]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on a synthetic dump and a local mongod.")
+    parser.add_argument("--customers", type=int, default=int(os.getenv("BENCH_CUSTOMERS", 10000)))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--storage-dir", type=Path, default=DEFAULT_STORAGE_DIR)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="bench_snapshot", help="database loaded and queried (never the live one)")
+    parser.add_argument("--load-mode", choices=["snapshot", "delta"], default="snapshot")
+    parser.add_argument("--dump-format", choices=DUMP_FORMATS, default="json", help="single JSON file or NDJSON parts")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--compare", type=Path, help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    dataset = generate_dump(args.storage_dir, args.seed, args.customers, fmt=args.dump_format)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "dataset": {**{key: dataset[key] for key in ("name", "seed", "bytes", "counts")}, "format": args.dump_format},
+        "loader": run_loader(args.storage_dir, args.mongo_uri, args.db, args.load_mode),
+    }
+    print(f"🚚 Loader: {results['loader']}")
+    if not args.skip_api:
+        results["api"] = bench_api(args.mongo_uri, args.db, args.port, args.requests, args.concurrency)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    output = args.output_dir / f"{results['commit']['sha'][:12]}.json"
+    output.write_text(json.dumps(results, indent=2))
+    print(f"💾 Results written to {output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        for regression in regressions:
+            print(f"⚠️ Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"✅ No regression beyond {args.threshold:.0%} vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
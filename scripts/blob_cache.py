@@ -0,0 +1,127 @@
+import os
+import mmap
+import codecs
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Cache disque des objets distants (dumps, sorties OLAP). Une entrée = un nom + une génération :
+# un blob réécrit change de génération, donc de clé ; l'ancienne entrée finit évincée (LRU).
+GCS_CACHE_DIR = os.getenv("GCS_CACHE_DIR", ".cache/gcs")
+# 0 désactive le cache
+GCS_CACHE_MAX_BYTES = int(os.getenv("GCS_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class BlobCache:
+    """
+    Un fichier par (backend, nom, génération, md5) d'un StorageObject. Le mtime sert
+    d'horodatage LRU : il est rafraîchi à chaque hit, et les fichiers les plus anciens
+    sont supprimés dès que la taille totale dépasse max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = Path(directory or GCS_CACHE_DIR)
+        self.max_bytes = GCS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(blob) -> str:
+        identity = f"{blob.backend.name}/{blob.name}#{blob.generation}:{blob.md5_hash}"
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def path_for(self, blob) -> Path:
+        suffix = "".join(Path(blob.name).suffixes[-1:])
+        return self.directory / f"{self.key(blob)}{suffix}"
+
+    def get(self, blob):
+        path = self.path_for(blob)
+        if not path.exists():
+            return None
+        os.utime(path)
+        return path
+
+    def fetch(self, blob) -> Path:
+        """Chemin local du blob ; téléchargé seulement si cette génération n'est pas déjà en cache."""
+        path = self.get(blob)
+        if path is not None:
+            print(f"🗃️ Cache hit for {blob.name} (generation {blob.generation})")
+            return path
+
+        path = self.path_for(blob)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as dst, blob.open("rb") as src:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            # Renommage atomique : un autre process ne lit jamais un fichier partiel
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        print(f"📥 Cached {blob.name} (generation {blob.generation}, {path.stat().st_size / 1e6:.1f} MB)")
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None) -> int:
+        entries = []
+        for entry in self.directory.iterdir():
+            if entry.suffix == ".part" or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            print(f"🧹 Evicted {removed} cached blob(s), cache now {total / 1e6:.1f} MB")
+        return removed
+
+
+def get_blob_cache():
+    """Cache configuré par l'environnement, ou None s'il est désactivé (GCS_CACHE_MAX_BYTES=0)."""
+    if GCS_CACHE_MAX_BYTES <= 0:
+        return None
+    return BlobCache()
+
+
+class MappedTextReader:
+    """
+    Lecture texte d'un fichier mappé en mémoire (mmap) : les octets viennent directement du
+    page cache, décodés en UTF-8 par morceaux, sans copie intégrale du fichier.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pos = 0
+
+    def read(self, size=-1) -> str:
+        text = ""
+        # Un morceau peut s'arrêter au milieu d'un caractère multi-octets : on lit jusqu'à avoir du texte
+        while not text and self._pos < len(self._map):
+            end = len(self._map) if size is None or size < 0 else min(len(self._map), self._pos + size)
+            text = self._decoder.decode(self._map[self._pos:end], final=end == len(self._map))
+            self._pos = end
+        return text
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,151 @@
+import os
+import re
+import gzip
+import json
+import multiprocessing
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+
+# Dump découpé : un dossier dump/db_dump_prod_<...>/ contenant un fichier NDJSON par collection
+# (un document par ligne), compressé ou non :
+#   customers.ndjson.gz, invoices.ndjson, charges.0001.ndjson.gz...
+# Le nom de la collection est le nom du fichier jusqu'au premier point.
+# Les process de parsing (spawn) réimportent ce module, mais aussi le module __main__ du parent
+# (gcs_to_mongo : pandas, pyarrow, pymongo, bandeau ENV) : un coût fixe par process, amorti sur la partie.
+DUMP_PART_PATTERN = re.compile(r"(?:^|/)([^/.]+)(?:\.[^/]*)?\.ndjson(\.gz)?$")
+
+# Process de parsing (un par partie au plus) et batches en attente entre eux et le loader
+DUMP_PARSE_WORKERS = int(os.getenv("DUMP_PARSE_WORKERS", os.cpu_count() or 1))
+DUMP_QUEUE_SIZE = int(os.getenv("DUMP_QUEUE_SIZE", 16))
+
+
+class DumpParts:
+    """
+    Dump découpé vu comme un seul objet par le loader : mêmes attributs que StorageObject
+    (name, generation, updated, size) ; la génération et la date sont celles de la partie la plus récente.
+    """
+
+    def __init__(self, backend, name: str, parts: list):
+        self.backend = backend
+        self.name = name
+        self.parts = sorted(parts, key=lambda part: part.name)
+        self.generation = max((part.generation or 0 for part in self.parts), default=None)
+        self.updated = max((part.updated for part in self.parts if part.updated), default=None)
+        self.size = sum(part.size or 0 for part in self.parts)
+        self.md5_hash = None
+
+    def __repr__(self):
+        return f"DumpParts({self.backend.name}/{self.name}, {len(self.parts)} parts)"
+
+
+def part_collection(name: str):
+    """Collection d'une partie ("dump/x/charges.0001.ndjson.gz" -> "charges"), None si ce n'en est pas une."""
+    match = DUMP_PART_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def open_part(fp, name: str):
+    """Flux binaire décompressé à la volée selon l'extension (.gz, sinon brut)."""
+    if name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=fp, mode="rb")
+    return fp
+
+
+def iter_ndjson_batches(fp, collection_name: str, batch_size: int):
+    batch = []
+    for line in fp:
+        if not line.strip():
+            continue
+        batch.append(json.loads(line))
+        if len(batch) >= batch_size:
+            yield collection_name, batch
+            batch = []
+    if batch:
+        yield collection_name, batch
+
+
+def part_spec(part, path=None) -> dict:
+    """Ce qu'un process de parsing doit savoir d'une partie : copie locale, ou objet à relire depuis le backend."""
+    return {
+        "name": part.name,
+        "collection": part_collection(part.name),
+        "path": str(path) if path else None,
+        "bucket": getattr(part.backend, "bucket_name", None),
+    }
+
+
+def iter_part(spec: dict, batch_size: int):
+    if spec["path"]:
+        raw = open(spec["path"], "rb")
+    else:
+        # Process fils : son propre client de stockage (un client GCS ne se partage pas entre process)
+        from storage_backend import get_storage_backend
+        raw = get_storage_backend(spec["bucket"]).open(spec["name"], "rb")
+    with raw, open_part(raw, spec["name"]) as fp:
+        yield from iter_ndjson_batches(fp, spec["collection"], batch_size)
+
+
+_queue = None
+_stop = None
+
+
+def _init_worker(queue, stop):
+    global _queue, _stop
+    _queue, _stop = queue, stop
+
+
+def _parse_part(spec: dict, batch_size: int) -> int:
+    count = 0
+    for batch in iter_part(spec, batch_size):
+        if _stop.is_set():
+            break
+        _queue.put(batch)
+        count += len(batch[1])
+    # Fin de partie : le loader compte les parties terminées
+    _queue.put((None, spec["name"]))
+    return count
+
+
+def iter_parts_parallel(specs: list, batch_size: int, workers=None, queue_size=None):
+    """
+    Parse les parties dans un pool de process : chacune est décompressée et lue en flux,
+    et ses batches passent par une file bornée (queue_size batches en mémoire au plus).
+    Produit (collection_name, batch) dans l'ordre d'arrivée, les collections s'entrelacent.
+    """
+    workers = min(workers or DUMP_PARSE_WORKERS, len(specs))
+    if workers <= 1:
+        for spec in specs:
+            yield from iter_part(spec, batch_size)
+        return
+
+    # spawn : pas de fork d'un process qui a déjà des threads (client Mongo, téléchargements)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue(maxsize=queue_size or DUMP_QUEUE_SIZE)
+    stop = context.Event()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(queue, stop)) as pool:
+        futures = [pool.submit(_parse_part, spec, batch_size) for spec in specs]
+        remaining = len(futures)
+        try:
+            while remaining:
+                try:
+                    collection_name, batch = queue.get(timeout=1)
+                except Empty:
+                    # Un process mort n'envoie jamais sa fin de partie : on remonte son erreur
+                    for future in futures:
+                        if future.done() and future.exception():
+                            raise future.exception()
+                    continue
+                if collection_name is None:
+                    remaining -= 1
+                    continue
+                yield collection_name, batch
+        finally:
+            # Arrêt anticipé (erreur, loader interrompu) : on débloque les process pendant qu'ils s'arrêtent
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    queue.get(timeout=0.1)
+                except Empty:
+                    pass
@@ -0,0 +1,164 @@
+import os
+import time
+
+from bson import ObjectId
+
+# Scoring de fraude matérialisé au chargement : une agrégation $setWindowFields sur charges,
+# écrite par $merge dans fraud_signals. /charges/fraud ne lit plus que cette collection indexée.
+# Aucun import frère : module partagé avec l'API (scripts.fraud_scoring).
+
+FRAUD_SIGNALS_COLLECTION = "fraud_signals"
+
+# Fenêtres glissantes : durée, et seuils à partir desquels chaque signal est au maximum.
+# Les index score_<fenêtre> de mongo_indexes doivent suivre ces clés.
+FRAUD_WINDOWS = {
+    "1h": {"seconds": 3600, "velocity": 3, "failures": 2},
+    "24h": {"seconds": 24 * 3600, "velocity": 5, "failures": 3},
+    "7d": {"seconds": 7 * 24 * 3600, "velocity": 10, "failures": 5},
+}
+DEFAULT_FRAUD_WINDOW = os.getenv("FRAUD_WINDOW", "24h")
+DEFAULT_FRAUD_THRESHOLD = float(os.getenv("FRAUD_THRESHOLD", 50))
+
+# Poids des signaux dans le score (total 100)
+FRAUD_WEIGHTS = {
+    "payment_method_velocity": 30,
+    "customer_velocity": 20,
+    "amount_outlier": 30,
+    "failures": 20,
+}
+# Écart à la moyenne (en écarts-types) des montants précédents du client : signal au maximum
+OUTLIER_ZSCORE = float(os.getenv("FRAUD_OUTLIER_ZSCORE", 3))
+# Paiements précédents nécessaires avant de juger un montant atypique
+MIN_HISTORY = int(os.getenv("FRAUD_MIN_HISTORY", 3))
+
+
+def _epoch_seconds(field: str) -> dict:
+    # created : epoch Stripe (secondes) ou date BSON si le loader l'a normalisé ; tout autre type -> null
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": field}, "date"]}, "then": {"$divide": [{"$toLong": field}, 1000]}},
+            {"case": {"$isNumber": field}, "then": field},
+        ],
+        "default": None,
+    }}
+
+
+def _capped(value, limit) -> dict:
+    """min(1, max(0, value / limit)) : contribution normalisée d'un signal."""
+    return {"$min": [1, {"$max": [0, {"$divide": [value, limit]}]}]}
+
+
+def _range(window: str) -> dict:
+    return {"range": [-FRAUD_WINDOWS[window]["seconds"], 0]}
+
+
+def window_signals(window: str) -> dict:
+    limits = FRAUD_WINDOWS[window]
+    # Le paiement lui-même fait partie de sa fenêtre : on le retire des vélocités
+    pm_velocity = {"$subtract": [f"$_pm_{window}", 1]}
+    customer_velocity = {"$subtract": [f"$_cus_{window}", 1]}
+    failures = f"$_fail_{window}"
+    score = {"$add": [
+        {"$multiply": [FRAUD_WEIGHTS["payment_method_velocity"], _capped(pm_velocity, limits["velocity"])]},
+        {"$multiply": [FRAUD_WEIGHTS["customer_velocity"], _capped(customer_velocity, limits["velocity"])]},
+        {"$multiply": [FRAUD_WEIGHTS["amount_outlier"], _capped("$_zscore", OUTLIER_ZSCORE)]},
+        {"$multiply": [FRAUD_WEIGHTS["failures"], _capped(failures, limits["failures"])]},
+    ]}
+    return {
+        "score": {"$round": [score, 1]},
+        "payment_method_velocity": pm_velocity,
+        "customer_velocity": customer_velocity,
+        "failures": failures,
+    }
+
+
+def fraud_scoring_pipeline(run_id: str, target: str = FRAUD_SIGNALS_COLLECTION) -> list:
+    """
+    Une ligne de fraud_signals par charge (_id = id Stripe), marquée par run_id :
+      - vélocité par moyen de paiement et par client sur chaque fenêtre ;
+      - montant atypique : z-score par rapport aux paiements précédents du client ;
+      - rafales d'échecs du client sur chaque fenêtre.
+    """
+    history = {"documents": ["unbounded", -1]}
+    customer_output = {"_history": {"$count": {}, "window": history},
+                       "_history_avg": {"$avg": "$amount", "window": history},
+                       "_history_std": {"$stdDevPop": "$amount", "window": history}}
+    for window in FRAUD_WINDOWS:
+        customer_output[f"_cus_{window}"] = {"$count": {}, "window": _range(window)}
+        customer_output[f"_fail_{window}"] = {"$sum": "$_failed", "window": _range(window)}
+
+    return [
+        # Une charge au created illisible (chaîne, null...) ferait échouer $setWindowFields, et tout le chargement :
+        # elle n'est pas notée. $type laisse passer les tableaux de nombres, d'où le second filtre sur _ts.
+        {"$match": {
+            "id": {"$exists": True},
+            "$or": [{"created": {"$type": "number"}}, {"created": {"$type": "date"}}],
+        }},
+        {"$set": {
+            "_ts": _epoch_seconds("$created"),
+            "_failed": {"$cond": [{"$eq": ["$paid", True]}, 0, 1]},
+        }},
+        {"$match": {"_ts": {"$ne": None}}},
+        # Sans moyen de paiement (ou sans client), la charge forme sa propre partition
+        {"$setWindowFields": {
+            "partitionBy": {"$ifNull": ["$payment_method", "$id"]},
+            "sortBy": {"_ts": 1},
+            "output": {f"_pm_{window}": {"$count": {}, "window": _range(window)} for window in FRAUD_WINDOWS},
+        }},
+        {"$setWindowFields": {
+            "partitionBy": {"$ifNull": ["$customer_id", "$id"]},
+            "sortBy": {"_ts": 1},
+            "output": customer_output,
+        }},
+        {"$set": {"_zscore": {"$cond": [
+            {"$and": [{"$gte": ["$_history", MIN_HISTORY]}, {"$gt": ["$_history_std", 0]}]},
+            {"$divide": [{"$subtract": ["$amount", "$_history_avg"]}, "$_history_std"]},
+            0,
+        ]}}},
+        {"$project": {
+            "_id": "$id",
+            "customer_id": 1,
+            "payment_method": 1,
+            "amount": 1,
+            "currency": 1,
+            "paid": 1,
+            "created": 1,
+            "amount_zscore": {"$round": ["$_zscore", 2]},
+            "windows": {window: window_signals(window) for window in FRAUD_WINDOWS},
+            "run": {"$literal": run_id},
+        }},
+        {"$merge": {"into": target, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def score_charges(db, source: str = "charges", target: str = FRAUD_SIGNALS_COLLECTION) -> dict:
+    """
+    Recalcule target (fraud_signals) à partir de source (charges). $merge remplace les lignes en place :
+    la collection n'est jamais vide pour l'API ; les lignes d'un run précédent
+    (charges disparues) sont supprimées ensuite.
+    """
+    run_id = str(ObjectId())
+    started = time.perf_counter()
+    db[source].aggregate(fraud_scoring_pipeline(run_id, target), allowDiskUse=True)
+    removed = db[target].delete_many({"run": {"$ne": run_id}}).deleted_count
+
+    stats = {
+        "run": run_id,
+        "scored": db[target].count_documents({"run": run_id}),
+        "flagged": db[target].count_documents(fraud_signals_query(DEFAULT_FRAUD_WINDOW, DEFAULT_FRAUD_THRESHOLD)),
+        "removed": removed,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    print(
+        f"🕵️ Scored {stats['scored']} charges into '{target}' in {stats['seconds']}s "
+        f"({stats['flagged']} >= {DEFAULT_FRAUD_THRESHOLD:g} over {DEFAULT_FRAUD_WINDOW})"
+    )
+    return stats
+
+
+def score_field(window: str) -> str:
+    return f"windows.{window}.score"
+
+
+def fraud_signals_query(window: str, threshold: float) -> dict:
+    return {score_field(window): {"$gte": threshold}}
@@ -2,7 +2,20 @@ import os
 import json
 from pymongo import MongoClient
 from gcp import configure_gcp_credentials
-from nosql_io import load_latest_oltp_json_from_gcs
+from blob_cache import get_blob_cache
+from fraud_scoring import FRAUD_SIGNALS_COLLECTION, score_charges
+from loader_timings import StageTimings, loader_report, print_loader_report
+from nosql_io import blob_source_info, get_latest_oltp_dump_blob, local_copy, stream_oltp_json_blob
+from mongo_bulk import BULK_WORKERS, bulk_load, print_load_report
+from mongo_delta import DELTA_HASHES_COLLECTION, delta_load, hash_batches, print_delta_report
+from mongo_indexes import INDEXES, apply_indexes, record_index_version
+from mongo_metrics import CommandMetrics
+from mongo_normalize import LOAD_NORMALIZE, normalize_batches, print_normalize_report
+from snapshot_meta import (
+    evict_collection_sets, read_snapshot_metadata, reserve_collection_set, resolve_collection, versioned_name,
+    write_snapshot_metadata,
+)
+from storage_backend import STORAGE_BACKEND
 
 ENV = os.getenv("ENV", "DEV").upper()
 
@@ -16,27 +29,189 @@ print(f"🌍 ENV={ENV} → using Mongo URI: {MONGO_URI}")
 
 MONGO_DB = os.getenv("MONGO_DB", "supabase_snapshot")
 
-def insert_collections_into_mongo(data: dict, db_name: str):
-    client = MongoClient(MONGO_URI)
-    db = client[db_name]
+# snapshot : rechargement complet dans un nouveau jeu <nom>__v<n> (snapshot_meta)
+# delta : upserts/deletes des seuls documents modifiés, en place dans le jeu courant
+LOAD_MODE = os.getenv("LOAD_MODE", "snapshot").lower()
+
+# Latence des commandes Mongo du chargement (insert, createIndexes, aggregate...)
+command_metrics = CommandMetrics()
+
+def iter_collection_batches(data):
+    """
+    Normalise l'entrée du loader en tuples (collection_name, batch) :
+    accepte soit un dict complet, soit le générateur de stream_oltp_json_blob.
+    """
+    if not isinstance(data, dict):
+        yield from data
+        return
 
     for collection_name, records in data.items():
         if isinstance(records, list) and records:
-            print(f"📥 Inserting {len(records)} docs into MongoDB collection '{collection_name}'")
-            db[collection_name].drop()  # Optionnel : purger avant chaque snapshot
-            db[collection_name].insert_many(records)
+            yield collection_name, records
         else:
             print(f"⚠️ Empty or invalid data for '{collection_name}', skipping.")
 
+
+def prepare_batches(data, normalize_stats: dict = None):
+    # Normalisation par batch (mongo_normalize.OLTP_SCHEMAS) entre le parsing et l'écriture
+    batches = iter_collection_batches(data)
+    if LOAD_NORMALIZE:
+        batches = normalize_batches(batches, normalize_stats)
+    return batches
+
+
+def build_set_indexes(db, collection_name: str, physical: str, previous: str = None):
+    """
+    Construit les index d'une collection du nouveau jeu avant la bascule : ceux déclarés
+    dans mongo_indexes, ou à défaut une copie de ceux de la collection du jeu courant.
+    """
+    if collection_name in INDEXES:
+        created = apply_indexes(db, collection_name, physical)
+        print(f"🗂️ Built indexes {created} on '{physical}'")
+        return
+    if not previous or previous not in db.list_collection_names():
+        return
+    for index_name, info in db[previous].index_information().items():
+        if index_name == "_id_":
+            continue
+        keys = info.pop("key")
+        for internal in ("v", "ns"):
+            info.pop(internal, None)
+        db[physical].create_index(keys, name=index_name, **info)
+
+
+def collection_counts(db, collections: dict) -> dict:
+    """collections : {nom logique: collection physique}."""
+    return {name: db[physical].estimated_document_count() for name, physical in collections.items()}
+
+
+def current_collections(meta, collection_names) -> dict:
+    return {name: resolve_collection(meta, name) for name in collection_names}
+
+
+def refresh_fraud_signals(db, timings: StageTimings, charges: str, target: str):
+    # Scoring sur les charges du jeu servi (ou sur le point de l'être) : fraud_signals le suit toujours
+    with timings.stage("fraud"):
+        score_charges(db, charges, target)
+        apply_indexes(db, FRAUD_SIGNALS_COLLECTION, target)
+
+
+def insert_collections_into_mongo(
+    data, db_name: str, source: dict = None, timings: StageTimings = None, normalize_stats: dict = None
+):
+    timings = timings or StageTimings()
+    # Un seul client partagé par les threads d'insertion (+1 connexion pour les métadonnées)
+    client = MongoClient(MONGO_URI, maxPoolSize=BULK_WORKERS + 1, event_listeners=[command_metrics])
+    db = client[db_name]
+    previous = read_snapshot_metadata(db) or {}
+    collection_set = reserve_collection_set(db)
+    loaded = {}
+
+    def target(collection_name):
+        return versioned_name(collection_name, collection_set)
+
+    def prepare(collection_name):
+        print(f"📥 Inserting docs into MongoDB collection '{target(collection_name)}'")
+        db[target(collection_name)].drop()  # Résidu d'un chargement interrompu
+        loaded[collection_name] = target(collection_name)
+
+    try:
+        # Lecture/parsing et insertions s'entrelacent : le détail par collection est dans stats
+        with timings.stage("parse+insert"):
+            # Empreintes du delta insérées avec le jeu : le prochain delta part de ce contenu
+            stats = bulk_load(db, hash_batches(prepare_batches(data, normalize_stats)), prepare=prepare, target=target)
+        with timings.stage("indexes"):
+            for collection_name, physical in loaded.items():
+                build_set_indexes(db, collection_name, physical, resolve_collection(previous, collection_name))
+        if "charges" in loaded:
+            loaded[FRAUD_SIGNALS_COLLECTION] = target(FRAUD_SIGNALS_COLLECTION)
+            refresh_fraud_signals(db, timings, loaded["charges"], loaded[FRAUD_SIGNALS_COLLECTION])
+    except BaseException:
+        # Le jeu courant reste servi : on jette uniquement le nouveau jeu
+        print(f"❌ Load failed, dropping snapshot set {collection_set}. Current snapshot untouched.")
+        for physical in loaded.values():
+            db[physical].drop()
+        client.close()
+        raise
+
+    try:
+        # Empreintes jamais héritées du jeu précédent, même sans aucune à écrire (documents sans id)
+        loaded.setdefault(DELTA_HASHES_COLLECTION, target(DELTA_HASHES_COLLECTION))
+        # Collections absentes du dump : celles du jeu précédent restent servies
+        collections = {**(previous.get("collections") or {}), **loaded}
+        with timings.stage("activate"):
+            counts = collection_counts(db, {name: loaded[name] for name in stats if name != DELTA_HASHES_COLLECTION})
+            write_snapshot_metadata(
+                db, source or {}, counts, "snapshot", timings.as_dict(), collection_set, collections,
+            )
+        record_index_version(db)
+        evict_collection_sets(db)
+    finally:
+        client.close()
+
+    print_load_report(stats)
+    return stats
+
+
+def apply_delta_into_mongo(
+    data, db_name: str, source: dict = None, timings: StageTimings = None, normalize_stats: dict = None
+):
+    timings = timings or StageTimings()
+    client = MongoClient(MONGO_URI, event_listeners=[command_metrics])
+    db = client[db_name]
+    # Le delta s'applique en place au jeu courant
+    meta = read_snapshot_metadata(db) or {}
+    try:
+        with timings.stage("parse+delta"):
+            stats = delta_load(db, prepare_batches(data, normalize_stats),
+                               target=lambda name: resolve_collection(meta, name))
+        collections = current_collections(meta, stats)
+        with timings.stage("indexes"):
+            for collection_name, physical in collections.items():
+                apply_indexes(db, collection_name, physical)
+        charges = stats.get("charges")
+        if charges and (charges.upserts or charges.deletes):
+            fraud_signals = resolve_collection(meta, FRAUD_SIGNALS_COLLECTION)
+            refresh_fraud_signals(db, timings, collections["charges"], fraud_signals)
+        record_index_version(db)
+        write_snapshot_metadata(
+            db, source or {}, collection_counts(db, collections), "delta", timings.as_dict(),
+            meta.get("collection_set"), {**(meta.get("collections") or {}), **collections},
+        )
+    finally:
+        client.close()
+
+    print_delta_report(stats)
+    return stats
+
 def main():
-    print("🔐 Configuring GCP credentials...")
-    configure_gcp_credentials()
+    if STORAGE_BACKEND == "gcs":
+        print("🔐 Configuring GCP credentials...")
+        configure_gcp_credentials()
+
+    timings = StageTimings()
+    print(f"☁️ Streaming latest Supabase JSON dump ({STORAGE_BACKEND} storage)...")
+    with timings.stage("list"):
+        blob = get_latest_oltp_dump_blob()
+    with timings.stage("download"):
+        # Copie locale (cache) avant parsing ; sans cache, le téléchargement se fait pendant le parsing
+        cache = get_blob_cache()
+        local_copy(blob, cache)
+    data = stream_oltp_json_blob(blob, cache=cache)
 
-    print("☁️ Loading latest Supabase JSON dump from GCS...")
-    data = load_latest_oltp_json_from_gcs()
+    normalize_stats = {}
+    if LOAD_MODE == "delta":
+        print("🧬 Applying delta to MongoDB...")
+        stats = apply_delta_into_mongo(data, MONGO_DB, blob_source_info(blob), timings, normalize_stats)
+    else:
+        print("🧬 Inserting data into MongoDB...")
+        stats = insert_collections_into_mongo(data, MONGO_DB, blob_source_info(blob), timings, normalize_stats)
 
-    print("🧬 Inserting data into MongoDB...")
-    insert_collections_into_mongo(data, MONGO_DB)
+    print_normalize_report(normalize_stats)
+    collections = {name: entry.as_dict() for name, entry in stats.items()}
+    for name, entry in normalize_stats.items():
+        collections.setdefault(name, {})["normalize"] = entry.as_dict()
+    print_loader_report(loader_report(timings, collections, command_metrics.summary()))
 
     print("✅ All data loaded into MongoDB successfully.")
 
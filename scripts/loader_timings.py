@@ -0,0 +1,47 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+# Fichier JSON optionnel recevant les mesures d'un chargement (durées par étape, par collection, commandes Mongo)
+LOADER_METRICS_FILE = os.getenv("LOADER_METRICS_FILE")
+
+
+class StageTimings:
+    """Durées cumulées des étapes du loader : list, download, parse + insert, indexes, activate..."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def as_dict(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+        }
+
+
+def loader_report(timings: StageTimings, collections: dict = None, commands: dict = None) -> dict:
+    """Rapport structuré d'un chargement ; collections = {nom: stats.as_dict()}."""
+    return {**timings.as_dict(), "collections": collections or {}, "mongo_commands": commands or {}}
+
+
+def print_loader_report(report: dict, path=None):
+    stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["stages"].items())
+    print(f"⏱️ Stages: {stages} (total {report['total_seconds']:.2f}s)")
+    for name, entry in report["mongo_commands"].items():
+        print(f"  🛰️ {name}: {entry['count']} commands, mean {entry['mean_ms']}ms, max {entry['max_ms']}ms")
+
+    path = path or LOADER_METRICS_FILE
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Loader metrics written to {path}")
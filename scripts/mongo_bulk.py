@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Moteur de chargement : taille des chunks insert_many et nombre de threads d'insertion
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", 4))
+
+
+class CollectionLoadStats:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.docs = 0
+        self.chunks = 0
+        # Attente du batch suivant (lecture + parsing du dump) et durée cumulée des insert_many
+        self.read_seconds = 0.0
+        self.insert_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 3),
+            "docs_per_sec": round(self.docs_per_sec, 1),
+            "read_seconds": round(self.read_seconds, 3),
+            "insert_seconds": round(self.insert_seconds, 3),
+        }
+
+
+def iter_chunks(records: list, chunk_size: int):
+    for start in range(0, len(records), chunk_size):
+        yield records[start:start + chunk_size]
+
+
+def bulk_load(db, batches, chunk_size=None, workers=None, prepare=None, target=None) -> dict:
+    """
+    Charge des tuples (collection_name, records) dans MongoDB avec des insert_many
+    non ordonnés, répartis sur un pool de threads partageant le même MongoClient.
+
+    - prepare(collection_name) est appelé une seule fois par collection, avant son premier chunk.
+    - target(collection_name) renvoie le nom de la collection à écrire (par défaut le même).
+
+    Le nombre de chunks en vol est borné pour garder une mémoire proportionnelle
+    à chunk_size * workers. Renvoie {collection_name: CollectionLoadStats}.
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    workers = workers or BULK_WORKERS
+    target = target or (lambda name: name)
+
+    stats = {}
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    futures = []
+
+    def insert_chunk(collection_name, chunk):
+        try:
+            started = time.perf_counter()
+            db[target(collection_name)].insert_many(chunk, ordered=False)
+            with lock:
+                entry = stats[collection_name]
+                entry.docs += len(chunk)
+                entry.chunks += 1
+                entry.finished = time.perf_counter()
+                entry.insert_seconds += entry.finished - started
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-load") as executor:
+        try:
+            batches = iter(batches)
+            while True:
+                waited = time.perf_counter()
+                try:
+                    collection_name, records = next(batches)
+                except StopIteration:
+                    break
+                read_seconds = time.perf_counter() - waited
+
+                if collection_name not in stats:
+                    if prepare:
+                        prepare(collection_name)
+                    with lock:
+                        stats[collection_name] = CollectionLoadStats(collection_name)
+                with lock:
+                    stats[collection_name].read_seconds += read_seconds
+
+                for chunk in iter_chunks(records, chunk_size):
+                    in_flight.acquire()
+                    futures.append(executor.submit(insert_chunk, collection_name, chunk))
+
+                # Remonte au plus tôt une erreur d'insertion, sans attendre la fin du dump
+                failed = next((f for f in futures if f.done() and f.exception()), None)
+                if failed:
+                    failed.result()
+                futures = [f for f in futures if not f.done()]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        for future in futures:
+            future.result()
+
+    return stats
+
+
+def print_load_report(stats: dict):
+    total_docs = 0
+    for entry in stats.values():
+        total_docs += entry.docs
+        print(
+            f"📊 {entry.collection_name}: {entry.docs} docs in {entry.chunks} chunks, "
+            f"{entry.seconds:.2f}s ({entry.docs_per_sec:,.0f} docs/sec; "
+            f"read {entry.read_seconds:.2f}s, insert {entry.insert_seconds:.2f}s across workers)"
+        )
+    if stats:
+        started = min(entry.started for entry in stats.values())
+        finished = max(entry.finished for entry in stats.values())
+        elapsed = finished - started
+        rate = total_docs / elapsed if elapsed > 0 else 0.0
+        print(f"📊 Total: {total_docs} docs in {elapsed:.2f}s ({rate:,.0f} docs/sec)")
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+
+from pymongo import ReplaceOne, UpdateOne
+
+# Empreintes de contenu des documents, clé "<collection>/<id Stripe>".
+# Une collection par jeu de snapshot (_delta_hashes__v7), écrite pendant le chargement complet.
+DELTA_HASHES_COLLECTION = "_delta_hashes"
+DELTA_WRITE_CHUNK_SIZE = int(os.getenv("DELTA_WRITE_CHUNK_SIZE", 1000))
+
+
+def content_hash(doc: dict) -> str:
+    payload = {k: v for k, v in doc.items() if k != "_id"}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def hash_key(collection_name: str, doc_id) -> str:
+    return f"{collection_name}/{doc_id}"
+
+
+class CollectionDeltaStats:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.upserts = 0
+        self.deletes = 0
+        self.unchanged = 0
+        self.skipped = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "upserts": self.upserts,
+            "deletes": self.deletes,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+        }
+
+
+def load_known_hashes(db, collection_name: str, target_name: str = None, hashes_name: str = None) -> dict:
+    """
+    Renvoie {id: hash} pour chaque document live de la collection (target_name : son nom physique,
+    hashes_name : la collection d'empreintes de son jeu). Un document sans empreinte connue a la valeur None.
+    """
+    live = db[target_name or collection_name]
+    known = {doc["id"]: None for doc in live.find({"id": {"$exists": True}}, {"id": 1, "_id": 0})}
+    hashes = db[hashes_name or DELTA_HASHES_COLLECTION]
+    for entry in hashes.find({"collection": collection_name}, {"id": 1, "hash": 1}):
+        if entry["id"] in known:
+            known[entry["id"]] = entry["hash"]
+    return known
+
+
+def diff_records(records, known: dict, seen: set, entry: CollectionDeltaStats):
+    """Produit (id, doc, hash) pour chaque document nouveau ou modifié d'un batch."""
+    for doc in records:
+        doc_id = doc.get("id")
+        if doc_id is None:
+            entry.skipped += 1
+            continue
+        seen.add(doc_id)
+        digest = content_hash(doc)
+        if known.get(doc_id) == digest:
+            entry.unchanged += 1
+            continue
+        entry.upserts += 1
+        yield doc_id, doc, digest
+
+
+def hash_batches(batches):
+    """
+    Chargement complet : ajoute après chaque batch celui de ses empreintes (collection DELTA_HASHES_COLLECTION),
+    inséré avec le reste du jeu. Le premier delta qui suit ne réécrit ainsi que ce qui a changé.
+    """
+    for collection_name, records in batches:
+        # Calculées avant de céder le batch : insert_many y ajoute _id depuis un autre thread
+        hashes = [
+            {"_id": hash_key(collection_name, doc["id"]), "collection": collection_name, "id": doc["id"],
+             "hash": content_hash(doc)}
+            for doc in records if doc.get("id") is not None
+        ]
+        yield collection_name, records
+        if hashes:
+            yield DELTA_HASHES_COLLECTION, hashes
+
+
+def _flush(db, collection_name: str, doc_ops: list, hash_ops: list, hashes_name: str):
+    if doc_ops:
+        db[collection_name].bulk_write(doc_ops, ordered=False)
+        # Les empreintes sont écrites après les documents : un crash entre les deux
+        # provoque au pire une réécriture inutile au prochain run
+        db[hashes_name].bulk_write(hash_ops, ordered=False)
+        doc_ops.clear()
+        hash_ops.clear()
+
+
+def delta_load(db, batches, chunk_size=None, target=None) -> dict:
+    """
+    Applique un dump en mode incrémental : compare l'empreinte de chaque document
+    (clé = champ "id" Stripe) à celle du dernier chargement, puis n'envoie via bulk_write
+    que les upserts des documents nouveaux/modifiés et les suppressions des absents.
+    target(collection_name) renvoie la collection à écrire (par défaut la même),
+    target(DELTA_HASHES_COLLECTION) celle des empreintes du jeu.
+    Renvoie {collection_name: CollectionDeltaStats}.
+    """
+    chunk_size = chunk_size or DELTA_WRITE_CHUNK_SIZE
+    target = target or (lambda name: name)
+    hashes_name = target(DELTA_HASHES_COLLECTION)
+    db[hashes_name].create_index("collection")
+
+    stats, known, seen = {}, {}, {}
+    doc_ops, hash_ops = [], []
+    current = None
+
+    for collection_name, records in batches:
+        if collection_name != current:
+            if current is not None:
+                _flush(db, target(current), doc_ops, hash_ops, hashes_name)
+            current = collection_name
+        if collection_name not in stats:
+            print(f"🔍 Computing delta for MongoDB collection '{collection_name}'")
+            stats[collection_name] = CollectionDeltaStats(collection_name)
+            known[collection_name] = load_known_hashes(db, collection_name, target(collection_name), hashes_name)
+            seen[collection_name] = set()
+
+        for doc_id, doc, digest in diff_records(records, known[collection_name], seen[collection_name], stats[collection_name]):
+            doc_ops.append(ReplaceOne({"id": doc_id}, doc, upsert=True))
+            hash_ops.append(UpdateOne(
+                {"_id": hash_key(collection_name, doc_id)},
+                {"$set": {"collection": collection_name, "id": doc_id, "hash": digest}},
+                upsert=True,
+            ))
+            if len(doc_ops) >= chunk_size:
+                _flush(db, target(collection_name), doc_ops, hash_ops, hashes_name)
+
+    if current is not None:
+        _flush(db, target(current), doc_ops, hash_ops, hashes_name)
+
+    for collection_name, entry in stats.items():
+        removed = [doc_id for doc_id in known[collection_name] if doc_id not in seen[collection_name]]
+        for start in range(0, len(removed), chunk_size):
+            ids = removed[start:start + chunk_size]
+            db[target(collection_name)].delete_many({"id": {"$in": ids}})
+            db[hashes_name].delete_many({"_id": {"$in": [hash_key(collection_name, i) for i in ids]}})
+        entry.deletes = len(removed)
+        if entry.skipped:
+            print(f"⚠️ {entry.skipped} docs without 'id' in '{collection_name}', skipped in delta mode.")
+
+    return stats
+
+
+def forget_hashes(db, collection_names):
+    """
+    Jeux antérieurs aux empreintes par jeu : ils partagent DELTA_HASHES_COLLECTION, qui ne décrit pas
+    forcément leur contenu. À appeler quand l'un d'eux redevient courant.
+    """
+    db[DELTA_HASHES_COLLECTION].delete_many({"collection": {"$in": list(collection_names)}})
+
+
+def print_delta_report(stats: dict):
+    for entry in stats.values():
+        print(
+            f"📊 {entry.collection_name}: {entry.upserts} upserts, {entry.deletes} deletes, "
+            f"{entry.unchanged} unchanged"
+        )
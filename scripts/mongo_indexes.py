@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Incrémenter à chaque modification de INDEXES : le loader l'enregistre, l'API le vérifie
+INDEX_SPEC_VERSION = 4
+
+META_COLLECTION = "_meta"
+INDEX_META_ID = "indexes"
+
+# Unicité sur "id" limitée aux documents qui en ont un (find({"id": ...}) reste couvert)
+_HAS_ID = {"id": {"$exists": True}}
+
+
+def _unique_id():
+    return IndexModel([("id", ASCENDING)], name="id_unique", unique=True, partialFilterExpression=_HAS_ID)
+
+
+def _customer_created():
+    # Requêtes par client (/customers/{id}/overview, $lookup) triées du plus récent au plus ancien
+    return IndexModel([("customer_id", ASCENDING), ("created", DESCENDING)], name="customer_created")
+
+
+INDEXES = {
+    "customers": [
+        _unique_id(),
+        # /customers/search : préfixe ancré sur les clés en minuscules écrites par le loader
+        IndexModel([("search_keys", ASCENDING)], name="search_keys"),
+    ],
+    "subscriptions": [
+        _unique_id(),
+        # /subscriptions/active
+        IndexModel([("status", ASCENDING)], name="status"),
+        _customer_created(),
+    ],
+    "charges": [
+        _unique_id(),
+        _customer_created(),
+        # /stats/timeseries : plage sur created, index couvrant (aucun document lu sans filtre client)
+        IndexModel([("created", ASCENDING), ("status", ASCENDING), ("paid", ASCENDING), ("amount", ASCENDING)],
+                   name="created_timeseries"),
+    ],
+    "payment_intents": [
+        _unique_id(),
+        # /payment_intents/3ds
+        IndexModel(
+            [("payment_method_options.card.request_three_d_secure", ASCENDING)],
+            name="three_d_secure",
+            partialFilterExpression={"payment_method_options.card.request_three_d_secure": {"$exists": True}},
+        ),
+        _customer_created(),
+        IndexModel([("created", ASCENDING), ("status", ASCENDING), ("amount_received", ASCENDING)],
+                   name="created_timeseries"),
+    ],
+    "invoices": [
+        _unique_id(),
+        _customer_created(),
+    ],
+    # /charges/fraud?window=...&threshold=... : un index par fenêtre de fraud_scoring.FRAUD_WINDOWS
+    "fraud_signals": [
+        IndexModel([(f"windows.{window}.score", DESCENDING)], name=f"score_{window}")
+        for window in ("1h", "24h", "7d")
+    ],
+}
+
+
+def apply_indexes(db, collection_name: str, target_name: str = None) -> list:
+    """
+    Crée les index déclarés pour collection_name sur target_name (par défaut la collection elle-même,
+    sinon p. ex. sa version <nom>__v<n> d'un nouveau jeu). Renvoie les noms des index créés.
+    """
+    models = INDEXES.get(collection_name)
+    if not models:
+        return []
+    return db[target_name or collection_name].create_indexes(models)
+
+
+def record_index_version(db):
+    db[META_COLLECTION].update_one(
+        {"_id": INDEX_META_ID},
+        {"$set": {"version": INDEX_SPEC_VERSION, "applied_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def missing_indexes(db, collections: dict = None) -> dict:
+    """
+    Renvoie {collection_name: [index manquant, ...]} pour les collections live.
+    collections : noms physiques du snapshot courant (jeu versionné), par nom logique.
+    """
+    collections = collections or {}
+    existing_collections = set(db.list_collection_names())
+    missing = {}
+    for collection_name, models in INDEXES.items():
+        physical = collections.get(collection_name, collection_name)
+        if physical not in existing_collections:
+            continue
+        present = db[physical].index_information()
+        names = [m.document["name"] for m in models if m.document["name"] not in present]
+        if names:
+            missing[collection_name] = names
+    return missing
+
+
+def check_indexes(db, collections: dict = None) -> dict:
+    meta = db[META_COLLECTION].find_one({"_id": INDEX_META_ID}) or {}
+    report = {
+        "expected_version": INDEX_SPEC_VERSION,
+        "applied_version": meta.get("version"),
+        "missing": missing_indexes(db, collections),
+    }
+    report["ok"] = report["applied_version"] == INDEX_SPEC_VERSION and not report["missing"]
+    return report
@@ -0,0 +1,63 @@
+import threading
+
+from pymongo import monitoring
+
+# Bornes (secondes) des histogrammes de latence des commandes Mongo, reprises par /metrics
+COMMAND_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Listener PyMongo (event_listeners=[...]) : latence de chaque commande, agrégée par nom
+    (find, aggregate, insert, getMore...). Partagé par le loader et l'API.
+    """
+
+    def __init__(self, buckets=COMMAND_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.commands = {}
+
+    def _record(self, command_name: str, seconds: float, failed: bool):
+        with self._lock:
+            entry = self.commands.get(command_name)
+            if entry is None:
+                entry = self.commands[command_name] = {
+                    "count": 0,
+                    "failures": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "bucket_counts": [0] * len(self.buckets),
+                }
+            entry["count"] += 1
+            entry["failures"] += failed
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["bucket_counts"][i] += 1
+                    break
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.command_name, event.duration_micros / 1e6, False)
+
+    def failed(self, event):
+        self._record(event.command_name, event.duration_micros / 1e6, True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: {**entry, "bucket_counts": list(entry["bucket_counts"])} for name, entry in self.commands.items()}
+
+    def summary(self) -> dict:
+        """Vue compacte par commande : nombre, échecs, latence moyenne et max en ms."""
+        return {
+            name: {
+                "count": entry["count"],
+                "failures": entry["failures"],
+                "mean_ms": round(entry["seconds"] / entry["count"] * 1000, 2) if entry["count"] else 0.0,
+                "max_ms": round(entry["max_seconds"] * 1000, 2),
+            }
+            for name, entry in sorted(self.snapshot().items())
+        }
@@ -0,0 +1,260 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from bson.int64 import Int64
+
+# Normalisation des documents du dump avant écriture dans Mongo, batch par batch.
+# Même principe que nosql_io.OLAP_SCHEMAS, côté OLTP :
+#   "timestamp" -> date BSON UTC (epoch en secondes ou ISO 8601)
+#   "cents"     -> montant entier int64 (nombre, chaîne numérique)
+#   "bool"      -> booléen ("true"/"false", 0/1)
+#   "status"    -> vocabulaire fermé STATUS_VOCABULARY, "unknown" sinon (valeur brute dans status_raw)
+# Une valeur inconvertible devient None, la valeur brute est gardée dans <champ>_raw.
+# Un chemin pointé traverse les listes (items.data.plan.amount).
+LOAD_NORMALIZE = os.getenv("LOAD_NORMALIZE", "true").lower() == "true"
+# Supprime les sous-objets Stripe volumineux qu'aucun endpoint ne lit (PRUNED_FIELDS)
+NORMALIZE_PRUNE = os.getenv("NORMALIZE_PRUNE", "false").lower() == "true"
+
+OLTP_SCHEMAS = {
+    "customers": {
+        "created": "timestamp", "balance": "cents", "delinquent": "bool",
+    },
+    "subscriptions": {
+        "status": "status",
+        "created": "timestamp", "start_date": "timestamp", "current_period_start": "timestamp",
+        "current_period_end": "timestamp", "cancel_at": "timestamp", "canceled_at": "timestamp",
+        "ended_at": "timestamp", "trial_start": "timestamp", "trial_end": "timestamp",
+        "cancel_at_period_end": "bool",
+        "items.data.plan.amount": "cents", "items.data.price.unit_amount": "cents",
+    },
+    "charges": {
+        "status": "status",
+        "amount": "cents", "amount_captured": "cents", "amount_refunded": "cents",
+        "created": "timestamp",
+        "paid": "bool", "captured": "bool", "refunded": "bool",
+    },
+    "payment_intents": {
+        "status": "status",
+        "amount": "cents", "amount_capturable": "cents", "amount_received": "cents",
+        "created": "timestamp", "canceled_at": "timestamp",
+    },
+    "invoices": {
+        "status": "status",
+        "amount_due": "cents", "amount_paid": "cents", "amount_remaining": "cents",
+        "subtotal": "cents", "tax": "cents", "total": "cents",
+        "created": "timestamp", "due_date": "timestamp", "period_start": "timestamp", "period_end": "timestamp",
+        "paid": "bool",
+    },
+}
+
+# Statuts Stripe documentés, par collection
+STATUS_VOCABULARY = {
+    "subscriptions": {"incomplete", "incomplete_expired", "trialing", "active", "past_due", "canceled", "unpaid", "paused"},
+    "charges": {"succeeded", "pending", "failed"},
+    "payment_intents": {
+        "requires_payment_method", "requires_confirmation", "requires_action", "processing",
+        "requires_capture", "canceled", "succeeded",
+    },
+    "invoices": {"draft", "open", "paid", "uncollectible", "void"},
+}
+UNKNOWN_STATUS = "unknown"
+
+PRUNED_FIELDS = {
+    "customers": ["sources", "subscriptions", "tax_ids", "invoice_settings"],
+    "charges": ["source", "payment_method_details", "billing_details", "refunds"],
+    "payment_intents": ["charges", "next_action", "last_payment_error"],
+    "invoices": ["lines", "status_transitions"],
+}
+
+# Clés de recherche par préfixe (/customers/search) : valeurs en minuscules, nom complet et chacun de ses mots
+SEARCH_FIELDS = {"customers": ["name", "email"]}
+SEARCH_KEYS_FIELD = "search_keys"
+
+
+class InvalidValue(ValueError):
+    pass
+
+
+def _from_epoch(seconds, value):
+    # Epoch en millisecondes, NaN ou flottant démesuré : hors des dates représentables
+    try:
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise InvalidValue(value)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, bool):
+        raise InvalidValue(value)
+    if isinstance(value, (int, float)):
+        return _from_epoch(value, value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            seconds = float(text)
+        except ValueError:
+            seconds = None
+        if seconds is not None:
+            return _from_epoch(seconds, value)
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            raise InvalidValue(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    raise InvalidValue(value)
+
+
+def to_cents(value):
+    if isinstance(value, bool):
+        raise InvalidValue(value)
+    if isinstance(value, int):
+        return value if isinstance(value, Int64) else Int64(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidValue(value)
+    if number != number or number in (float("inf"), float("-inf")):
+        raise InvalidValue(value)
+    return Int64(round(number))
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "false", "1", "0"):
+        return value.strip().lower() in ("true", "1")
+    raise InvalidValue(value)
+
+
+_CONVERTERS = {"timestamp": to_datetime, "cents": to_cents, "bool": to_bool}
+
+
+class CollectionNormalizeStats:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.docs = 0
+        self.converted = 0
+        # Valeurs inconvertibles, remplacées par None : {champ: nombre}
+        self.invalid = {}
+        self.unknown_statuses = 0
+        self.pruned = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "docs": self.docs,
+            "converted": self.converted,
+            "invalid": dict(self.invalid),
+            "unknown_statuses": self.unknown_statuses,
+            "pruned": self.pruned,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _convert_path(container, parts: list, field: str, kind: str, stats: CollectionNormalizeStats):
+    if isinstance(container, list):
+        for item in container:
+            _convert_path(item, parts, field, kind, stats)
+        return
+    if not isinstance(container, dict) or parts[0] not in container:
+        return
+    if len(parts) > 1:
+        _convert_path(container[parts[0]], parts[1:], field, kind, stats)
+        return
+
+    value = container[parts[0]]
+    if value is None:
+        return
+    try:
+        converted = _CONVERTERS[kind](value)
+    except InvalidValue:
+        stats.invalid[field] = stats.invalid.get(field, 0) + 1
+        container[f"{parts[0]}_raw"] = value
+        container[parts[0]] = None
+        return
+    container[parts[0]] = converted
+    # int -> Int64 n'est qu'un changement de type BSON : seules les vraies conversions sont comptées
+    if type(converted) is not type(value) and not (kind == "cents" and type(value) is int):
+        stats.converted += 1
+
+
+def normalize_status(doc: dict, vocabulary: set, stats: CollectionNormalizeStats):
+    raw = doc.get("status")
+    if raw is None:
+        return
+    status = str(raw).strip().lower().replace("-", "_").replace(" ", "_")
+    if status not in vocabulary:
+        doc["status_raw"] = raw
+        status = UNKNOWN_STATUS
+        stats.unknown_statuses += 1
+    if status != raw:
+        doc["status"] = status
+        stats.converted += 1
+
+
+def search_keys(doc: dict, fields: list) -> list:
+    keys = set()
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, str) and value.strip():
+            words = value.casefold().split()
+            keys.add(" ".join(words))
+            keys.update(words)
+    return sorted(keys)
+
+
+def normalize_batch(collection_name: str, records: list, stats: CollectionNormalizeStats, prune: bool = None) -> list:
+    """Normalise les documents du batch en place (aucune copie) et les renvoie."""
+    schema = OLTP_SCHEMAS.get(collection_name, {})
+    vocabulary = STATUS_VOCABULARY.get(collection_name)
+    pruned = PRUNED_FIELDS.get(collection_name, []) if (NORMALIZE_PRUNE if prune is None else prune) else []
+    paths = [(field, field.split("."), kind) for field, kind in schema.items() if kind != "status"]
+    searchable = SEARCH_FIELDS.get(collection_name)
+
+    for doc in records:
+        if not isinstance(doc, dict):
+            continue
+        for field, parts, kind in paths:
+            _convert_path(doc, parts, field, kind, stats)
+        if vocabulary and "status" in schema:
+            normalize_status(doc, vocabulary, stats)
+        if searchable:
+            doc[SEARCH_KEYS_FIELD] = search_keys(doc, searchable)
+        for field in pruned:
+            if doc.pop(field, None) is not None:
+                stats.pruned += 1
+    stats.docs += len(records)
+    return records
+
+
+def normalize_batches(batches, stats: dict = None, prune: bool = None):
+    """
+    Enveloppe un itérateur de (collection_name, batch) : chaque batch est normalisé
+    au passage. stats reçoit {collection_name: CollectionNormalizeStats}.
+    """
+    stats = {} if stats is None else stats
+    for collection_name, records in batches:
+        entry = stats.get(collection_name)
+        if entry is None:
+            entry = stats[collection_name] = CollectionNormalizeStats(collection_name)
+        started = time.perf_counter()
+        normalize_batch(collection_name, records, entry, prune)
+        entry.seconds += time.perf_counter() - started
+        yield collection_name, records
+
+
+def print_normalize_report(stats: dict):
+    for entry in stats.values():
+        invalid = sum(entry.invalid.values())
+        print(
+            f"🧹 {entry.collection_name}: {entry.converted} values normalized in {entry.seconds:.2f}s"
+            f" ({invalid} invalid, {entry.unknown_statuses} unknown statuses, {entry.pruned} fields pruned)"
+        )
+        if entry.invalid:
+            print(f"⚠️ {entry.collection_name}: invalid values set to null: {entry.invalid}")
@@ -1,11 +1,14 @@
 from pymongo import MongoClient
+from snapshot_meta import read_snapshot_metadata, resolve_collection
 
 client = MongoClient("mongodb://localhost:27017")
 db = client["supabase_snapshot"]
+# Collection physique du jeu de snapshot courant (charges__v<n>)
+charges = db[resolve_collection(read_snapshot_metadata(db), "charges")]
 
 # Charges suspectes
 print("Charges > 1000€ :")
-for doc in db["charges"].find({"amount": {"$gt": 1000}}):
+for doc in charges.find({"amount": {"$gt": 1000}}):
     print(doc)
 
 # Clients avec plusieurs paiements
@@ -14,5 +17,5 @@ pipeline = [
     {"$match": {"count": {"$gt": 1}}}
 ]
 print("Clients multi-paiements :")
-for doc in db["charges"].aggregate(pipeline):
+for doc in charges.aggregate(pipeline):
     print(doc)
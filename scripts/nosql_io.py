@@ -1,135 +1,624 @@
 import os
 import re
 import json
+import time
 from io import BytesIO
 from pathlib import Path
 from datetime import timezone
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
-from google.cloud import storage
+from blob_cache import MappedTextReader, get_blob_cache
+from dump_parts import DumpParts, iter_parts_parallel, part_collection, part_spec
+from storage_backend import get_storage_backend
 
 load_dotenv()
 
 GCS_BUCKET = os.getenv("GCS_BUCKET")
 ENV = os.getenv("ENV", "DEV").upper()
 
+# Streaming du dump : taille des lectures GCS et nombre de documents par batch
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 8 * 1024 * 1024))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+
+# Pointeur vers la dernière sortie, écrit à la racine de chaque préfixe (dump/, olap_outputs/)
+LATEST_MANIFEST = "_LATEST.json"
+DUMP_NAME_PATTERN = re.compile(r"db_dump_prod_.*\.json$")
+# Dump découpé (dump_parts) : un dossier par dump, une partie NDJSON compressée par collection
+DUMP_DIR_PATTERN = re.compile(r"db_dump_prod_[^/]*/$")
+# Téléchargements simultanés des parties vers le cache local
+DUMP_DOWNLOAD_WORKERS = int(os.getenv("DUMP_DOWNLOAD_WORKERS", 8))
+OLAP_TABLES = [
+    "fact_invoices",
+    "dim_customers",
+    "dim_products",
+    "dim_prices",
+    "dim_payment_methods",
+    "dim_subscriptions",
+    "dim_payment_intents",
+    "dim_charges",
+]
+
+# Format des sorties OLAP : csv (historique) ou parquet (colonnes typées, compressé)
+OLAP_FORMAT = os.getenv("OLAP_FORMAT", "csv").lower()
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 100_000))
+# Taille des morceaux envoyés par l'upload résumable GCS (multiple de 256 KB)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Téléchargements OLAP en parallèle (I/O réseau : les threads suffisent)
+OLAP_DOWNLOAD_WORKERS = int(os.getenv("OLAP_DOWNLOAD_WORKERS", 8))
+
+# Types déclarés par table OLAP, appliqués après le parsing (moteur pyarrow) aux seules colonnes présentes :
+#   "string"    -> string[pyarrow] (ids, emails : bien plus compact que des objets Python)
+#   "category"  -> vocabulaires fermés (status, currency, type...)
+#   "cents"     -> montants Stripe en centimes, entiers nullables Int64
+#   "timestamp" -> datetime64 UTC (epoch en secondes ou ISO 8601)
+#   "bool"      -> booléen nullable
+OLAP_SCHEMAS = {
+    "fact_invoices": {
+        "id": "string", "customer_id": "string", "subscription_id": "string",
+        "status": "category", "currency": "category", "billing_reason": "category",
+        "amount_due": "cents", "amount_paid": "cents", "amount_remaining": "cents",
+        "subtotal": "cents", "tax": "cents", "total": "cents",
+        "created": "timestamp", "due_date": "timestamp", "period_start": "timestamp", "period_end": "timestamp",
+        "paid": "bool",
+    },
+    "dim_customers": {
+        "id": "string", "email": "string", "name": "string",
+        "currency": "category", "balance": "cents", "delinquent": "bool", "created": "timestamp",
+    },
+    "dim_products": {
+        "id": "string", "name": "string", "type": "category", "active": "bool", "created": "timestamp",
+    },
+    "dim_prices": {
+        "id": "string", "product_id": "string", "currency": "category", "type": "category",
+        "recurring_interval": "category", "unit_amount": "cents", "active": "bool", "created": "timestamp",
+    },
+    "dim_payment_methods": {
+        "id": "string", "customer_id": "string", "type": "category",
+        "card_brand": "category", "card_country": "category", "created": "timestamp",
+    },
+    "dim_subscriptions": {
+        "id": "string", "customer_id": "string", "status": "category", "collection_method": "category",
+        "created": "timestamp", "start_date": "timestamp", "current_period_start": "timestamp",
+        "current_period_end": "timestamp", "cancel_at": "timestamp", "canceled_at": "timestamp",
+        "ended_at": "timestamp", "trial_start": "timestamp", "trial_end": "timestamp",
+        "cancel_at_period_end": "bool",
+    },
+    "dim_payment_intents": {
+        "id": "string", "customer_id": "string", "payment_method": "string",
+        "status": "category", "currency": "category", "amount": "cents", "amount_received": "cents",
+        "created": "timestamp",
+    },
+    "dim_charges": {
+        "id": "string", "customer_id": "string", "payment_intent": "string", "payment_method": "string",
+        "status": "category", "currency": "category", "amount": "cents", "amount_refunded": "cents",
+        "paid": "bool", "refunded": "bool", "created": "timestamp",
+    },
+}
+
+
+def read_latest_manifest(backend, prefix: str):
+    """Lit le pointeur "latest" d'un préfixe (une seule requête). None s'il est absent ou illisible."""
+    name = f"{prefix}{LATEST_MANIFEST}"
+    try:
+        return json.loads(backend.read_bytes(name))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"⚠️ Ignoring unreadable manifest {backend.uri(name)}: {e}")
+        return None
+
+
+def write_latest_manifest(backend, prefix: str, manifest: dict):
+    # Pas de cache HTTP sur le pointeur : les lecteurs doivent voir la dernière version
+    backend.upload(
+        f"{prefix}{LATEST_MANIFEST}",
+        json.dumps(manifest, default=str),
+        content_type="application/json",
+        cache_control="no-cache",
+    )
 
-def configure_storage_client():
-    return storage.Client()
 
+def list_subfolders(backend, prefix: str) -> list:
+    """Sous-dossiers directs de prefix via delimiter : un résultat par dossier, pas par objet."""
+    _, prefixes = backend.list(prefix, delimiter="/")
+    return sorted(prefixes)
+
+
+def get_dump_parts(backend, folder: str):
+    """DumpParts d'un dossier de dump, None s'il ne contient aucune partie NDJSON."""
+    objects, _ = backend.list(folder, delimiter="/")
+    parts = [obj for obj in objects if part_collection(obj.name)]
+    return DumpParts(backend, folder, parts) if parts else None
+
+
+def get_dump(backend, name: str):
+    """Dump désigné par le manifest : un fichier JSON, ou un dossier de parties (nom terminé par "/")."""
+    return get_dump_parts(backend, name) if name.endswith("/") else backend.stat(name)
 
-def load_latest_oltp_json_from_gcs(bucket_name=None, prefix="dump/") -> dict:
-    if bucket_name is None:
-        bucket_name = GCS_BUCKET
 
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
+def _list_dumps(backend, prefix: str) -> list:
+    # Uniquement les objets directement sous prefix (delimiter), sans descendre dans les sous-dossiers ;
+    # chaque dossier de dump découpé compte pour un dump
+    objects, folders = backend.list(prefix, delimiter="/")
+    dumps = [obj for obj in objects if DUMP_NAME_PATTERN.search(obj.name)]
+    for folder in folders:
+        if DUMP_DIR_PATTERN.search(folder):
+            parts = get_dump_parts(backend, folder)
+            if parts is not None:
+                dumps.append(parts)
+    return dumps
 
-    dump_blobs = [b for b in blobs if re.search(r"db_dump_prod_.*\.json$", b.name)]
 
+def get_latest_oltp_dump_blob(bucket_name=None, prefix="dump/"):
+    backend = get_storage_backend(bucket_name)
+
+    manifest = read_latest_manifest(backend, prefix)
+    if manifest and manifest.get("blob"):
+        latest_blob = get_dump(backend, manifest["blob"])
+        if latest_blob is not None:
+            print(f"📦 Latest dump (manifest): {latest_blob.name} (Last modified: {latest_blob.updated})")
+            return latest_blob
+        print(f"⚠️ Manifest points to missing dump {manifest['blob']}, falling back to listing")
+
+    dump_blobs = _list_dumps(backend, prefix)
     if not dump_blobs:
-        raise FileNotFoundError(f"No valid dump files found in bucket '{bucket_name}/{prefix}'")
+        raise FileNotFoundError(f"No valid dump files found in '{backend.uri(prefix)}'")
 
     latest_blob = max(dump_blobs, key=lambda b: b.updated)
     print(f"📦 Latest dump found: {latest_blob.name} (Last modified: {latest_blob.updated})")
+    return latest_blob
+
+
+def publish_latest_dump(blob_name=None, bucket_name=None, prefix="dump/") -> dict:
+    """
+    Écrit dump/_LATEST.json, à appeler par le producteur juste après l'upload d'un dump.
+    Sans blob_name, publie le plus récent trouvé par listing (amorçage d'un bucket existant).
+    """
+    backend = get_storage_backend(bucket_name)
+    if blob_name is None:
+        blobs = _list_dumps(backend, prefix)
+        if not blobs:
+            raise FileNotFoundError(f"No valid dump files found in '{backend.uri(prefix)}'")
+        blob = max(blobs, key=lambda b: b.updated)
+    else:
+        blob = get_dump(backend, blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"Dump {backend.uri(blob_name)} not found")
+
+    manifest = {"blob": blob.name, "generation": blob.generation, "updated": blob.updated.isoformat()}
+    write_latest_manifest(backend, prefix, manifest)
+    print(f"📌 Published latest dump manifest: {blob.name}")
+    return manifest
+
+
+def local_copy(blob, cache=None):
+    """
+    Chemin d'un fichier local lisible directement (mmap) : le fichier lui-même avec le backend
+    local, sa copie en cache sinon. None si l'objet doit être lu en flux depuis le backend.
+    Pour un dump découpé, {nom de partie: chemin ou None}, parties téléchargées en parallèle.
+    """
+    if isinstance(blob, DumpParts):
+        with ThreadPoolExecutor(max_workers=DUMP_DOWNLOAD_WORKERS) as pool:
+            paths = pool.map(lambda part: local_copy(part, cache), blob.parts)
+            return {part.name: path for part, path in zip(blob.parts, paths)}
+    path = blob.backend.local_path(blob.name)
+    if path is not None:
+        return path
+    if cache is not None:
+        return cache.fetch(blob)
+    return None
 
-    raw_bytes = latest_blob.download_as_bytes()
-    return json.load(BytesIO(raw_bytes))
-
-def get_latest_olap_gcs_path(bucket_name: str, prefix="olap_outputs/") -> str:
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
-
-    time_folders = sorted(
-        {b.name.split("/")[1] for b in blobs if b.name.count("/") > 1},
-        reverse=True
-    )
 
+def load_latest_oltp_json_from_gcs(bucket_name=None, prefix="dump/") -> dict:
+    latest_blob = get_latest_oltp_dump_blob(bucket_name, prefix)
+    if isinstance(latest_blob, DumpParts):
+        data = {}
+        for collection_name, batch in stream_oltp_json_blob(latest_blob, cache=get_blob_cache()):
+            data.setdefault(collection_name, []).extend(batch)
+        return data
+    path = local_copy(latest_blob, get_blob_cache())
+    if path is not None:
+        with open(path, "rb") as f:
+            return json.load(f)
+    return json.loads(latest_blob.backend.read_bytes(latest_blob.name))
+
+
+def stream_latest_oltp_json_from_gcs(bucket_name=None, prefix="dump/", batch_size=None):
+    """
+    Version streaming de load_latest_oltp_json_from_gcs : lit le dump par morceaux
+    et produit des tuples (collection_name, batch_of_records) au fil du parsing.
+    La mémoire consommée dépend de batch_size, pas de la taille du dump.
+    """
+    latest_blob = get_latest_oltp_dump_blob(bucket_name, prefix)
+    yield from stream_oltp_json_blob(latest_blob, batch_size, get_blob_cache())
+
+
+def stream_oltp_json_blob(blob, batch_size=None, cache=None):
+    """
+    Fichier local (backend local ou BlobCache) lu via mmap ; sinon flux depuis le backend.
+    Dump découpé : parties parsées en parallèle (dump_parts.iter_parts_parallel).
+    """
+    if isinstance(blob, DumpParts):
+        paths = local_copy(blob, cache)
+        specs = [part_spec(part, paths[part.name]) for part in blob.parts]
+        yield from iter_parts_parallel(specs, batch_size or STREAM_BATCH_SIZE)
+        return
+    path = local_copy(blob, cache)
+    if path is not None:
+        fp = MappedTextReader(path)
+    else:
+        fp = blob.open("rt", encoding="utf-8", chunk_size=STREAM_CHUNK_SIZE)
+    with fp:
+        yield from iter_json_collections(fp, batch_size or STREAM_BATCH_SIZE)
+
+
+def blob_source_info(blob) -> dict:
+    """Identité du dump chargé, enregistrée dans les métadonnées du snapshot Mongo."""
+    return {"name": blob.name, "generation": blob.generation, "updated": blob.updated}
+
+
+class _JsonStream:
+    """Tampon de lecture minimal au-dessus d'un flux texte, pour JSONDecoder.raw_decode."""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, *expected) -> str:
+        char = self.peek()
+        if char not in expected:
+            found = repr(char) if char else "end of stream"
+            raise ValueError(f"Invalid JSON dump: expected one of {expected}, got {found}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+                # Un nombre en fin de tampon peut être tronqué : on attend le séparateur
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def iter_json_collections(fp, batch_size=None, chunk_size=None):
+    """
+    Parse incrémentalement un dump de la forme {"collection": [ {...}, ... ], ...}
+    et produit (collection_name, batch) pour chaque tableau de premier niveau.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    stream = _JsonStream(fp, chunk_size or STREAM_CHUNK_SIZE)
+
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        collection_name = stream.value()
+        if not isinstance(collection_name, str):
+            raise ValueError(f"Invalid JSON dump: expected a collection name, got {collection_name!r}")
+        stream.take(":")
+
+        if stream.peek() != "[":
+            stream.value()
+            print(f"⚠️ Empty or invalid data for '{collection_name}', skipping.")
+        else:
+            stream.take("[")
+            batch, count = [], 0
+            if stream.peek() == "]":
+                stream.take("]")
+            else:
+                while True:
+                    batch.append(stream.value())
+                    count += 1
+                    if len(batch) >= batch_size:
+                        yield collection_name, batch
+                        batch = []
+                    if stream.take(",", "]") == "]":
+                        break
+            if batch:
+                yield collection_name, batch
+            if not count:
+                print(f"⚠️ Empty or invalid data for '{collection_name}', skipping.")
+
+        if stream.take(",", "}") == "}":
+            return
+
+
+def find_latest_olap_run(backend, prefix="olap_outputs/"):
+    """
+    Dernier dossier horodaté complet et son format (csv/parquet) : lus dans le manifest (O(1)),
+    sinon listing des seuls sous-dossiers (delimiter) pour les buckets écrits avant le manifest.
+    Si le manifest existe sans run complet (premier run en cours), None : pas de listing,
+    qui pourrait renvoyer le dossier à moitié écrit.
+    """
+    manifest = read_latest_manifest(backend, prefix)
+    if manifest is not None:
+        if not manifest.get("latest"):
+            print(f"⚠️ No complete OLAP run yet in {backend.uri(prefix)} (pending: {manifest.get('pending')})")
+            return None
+        latest_folder = manifest["latest"]
+        print(f"📁 Latest OLAP output folder (manifest): {latest_folder}")
+        return latest_folder, manifest.get("format", "csv")
+
+    time_folders = [folder[len(prefix):].rstrip("/") for folder in list_subfolders(backend, prefix)]
     if not time_folders:
         raise FileNotFoundError("No OLAP output folders found.")
 
-    latest_folder = time_folders[0]
+    latest_folder = max(time_folders)
     print(f"📁 Latest OLAP output folder: {latest_folder}")
-    return f"{prefix}{latest_folder}/"
+    return latest_folder, OLAP_FORMAT
 
 
-def load_latest_olap_outputs(bucket_name: str, prefix="olap_outputs/") -> dict:
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blobs = list(bucket.list_blobs(prefix=prefix))
+def find_latest_olap_folder(backend, prefix="olap_outputs/"):
+    run = find_latest_olap_run(backend, prefix)
+    return run[0] if run else None
 
-    # Trouve les noms de dossiers horodatés
-    time_folders = sorted(
-        {b.name.split("/")[1] for b in blobs if b.name.count("/") > 1},
-        reverse=True
-    )
 
-    if not time_folders:
-        raise FileNotFoundError("No OLAP output folders found.")
+def require_latest_olap_run(backend, prefix="olap_outputs/") -> tuple:
+    run = find_latest_olap_run(backend, prefix)
+    if run is None:
+        raise FileNotFoundError(f"No complete OLAP run yet in {backend.uri(prefix)}.")
+    return run
 
-    latest_folder = time_folders[0]
-    print(f"📁 Latest OLAP output folder: {latest_folder}")
 
-    expected_files = [
-        "fact_invoices.csv",
-        "dim_customers.csv",
-        "dim_products.csv",
-        "dim_prices.csv",
-        "dim_payment_methods.csv",
-        "dim_subscriptions.csv",
-        "dim_payment_intents.csv",  
-        "dim_charges.csv"           
-    ]
+def get_latest_olap_gcs_path(bucket_name: str, prefix="olap_outputs/") -> str:
+    backend = get_storage_backend(bucket_name)
+    return f"{prefix}{require_latest_olap_run(backend, prefix)[0]}/"
+
+
+def _to_timestamp(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_datetime(series, unit="s", utc=True)
+    return pd.to_datetime(series, utc=True, errors="coerce")
+
+
+_OLAP_CASTS = {
+    "string": lambda s: s.astype("string[pyarrow]"),
+    "category": lambda s: s.astype("category"),
+    "cents": lambda s: s.astype("Int64"),
+    "timestamp": _to_timestamp,
+    "bool": lambda s: s.astype("boolean"),
+}
+
+# Types Parquet correspondant aux types déclarés dans OLAP_SCHEMAS
+_PARQUET_TYPES = {
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "cents": pa.int64(),
+    "timestamp": pa.timestamp("ns", tz="UTC"),
+    "bool": pa.bool_(),
+}
+
+
+def apply_olap_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        try:
+            df[column] = _OLAP_CASTS[kind](df[column])
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Keeping inferred dtype for column '{column}' ({kind}): {e}")
+    return df
+
+
+def read_olap_csv(source, table: str, columns=None) -> pd.DataFrame:
+    """source : contenu en bytes ou chemin d'un fichier local."""
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    df = pd.read_csv(source, engine="pyarrow", usecols=columns)
+    return apply_olap_schema(df, OLAP_SCHEMAS.get(table, {}))
+
+
+def read_olap_parquet(source, table: str, columns=None) -> pd.DataFrame:
+    # Seules les colonnes demandées sont décodées ; les types pandas sont restaurés depuis le fichier
+    if isinstance(source, bytes):
+        table_data = pq.read_table(BytesIO(source), columns=columns)
+    else:
+        table_data = pq.read_table(source, columns=columns, memory_map=True)
+    return apply_olap_schema(table_data.to_pandas(), OLAP_SCHEMAS.get(table, {}))
+
+
+def _load_olap_file(backend, blob_path: str, table: str, fmt: str, columns=None, cache=None):
+    started = time.perf_counter()
+    source = backend.local_path(blob_path)
+    if source is None and cache is not None:
+        blob = backend.stat(blob_path)
+        if blob is None:
+            raise FileNotFoundError(backend.uri(blob_path))
+        source = cache.fetch(blob)
+    if source is not None:
+        size = source.stat().st_size
+    else:
+        source = backend.read_bytes(blob_path)
+        size = len(source)
+    downloaded = time.perf_counter()
+    if fmt == "parquet":
+        df = read_olap_parquet(source, table, columns)
+    else:
+        df = read_olap_csv(source, table, columns)
+    parsed = time.perf_counter()
+    return df, {
+        "table": table,
+        "bytes": size,
+        "rows": len(df),
+        "download_s": round(downloaded - started, 3),
+        "parse_s": round(parsed - downloaded, 3),
+        "memory_bytes": int(df.memory_usage(deep=True).sum()),
+    }
+
+
+def load_olap_folder(backend, folder_path: str, workers=None, fmt="csv", columns=None, cache=None):
+    """
+    Télécharge et parse les fichiers OLAP d'un dossier en parallèle. Renvoie (dataframes, timings).
+    columns : {table: [colonnes]} pour ne lire qu'une partie des colonnes.
+    cache : BlobCache optionnel, les fichiers déjà présents localement ne sont pas retéléchargés.
+    """
+    columns = columns or {}
+    with ThreadPoolExecutor(max_workers=workers or OLAP_DOWNLOAD_WORKERS) as executor:
+        loaded = list(executor.map(
+            lambda table: _load_olap_file(
+                backend, f"{folder_path}{table}.{fmt}", table, fmt, columns.get(table), cache
+            ),
+            OLAP_TABLES,
+        ))
+    return {table: df for table, (df, _) in zip(OLAP_TABLES, loaded)}, [stats for _, stats in loaded]
+
+
+def print_olap_load_report(timings: list, elapsed: float):
+    for t in timings:
+        print(
+            f"  📄 {t['table']}: {t['rows']} rows, {t['bytes'] / 1e6:.2f} MB, "
+            f"download {t['download_s']}s, parse {t['parse_s']}s, {t['memory_bytes'] / 1e6:.2f} MB in memory"
+        )
+    total_memory = sum(t["memory_bytes"] for t in timings)
+    print(f"⏱️ Loaded {len(timings)} OLAP files in {elapsed:.2f}s, DataFrames use {total_memory / 1e6:.2f} MB")
+
+
+def load_latest_olap_outputs(bucket_name: str, prefix="olap_outputs/", columns=None) -> dict:
+    backend = get_storage_backend(bucket_name)
+    latest_folder, fmt = require_latest_olap_run(backend, prefix)
+
+    started = time.perf_counter()
+    result, timings = load_olap_folder(
+        backend, f"{prefix}{latest_folder}/", fmt=fmt, columns=columns, cache=get_blob_cache()
+    )
+    print_olap_load_report(timings, time.perf_counter() - started)
+    return result
 
-    result = {}
-    for fname in expected_files:
-        blob_path = f"{prefix}{latest_folder}/{fname}"
-        blob = bucket.blob(blob_path)
-        content = blob.download_as_bytes()
-        df = pd.read_csv(BytesIO(content))
-        result[fname.replace(".csv", "")] = df
 
-    return result
+def record_olap_output(backend, timestamp: str, filename: str, prefix="olap_outputs/") -> dict:
+    """
+    Met à jour le manifest après l'écriture d'un fichier OLAP. Le run en cours reste dans
+    "pending" ; "latest" ne bascule qu'une fois toutes les tables attendues écrites,
+    les lecteurs ne voient donc jamais un dossier à moitié rempli.
+    """
+    table, fmt = filename.rsplit(".", 1)
+    manifest = read_latest_manifest(backend, prefix) or {}
+    pending = manifest.get("pending") or {}
+    if pending.get("folder") != timestamp or pending.get("format", "csv") != fmt:
+        pending = {"folder": timestamp, "format": fmt, "files": []}
+    if filename not in pending["files"]:
+        pending["files"].append(filename)
+
+    if set(OLAP_TABLES) <= {name.rsplit(".", 1)[0] for name in pending["files"]}:
+        manifest["latest"] = timestamp
+        manifest["format"] = fmt
+        manifest["files"] = sorted(pending["files"])
+        manifest.pop("pending", None)
+        print(f"📌 OLAP manifest now points to {timestamp} ({fmt})")
+    else:
+        manifest["pending"] = pending
+
+    write_latest_manifest(backend, prefix, manifest)
+    return manifest
 
 
 def upload_csv_to_gcs(df: pd.DataFrame, bucket_name: str, destination_blob_path: str):
-    client = configure_storage_client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_path)
+    backend = get_storage_backend(bucket_name)
 
     with BytesIO() as buffer:
         df.to_csv(buffer, index=False)
-        buffer.seek(0)
-        blob.upload_from_file(buffer, content_type="text/csv")
+        backend.upload(destination_blob_path, buffer.getvalue(), content_type="text/csv")
 
-    print(f"☁️ Uploaded to: gs://{bucket_name}/{destination_blob_path}")
+    print(f"☁️ Uploaded to: {backend.uri(destination_blob_path)}")
 
 
-def save_fact(df: pd.DataFrame, timestamp: str):
-    filename = "fact_invoices.csv"
+def olap_parquet_schema(df: pd.DataFrame, table: str) -> pa.Schema:
+    """Schéma Arrow explicite : types déclarés dans OLAP_SCHEMAS, inférés pour les autres colonnes."""
+    declared = OLAP_SCHEMAS.get(table, {})
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = [
+        pa.field(field.name, _PARQUET_TYPES[declared[field.name]]) if field.name in declared else field
+        for field in inferred
+    ]
+    return pa.schema(fields, metadata=inferred.metadata)
 
-    if ENV == "PROD":
-        output_path = f"olap_outputs/{timestamp}/{filename}"
-        upload_csv_to_gcs(df, GCS_BUCKET, output_path)
-    else:
-        local_path = Path(f"olap_outputs/{filename}")
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(local_path, index=False)
-        print(f"💾 Saved locally to: {local_path}")
 
+def write_olap_parquet(df: pd.DataFrame, table: str, sink):
+    """
+    Écrit df en Parquet vers sink (chemin ou fichier ouvert en écriture binaire), groupe de lignes
+    par groupe de lignes : seul un row group est converti en Arrow à la fois.
+    """
+    df = apply_olap_schema(df.copy(deep=False), OLAP_SCHEMAS.get(table, {}))
+    schema = olap_parquet_schema(df, table)
+    with pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION) as writer:
+        for start in range(0, max(len(df), 1), PARQUET_ROW_GROUP_SIZE):
+            chunk = df.iloc[start:start + PARQUET_ROW_GROUP_SIZE]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
 
-def save_dim(df: pd.DataFrame, name: str, timestamp: str):
-    filename = f"{name}.csv"
+
+def upload_parquet_to_gcs(df: pd.DataFrame, table: str, bucket_name: str, destination_blob_path: str):
+    backend = get_storage_backend(bucket_name)
+
+    # Sur GCS, blob.open("wb") : upload résumable par morceaux de UPLOAD_CHUNK_SIZE, sans copie complète
+    with backend.open(
+        destination_blob_path, "wb", chunk_size=UPLOAD_CHUNK_SIZE, content_type="application/vnd.apache.parquet"
+    ) as fp:
+        write_olap_parquet(df, table, fp)
+
+    print(f"☁️ Uploaded to: {backend.uri(destination_blob_path)}")
+
+
+def save_olap_table(df: pd.DataFrame, name: str, timestamp: str):
+    filename = f"{name}.{OLAP_FORMAT}"
 
     if ENV == "PROD":
         output_path = f"olap_outputs/{timestamp}/{filename}"
-        upload_csv_to_gcs(df, GCS_BUCKET, output_path)
-        print(f"☁️ Uploaded {name} to GCS at: gs://{GCS_BUCKET}/{output_path}")
+        if OLAP_FORMAT == "parquet":
+            upload_parquet_to_gcs(df, name, GCS_BUCKET, output_path)
+        else:
+            upload_csv_to_gcs(df, GCS_BUCKET, output_path)
+        record_olap_output(get_storage_backend(GCS_BUCKET), timestamp, filename)
     else:
         local_path = Path(f"olap_outputs/{filename}")
         local_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(local_path, index=False)
+        if OLAP_FORMAT == "parquet":
+            write_olap_parquet(df, name, local_path)
+        else:
+            df.to_csv(local_path, index=False)
         print(f"💾 Saved {name} locally to: {local_path}")
+
+
+def save_fact(df: pd.DataFrame, timestamp: str):
+    save_olap_table(df, "fact_invoices", timestamp)
+
+
+def save_dim(df: pd.DataFrame, name: str, timestamp: str):
+    save_olap_table(df, name, timestamp)
@@ -0,0 +1,18 @@
+import sys
+from gcp import configure_gcp_credentials
+from nosql_io import publish_latest_dump
+from storage_backend import STORAGE_BACKEND
+
+# Usage : python scripts/publish_latest_dump.py [dump/db_dump_prod_XXXX.json]
+# Sans argument, publie le dump le plus récent trouvé par listing (amorçage du manifest).
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if STORAGE_BACKEND == "gcs":
+        configure_gcp_credentials()
+    publish_latest_dump(argv[0] if argv else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+# Même collection que la version des index (mongo_indexes.META_COLLECTION)
+META_COLLECTION = "_meta"
+SNAPSHOT_META_ID = "snapshot"
+
+# Chaque chargement complet écrit un jeu de collections <nom>__v<n> ; _meta.snapshot pointe le jeu courant
+# (mapping nom logique -> collection physique). Le registre garde un document par jeu conservé.
+SNAPSHOT_SETS_COLLECTION = "_snapshot_sets"
+SNAPSHOT_SETS_COUNTER_ID = "snapshot_sets"
+# Nombre de jeux conservés (le courant compris) : au-delà, les plus anciens sont supprimés.
+# Au moins 2 : l'API peut encore lire le jeu précédent pendant SNAPSHOT_POLL_SECONDS après la bascule.
+SNAPSHOT_RETENTION = max(2, int(os.getenv("SNAPSHOT_RETENTION", 3)))
+
+
+def versioned_name(collection_name: str, collection_set: str) -> str:
+    return f"{collection_name}__{collection_set}"
+
+
+def resolve_collection(meta, collection_name: str) -> str:
+    """Nom physique d'une collection dans un snapshot ; nom logique pour un snapshot non versionné."""
+    return ((meta or {}).get("collections") or {}).get(collection_name, collection_name)
+
+
+def write_snapshot_metadata(
+    db, source: dict, counts: dict, mode: str, timings: dict = None,
+    collection_set: str = None, collections: dict = None,
+) -> str:
+    """
+    Enregistre le snapshot qui vient d'être chargé. La nouvelle "version" change à chaque
+    chargement (snapshot ou delta) : l'API s'en sert pour invalider ses caches.
+    Avec collection_set, le jeu est aussi (ré)enregistré dans le registre et devient le courant.
+    """
+    version = str(ObjectId())
+    meta = {
+        "version": version,
+        "mode": mode,
+        "source_blob": source.get("name"),
+        "generation": source.get("generation"),
+        "source_updated": source.get("updated"),
+        "loaded_at": datetime.now(timezone.utc),
+        "counts": counts,
+        "timings": timings,
+    }
+    if collection_set:
+        meta["collection_set"] = collection_set
+        meta["collections"] = collections or {}
+        meta["seq"] = int(collection_set.lstrip("v"))
+        db[SNAPSHOT_SETS_COLLECTION].replace_one({"_id": collection_set}, meta, upsert=True)
+
+    # Bascule : un seul document réécrit, quelle que soit la taille du snapshot
+    db[META_COLLECTION].replace_one({"_id": SNAPSHOT_META_ID}, meta, upsert=True)
+    print(f"🏷️ Snapshot version {version} recorded ({source.get('name')})")
+    return version
+
+
+def read_snapshot_metadata(db, projection=None):
+    return db[META_COLLECTION].find_one({"_id": SNAPSHOT_META_ID}, projection)
+
+
+def list_collection_sets(db) -> list:
+    """Jeux conservés, du plus récent au plus ancien."""
+    return list(db[SNAPSHOT_SETS_COLLECTION].find({}, {"timings": 0}).sort("seq", -1))
+
+
+def collection_set_lookup(collection_set: str = None, as_of: datetime = None):
+    """(filtre, tri) du registre pour ?snapshot= / ?as_of= ; partagé par l'API sync et async."""
+    if collection_set:
+        return {"_id": collection_set}, None
+    if as_of.tzinfo:
+        # PyMongo stocke les dates en UTC naïf : on compare dans le même référentiel
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    return {"loaded_at": {"$lte": as_of}}, [("loaded_at", -1)]
+
+
+def find_collection_set(db, collection_set: str = None, as_of: datetime = None):
+    """Le jeu demandé, ou le dernier chargé à la date as_of ; None s'il n'est pas (ou plus) conservé."""
+    query, sort = collection_set_lookup(collection_set, as_of)
+    return db[SNAPSHOT_SETS_COLLECTION].find_one(query, sort=sort)
+
+
+def _register_legacy_snapshot(db):
+    """
+    Premier chargement versionné sur une base existante : les collections non versionnées
+    du snapshot en place deviennent le jeu v0 (conservé, restaurable, puis supprimé par la rétention).
+    """
+    meta = read_snapshot_metadata(db)
+    if not meta or meta.get("collection_set"):
+        return
+    existing = set(db.list_collection_names())
+    names = [name for name in [*(meta.get("counts") or {}), "fraud_signals"] if name in existing]
+    legacy = {**{k: v for k, v in meta.items() if k != "_id"}, "collection_set": "v0", "seq": 0,
+              "collections": {name: name for name in names}}
+    db[SNAPSHOT_SETS_COLLECTION].replace_one({"_id": "v0"}, legacy, upsert=True)
+    db[META_COLLECTION].update_one(
+        {"_id": SNAPSHOT_META_ID}, {"$set": {"collection_set": "v0", "collections": legacy["collections"], "seq": 0}}
+    )
+
+
+def reserve_collection_set(db) -> str:
+    """Réserve le prochain identifiant de jeu ("v7") ; rien n'est visible avant write_snapshot_metadata."""
+    if db[SNAPSHOT_SETS_COLLECTION].estimated_document_count() == 0:
+        _register_legacy_snapshot(db)
+    counter = db[META_COLLECTION].find_one_and_update(
+        {"_id": SNAPSHOT_SETS_COUNTER_ID}, {"$inc": {"next": 1}}, upsert=True, return_document=True
+    )
+    return f"v{counter['next']}"
+
+
+def activate_collection_set(db, collection_set: str) -> dict:
+    """Fait pointer _meta.snapshot sur un jeu conservé (rollback / roll forward), en O(1)."""
+    entry = db[SNAPSHOT_SETS_COLLECTION].find_one({"_id": collection_set})
+    if entry is None:
+        raise ValueError(f"Unknown or evicted snapshot set '{collection_set}'")
+    meta = {k: v for k, v in entry.items() if k != "_id"}
+    meta["activated_at"] = datetime.now(timezone.utc)
+    db[META_COLLECTION].replace_one({"_id": SNAPSHOT_META_ID}, meta, upsert=True)
+    print(f"⏪ Snapshot set {collection_set} is now current (version {meta.get('version')})")
+    return meta
+
+
+def evict_collection_sets(db, keep: int = None) -> list:
+    """
+    Supprime les jeux au-delà des `keep` plus récents (le courant est toujours gardé),
+    puis leurs collections physiques qu'aucun jeu conservé ne référence plus.
+    """
+    keep = SNAPSHOT_RETENTION if keep is None else keep
+    current = (read_snapshot_metadata(db, {"collection_set": 1}) or {}).get("collection_set")
+    sets = list_collection_sets(db)
+    kept = [entry for position, entry in enumerate(sets) if position < keep or entry["_id"] == current]
+    evicted = [entry for entry in sets if entry not in kept]
+    if not evicted:
+        return []
+
+    referenced = {name for entry in kept for name in (entry.get("collections") or {}).values()}
+    for entry in evicted:
+        for physical in (entry.get("collections") or {}).values():
+            if physical not in referenced:
+                db[physical].drop()
+        db[SNAPSHOT_SETS_COLLECTION].delete_one({"_id": entry["_id"]})
+    evicted_ids = [entry["_id"] for entry in evicted]
+    print(f"🧹 Evicted snapshot sets {evicted_ids} (keeping {keep})")
+    return evicted_ids
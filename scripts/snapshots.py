@@ -0,0 +1,66 @@
+import argparse
+
+from pymongo import MongoClient
+
+from gcs_to_mongo import MONGO_DB, MONGO_URI
+from mongo_delta import DELTA_HASHES_COLLECTION, forget_hashes
+from snapshot_meta import activate_collection_set, list_collection_sets, read_snapshot_metadata
+
+# Usage : python scripts/snapshots.py list
+#         python scripts/snapshots.py rollback [--to v3]
+# Sans --to, revient au jeu chargé juste avant le jeu courant.
+
+
+def print_collection_sets(db):
+    current = (read_snapshot_metadata(db, {"collection_set": 1}) or {}).get("collection_set")
+    sets = list_collection_sets(db)
+    if not sets:
+        print("⚠️ No versioned snapshot set yet: run a snapshot load first.")
+    for entry in sets:
+        marker = "→" if entry["_id"] == current else " "
+        total = sum((entry.get("counts") or {}).values())
+        print(f"{marker} {entry['_id']:>5}  {entry.get('mode', '?'):<8} loaded {entry.get('loaded_at')}  "
+              f"{total} docs  ({entry.get('source_blob')})")
+
+
+def previous_collection_set(db) -> str:
+    current = (read_snapshot_metadata(db, {"seq": 1}) or {}).get("seq")
+    older = [entry["_id"] for entry in list_collection_sets(db) if current is None or entry["seq"] < current]
+    if not older:
+        raise SystemExit("❌ No older snapshot set retained: nothing to roll back to.")
+    return older[0]
+
+
+def rollback(db, collection_set: str = None) -> dict:
+    collection_set = collection_set or previous_collection_set(db)
+    try:
+        meta = activate_collection_set(db, collection_set)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    collections = meta.get("collections") or {}
+    # Jeu chargé avant les empreintes par jeu : les empreintes partagées décrivent un autre jeu
+    if DELTA_HASHES_COLLECTION not in collections:
+        forget_hashes(db, collections)
+    return meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List retained snapshot sets or roll back to one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="retained snapshot sets, newest first")
+    rollback_parser = commands.add_parser("rollback", help="make a retained snapshot set current")
+    rollback_parser.add_argument("--to", help="snapshot set id (v3); defaults to the one before current")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(MONGO_URI)
+    try:
+        db = client[MONGO_DB]
+        if args.command == "rollback":
+            rollback(db, args.to)
+        print_collection_sets(db)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
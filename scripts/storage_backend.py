@@ -0,0 +1,187 @@
+import os
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# gcs (défaut) ou local : le second lit et écrit sous LOCAL_STORAGE_DIR, sans credentials ni réseau
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs").lower()
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "data/bucket")
+GCS_BUCKET = os.getenv("GCS_BUCKET")
+# Taille des lectures / des morceaux d'upload résumable GCS (multiple de 256 KB)
+GCS_CHUNK_SIZE = int(os.getenv("GCS_CHUNK_SIZE", 8 * 1024 * 1024))
+
+
+class StorageObject:
+    """Métadonnées d'un objet stocké, indépendantes du backend."""
+
+    def __init__(self, backend, name, size=None, generation=None, updated=None, md5_hash=None):
+        self.backend = backend
+        self.name = name
+        self.size = size
+        self.generation = generation
+        self.updated = updated
+        self.md5_hash = md5_hash
+
+    def open(self, mode="rb", **kwargs):
+        return self.backend.open(self.name, mode, **kwargs)
+
+    def __repr__(self):
+        return f"StorageObject({self.backend.name}/{self.name}, generation={self.generation})"
+
+
+class StorageBackend:
+    """
+    Interface minimale utilisée par nosql_io : list, stat, open, upload.
+    Les noms d'objets sont des chemins relatifs séparés par "/" (dump/..., olap_outputs/...).
+    """
+
+    name = ""
+
+    def list(self, prefix: str, delimiter=None) -> tuple:
+        """Renvoie (objets, sous-préfixes). Avec delimiter, seuls les enfants directs de prefix."""
+        raise NotImplementedError
+
+    def stat(self, name: str):
+        """StorageObject, ou None si l'objet n'existe pas."""
+        raise NotImplementedError
+
+    def open(self, name: str, mode="rb", **kwargs):
+        """Flux en lecture ("rb", "rt") ou en écriture ("wb")."""
+        raise NotImplementedError
+
+    def upload(self, name: str, data, content_type=None, cache_control=None):
+        raise NotImplementedError
+
+    def read_bytes(self, name: str) -> bytes:
+        """Contenu complet ; FileNotFoundError si l'objet n'existe pas."""
+        with self.open(name, "rb") as f:
+            return f.read()
+
+    def local_path(self, name: str):
+        """Chemin du fichier s'il est déjà sur disque local (lecture directe, mmap), sinon None."""
+        return None
+
+    def uri(self, name: str) -> str:
+        return f"{self.name}/{name}"
+
+
+class GCSBackend(StorageBackend):
+    def __init__(self, bucket_name=None, client=None):
+        # Import local : le backend local ne dépend pas du SDK GCP
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name or GCS_BUCKET
+        self.client = client or storage.Client()
+        self.bucket = self.client.bucket(self.bucket_name)
+        self.name = f"gs://{self.bucket_name}"
+
+    def _object(self, blob) -> StorageObject:
+        return StorageObject(self, blob.name, blob.size, blob.generation, blob.updated, blob.md5_hash)
+
+    def list(self, prefix: str, delimiter=None) -> tuple:
+        iterator = self.bucket.list_blobs(prefix=prefix, delimiter=delimiter)
+        objects = [self._object(blob) for blob in iterator]
+        return objects, sorted(iterator.prefixes)
+
+    def stat(self, name: str):
+        blob = self.bucket.get_blob(name)
+        return self._object(blob) if blob is not None else None
+
+    def open(self, name: str, mode="rb", **kwargs):
+        # blob.open : lectures par plages et upload résumable, par morceaux de GCS_CHUNK_SIZE
+        kwargs.setdefault("chunk_size", GCS_CHUNK_SIZE)
+        if "b" not in mode:
+            kwargs.setdefault("encoding", "utf-8")
+        return self.bucket.blob(name).open(mode, **kwargs)
+
+    def read_bytes(self, name: str) -> bytes:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(name).download_as_bytes()
+        except NotFound:
+            raise FileNotFoundError(self.uri(name)) from None
+
+    def upload(self, name: str, data, content_type=None, cache_control=None):
+        blob = self.bucket.blob(name)
+        if cache_control:
+            blob.cache_control = cache_control
+        blob.upload_from_string(data, content_type=content_type or "application/octet-stream")
+
+
+class LocalBackend(StorageBackend):
+    """Répertoire local organisé comme le bucket : <root>/dump/..., <root>/olap_outputs/..."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or LOCAL_STORAGE_DIR)
+        self.name = str(self.root)
+
+    def _path(self, name: str) -> Path:
+        return self.root / name
+
+    def _object(self, path: Path) -> StorageObject:
+        stat = path.stat()
+        return StorageObject(
+            self,
+            path.relative_to(self.root).as_posix(),
+            size=stat.st_size,
+            # mtime en ns : change à chaque réécriture, comme une génération GCS
+            generation=stat.st_mtime_ns,
+            updated=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        )
+
+    def list(self, prefix: str, delimiter=None) -> tuple:
+        # Les noms sont filtrés sur prefix comme sur GCS, "dump/db_" compris
+        base = self._path(prefix) if prefix.endswith("/") else self._path(prefix).parent
+        if not base.is_dir():
+            return [], []
+
+        paths = base.iterdir() if delimiter else base.rglob("*")
+        objects, prefixes = [], []
+        for path in sorted(paths):
+            name = path.relative_to(self.root).as_posix()
+            if not name.startswith(prefix) or path.name.endswith(".part"):
+                continue
+            if path.is_dir():
+                if delimiter:
+                    prefixes.append(f"{name}/")
+            else:
+                objects.append(self._object(path))
+        return objects, prefixes
+
+    def stat(self, name: str):
+        path = self._path(name)
+        return self._object(path) if path.is_file() else None
+
+    def open(self, name: str, mode="rb", **kwargs):
+        path = self._path(name)
+        if "w" in mode:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        encoding = None if "b" in mode else kwargs.get("encoding", "utf-8")
+        return open(path, mode, encoding=encoding)
+
+    def upload(self, name: str, data, content_type=None, cache_control=None):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        # Écriture atomique : un lecteur voit l'ancienne ou la nouvelle version, jamais un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def local_path(self, name: str):
+        return self._path(name)
+
+
+def get_storage_backend(bucket_name=None) -> StorageBackend:
+    if STORAGE_BACKEND == "local":
+        return LocalBackend()
+    if STORAGE_BACKEND == "gcs":
+        return GCSBackend(bucket_name)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}' (expected 'gcs' or 'local')")
@@ -0,0 +1,303 @@
+import io
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import unicodedata
+
+from dump_parts import DumpParts
+from nosql_io import write_latest_manifest
+from storage_backend import LOCAL_STORAGE_DIR, LocalBackend
+
+# Générateur déterministe de dumps au format db_dump_prod_*.json (mêmes collections et champs
+# que ceux lus par l'API). Même seed + mêmes paramètres => même fichier, octet pour octet.
+#   python scripts/synth_dump.py --customers 100000 --seed 42
+#   python scripts/synth_dump.py --format ndjson.gz   # dump découpé (dump_parts), une partie par collection
+
+COLLECTIONS = ["customers", "subscriptions", "charges", "payment_intents", "invoices"]
+# Horodatage de référence fixe : le dump ne dépend pas de la date du jour
+EPOCH = 1704067200  # 2024-01-01 UTC
+# json : fichier unique ; ndjson[.gz] : dossier de parties (dump_parts)
+DUMP_FORMATS = ["json", "ndjson", "ndjson.gz"]
+YEAR = 365 * 24 * 3600
+
+FIRST_NAMES = ["Alice", "Bruno", "Chloé", "David", "Emma", "Farid", "Gaëlle", "Hugo", "Inès", "Jules", "Léa", "Zoë"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Petit", "Durand", "Leroy", "Moreau", "Ørsted"]
+SUBSCRIPTION_STATUSES = [("active", 70), ("canceled", 12), ("past_due", 6), ("trialing", 8), ("incomplete", 4)]
+PLANS = [
+    {"nickname": "basic", "amount": 900, "interval": "month"},
+    {"nickname": "pro", "amount": 2900, "interval": "month"},
+    {"nickname": "team", "amount": 9900, "interval": "month"},
+    {"nickname": "pro_yearly", "amount": 29000, "interval": "year"},
+]
+
+
+def make_id(prefix: str, seed: int, kind: str, *parts) -> str:
+    digest = hashlib.blake2b(f"{seed}:{kind}:{':'.join(map(str, parts))}".encode(), digest_size=7).hexdigest()
+    return f"{prefix}_{digest}"
+
+
+def ascii_slug(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def weighted(rng: random.Random, choices: list):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def customer_rng(seed: int, index: int, stream: str) -> random.Random:
+    """Un générateur par (client, flux) : chaque collection peut être regénérée indépendamment."""
+    return random.Random(f"{seed}:{index}:{stream}")
+
+
+def customer_doc(seed: int, index: int) -> dict:
+    rng = customer_rng(seed, index, "customer")
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "id": make_id("cus", seed, "customer", index),
+        "object": "customer",
+        "name": f"{first} {last}",
+        "email": f"{ascii_slug(first)}.{ascii_slug(last)}.{index}@example.com",
+        "created": EPOCH + rng.randrange(YEAR),
+        "currency": "eur",
+        "balance": 0,
+        "delinquent": rng.random() < 0.03,
+        "metadata": {},
+    }
+
+
+def subscription_docs(seed: int, index: int, per_customer: float) -> list:
+    rng = customer_rng(seed, index, "subscriptions")
+    customer_id = make_id("cus", seed, "customer", index)
+    count = int(per_customer) + (rng.random() < per_customer % 1)
+    docs = []
+    for n in range(count):
+        plan = rng.choice(PLANS)
+        created = EPOCH + rng.randrange(YEAR)
+        period = 30 * 24 * 3600 if plan["interval"] == "month" else YEAR
+        sub_id = make_id("sub", seed, "subscription", index, n)
+        docs.append({
+            "id": sub_id,
+            "object": "subscription",
+            "customer_id": customer_id,
+            "status": weighted(rng, SUBSCRIPTION_STATUSES),
+            "created": created,
+            "start_date": created,
+            "current_period_start": created,
+            "current_period_end": created + period,
+            "cancel_at_period_end": rng.random() < 0.05,
+            "collection_method": "charge_automatically",
+            "items": {
+                "object": "list",
+                "data": [{
+                    "id": make_id("si", seed, "item", index, n),
+                    "object": "subscription_item",
+                    "quantity": 1,
+                    "plan": {
+                        "id": f"plan_{plan['nickname']}",
+                        "object": "plan",
+                        "product": f"prod_{plan['nickname']}",
+                        "currency": "eur",
+                        **plan,
+                    },
+                }],
+            },
+        })
+    return docs
+
+
+def payments(seed: int, index: int, per_customer: float) -> list:
+    """Paiements d'un client, communs aux charges et aux payment_intents (mêmes ids, montants, dates)."""
+    rng = customer_rng(seed, index, "payments")
+    count = int(per_customer) + (rng.random() < per_customer % 1)
+    # Peu de moyens de paiement par client : certains reviennent souvent (candidats fraude)
+    methods = [make_id("pm", seed, "payment_method", index, m) for m in range(rng.randint(1, 3))]
+    result = []
+    for n in range(count):
+        paid = rng.random() < 0.92
+        result.append({
+            "charge_id": make_id("ch", seed, "charge", index, n),
+            "intent_id": make_id("pi", seed, "payment_intent", index, n),
+            # Montants en centimes, distribution log-normale (médiane ~25 €, longue traîne)
+            "amount": max(50, int(rng.lognormvariate(7.8, 1.1))),
+            "created": EPOCH + rng.randrange(YEAR),
+            "paid": paid,
+            "payment_method": rng.choice(methods),
+            "three_d_secure": "any" if rng.random() < 0.15 else "automatic",
+        })
+    return result
+
+
+def charge_docs(seed: int, index: int, per_customer: float) -> list:
+    customer_id = make_id("cus", seed, "customer", index)
+    return [{
+        "id": p["charge_id"],
+        "object": "charge",
+        "customer_id": customer_id,
+        "amount": p["amount"],
+        "amount_refunded": 0,
+        "currency": "eur",
+        "created": p["created"],
+        "paid": p["paid"],
+        "refunded": False,
+        "status": "succeeded" if p["paid"] else "failed",
+        "payment_intent": p["intent_id"],
+        "payment_method": p["payment_method"],
+    } for p in payments(seed, index, per_customer)]
+
+
+def payment_intent_docs(seed: int, index: int, per_customer: float) -> list:
+    customer_id = make_id("cus", seed, "customer", index)
+    return [{
+        "id": p["intent_id"],
+        "object": "payment_intent",
+        "customer_id": customer_id,
+        "amount": p["amount"],
+        "amount_received": p["amount"] if p["paid"] else 0,
+        "currency": "eur",
+        "created": p["created"],
+        "status": "succeeded" if p["paid"] else "requires_payment_method",
+        "payment_method": p["payment_method"],
+        "payment_method_options": {"card": {"request_three_d_secure": p["three_d_secure"]}},
+    } for p in payments(seed, index, per_customer)]
+
+
+def invoice_docs(seed: int, index: int, per_customer: float) -> list:
+    rng = customer_rng(seed, index, "invoices")
+    customer_id = make_id("cus", seed, "customer", index)
+    docs = []
+    for n, sub in enumerate(subscription_docs(seed, index, per_customer)):
+        plan = sub["items"]["data"][0]["plan"]
+        for period in range(rng.randint(1, 4)):
+            status = "paid" if rng.random() < 0.9 else rng.choice(["open", "void", "uncollectible"])
+            start = sub["current_period_start"] + period * 30 * 24 * 3600
+            docs.append({
+                "id": make_id("in", seed, "invoice", index, n, period),
+                "object": "invoice",
+                "customer_id": customer_id,
+                "subscription_id": sub["id"],
+                "status": status,
+                "currency": "eur",
+                "amount_due": plan["amount"],
+                "amount_paid": plan["amount"] if status == "paid" else 0,
+                "created": start,
+                "period_start": start,
+                "period_end": start + 30 * 24 * 3600,
+            })
+    return docs
+
+
+def iter_collection(name: str, seed: int, customers: int, subscriptions: float, charges: float):
+    for index in range(customers):
+        if name == "customers":
+            yield customer_doc(seed, index)
+        elif name == "subscriptions":
+            yield from subscription_docs(seed, index, subscriptions)
+        elif name == "charges":
+            yield from charge_docs(seed, index, charges)
+        elif name == "payment_intents":
+            yield from payment_intent_docs(seed, index, charges)
+        elif name == "invoices":
+            yield from invoice_docs(seed, index, subscriptions)
+
+
+def write_dump(fp, seed: int, customers: int, subscriptions: float, charges: float) -> dict:
+    """Écrit le dump en flux (un document à la fois) ; renvoie le nombre de documents par collection."""
+    counts = {}
+    fp.write("{")
+    for position, name in enumerate(COLLECTIONS):
+        fp.write(f'{"," if position else ""}\n  "{name}": [')
+        count = 0
+        for doc in iter_collection(name, seed, customers, subscriptions, charges):
+            fp.write(("," if count else "") + "\n    " + json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+            count += 1
+        fp.write("\n  ]")
+        counts[name] = count
+    fp.write("\n}\n")
+    return counts
+
+
+def open_part_writer(raw, fmt: str):
+    # mtime=0 : même contenu => mêmes octets compressés
+    if fmt == "ndjson.gz":
+        return gzip.GzipFile(fileobj=raw, mode="wb", mtime=0)
+    return raw
+
+
+def write_dump_parts(backend, folder: str, fmt: str, seed: int, customers: int, subscriptions: float,
+                     charges: float) -> dict:
+    """Une partie NDJSON par collection sous folder ; renvoie le nombre de documents par collection."""
+    counts = {}
+    for name in COLLECTIONS:
+        count = 0
+        with backend.open(f"{folder}{name}.{fmt}", "wb") as raw, open_part_writer(raw, fmt) as compressed:
+            fp = io.TextIOWrapper(compressed, encoding="utf-8")
+            for doc in iter_collection(name, seed, customers, subscriptions, charges):
+                fp.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n")
+                count += 1
+            # Le flux compressé est fermé par le with (fin de trame gzip), pas par le wrapper texte
+            fp.flush()
+            fp.detach()
+        counts[name] = count
+    return counts
+
+
+def generate_dump(
+    directory=None, seed=42, customers=1000, subscriptions=1.2, charges=5.0, publish=True, fmt="json"
+) -> dict:
+    """
+    Écrit dump/db_dump_prod_synth_<seed>_<customers>.json (ou le dossier de parties du même nom
+    avec fmt="ndjson.gz"...) dans un stockage local (jamais dans le bucket)
+    et, par défaut, y pointe dump/_LATEST.json. Renvoie les métadonnées du dump généré.
+    """
+    backend = LocalBackend(directory or LOCAL_STORAGE_DIR)
+
+    started = time.perf_counter()
+    if fmt == "json":
+        name = f"dump/db_dump_prod_synth_{seed}_{customers}.json"
+        with backend.open(name, "wt") as fp:
+            counts = write_dump(fp, seed, customers, subscriptions, charges)
+        obj = backend.stat(name)
+    else:
+        name = f"dump/db_dump_prod_synth_{seed}_{customers}/"
+        counts = write_dump_parts(backend, name, fmt, seed, customers, subscriptions, charges)
+        obj = DumpParts(backend, name, [backend.stat(f"{name}{collection}.{fmt}") for collection in COLLECTIONS])
+
+    if publish:
+        manifest = {"blob": obj.name, "generation": obj.generation, "updated": obj.updated.isoformat()}
+        write_latest_manifest(backend, "dump/", manifest)
+
+    result = {
+        "path": str(backend.local_path(name)),
+        "name": name,
+        "seed": seed,
+        "bytes": obj.size,
+        "counts": counts,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    print(f"🧪 Generated {name}: {sum(counts.values())} docs, {obj.size / 1e6:.1f} MB in {result['seconds']}s")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic Stripe-shaped dump.")
+    parser.add_argument("--dir", default=LOCAL_STORAGE_DIR, help="local storage root (dump/ is created inside)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--subscriptions", type=float, default=1.2, help="average subscriptions per customer")
+    parser.add_argument("--charges", type=float, default=5.0, help="average charges (and payment intents) per customer")
+    parser.add_argument("--no-publish", action="store_true", help="do not update dump/_LATEST.json")
+    parser.add_argument("--format", default="json", choices=DUMP_FORMATS, help="single JSON file or NDJSON parts")
+    args = parser.parse_args(argv)
+
+    generate_dump(
+        args.dir, args.seed, args.customers, args.subscriptions, args.charges, not args.no_publish, args.format
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,13 @@ import os
 import pytest
 from scripts.nosql_io import load_latest_oltp_json_from_gcs, load_latest_olap_outputs
 from scripts.gcp import configure_gcp_credentials
+from scripts.storage_backend import STORAGE_BACKEND
 
 @pytest.fixture(scope="session", autouse=True)
 def gcp_setup():
     """
     Configure les credentials GCP une seule fois pour toute la session de test.
+    Inutile avec STORAGE_BACKEND=local : les tests lisent alors LOCAL_STORAGE_DIR.
     """
-    configure_gcp_credentials()
+    if STORAGE_BACKEND == "gcs":
+        configure_gcp_credentials()
@@ -0,0 +1,343 @@
+import json
+from datetime import datetime, timezone
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+
+import app.api.main as api
+from scripts.snapshot_meta import activate_collection_set
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = mongomock.MongoClient()["test_db"]
+    db.subscriptions.insert_many([
+        {"id": f"sub_{i}", "status": "active" if i % 2 else "canceled", "customer_id": f"cus_{i}"}
+        for i in range(5)
+    ])
+    monkeypatch.setattr(api, "db", db)
+    api.cache.clear()
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+def test_list_without_limit_keeps_full_response(client):
+    resp = client.get("/subscriptions")
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 5
+    assert resp.headers["X-Total-Count"] == "5"
+
+
+def test_keyset_pagination_with_projection(client):
+    pages, after = [], None
+    while True:
+        params = {"limit": 2, "fields": "status"}
+        if after:
+            params["after"] = after
+        resp = client.get("/subscriptions", params=params)
+        pages.append(resp.json())
+        after = resp.headers.get("X-Next-Cursor")
+        if not after:
+            break
+
+    ids = [doc["id"] for page in pages for doc in page]
+    assert ids == [f"sub_{i}" for i in range(5)]
+    assert all(set(doc) <= {"_id", "id", "status"} for page in pages for doc in page)
+
+
+def test_first_page_filters_on_indexed_id(client, monkeypatch):
+    # Sans id $exists, l'index partiel id_unique ne sert pas au tri : COLLSCAN + tri en mémoire
+    queries = []
+    find = api.db.subscriptions.find
+    monkeypatch.setattr(api.db.subscriptions, "find", lambda query, *args, **kwargs: (
+        queries.append(query) or find(query, *args, **kwargs)))
+    api.db.subscriptions.insert_one({"status": "active"})
+
+    first = client.get("/subscriptions/active", params={"limit": 10}).json()
+    client.get("/subscriptions", params={"limit": 2, "after": "sub_1"})
+
+    assert [doc["id"] for doc in first] == ["sub_1", "sub_3"]
+    assert queries == [
+        {"$and": [{"status": "active"}, {"id": {"$exists": True}}]},
+        {"id": {"$exists": True, "$gt": "sub_1"}},
+    ]
+
+
+def test_filtered_total_counts_matching_docs(client):
+    resp = client.get("/subscriptions/active", params={"limit": 1})
+
+    assert resp.headers["X-Total-Count"] == "2"
+    assert resp.headers["X-Next-Cursor"] == "sub_1"
+
+
+def test_ndjson_streaming_is_opt_in(client):
+    resp = client.get("/subscriptions", params={"limit": 3}, headers={"Accept": "application/x-ndjson"})
+
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert resp.headers["X-Total-Count"] == "5"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [doc["id"] for doc in lines] == ["sub_0", "sub_1", "sub_2"]
+    assert all(isinstance(doc["_id"], str) for doc in lines)
+
+
+def test_stats_are_computed_server_side(client):
+    api.db.customers.insert_many([{"id": "cus_1"}, {"id": "cus_2"}])
+    api.db.charges.insert_many([
+        {"id": "ch_1", "customer_id": "cus_1", "amount": 1000, "paid": True},
+        {"id": "ch_2", "customer_id": "cus_1", "amount": 500, "paid": False},
+        {"id": "ch_3", "customer_id": "cus_2", "amount": 1200, "paid": True},
+    ])
+    api.db.subscriptions.update_one({"id": "sub_1"}, {"$set": {"items": {"data": [{"plan": {"amount": 1200, "interval": "year"}}]}}})
+    api.db.subscriptions.update_one({"id": "sub_3"}, {"$set": {"items": {"data": [{"plan": {"amount": 900}}]}}})
+
+    summary = client.get("/stats/summary").json()
+    assert summary == {
+        "customers": 2,
+        "active_subscriptions": 2,
+        "total_revenue": 2700,
+        "charges": 3,
+        "paid_charges": 2,
+        "success_rate": 66.67,
+        "mrr": 1000,
+    }
+    assert client.get("/stats/revenue/top", params={"limit": 1}).json() == [{"customer_id": "cus_1", "revenue": 1500}]
+    assert client.get("/stats/subscriptions/status").json() == {"canceled": 3, "active": 2}
+
+
+def test_cache_is_invalidated_by_new_snapshot_version(client, monkeypatch):
+    api.db["_meta"].insert_one({"_id": "snapshot", "version": "v1"})
+    monkeypatch.setattr(api.cache, "poll_seconds", 0)
+
+    first = client.get("/subscriptions/active")
+    api.db.subscriptions.insert_one({"id": "sub_9", "status": "active"})
+    second = client.get("/subscriptions/active")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert len(second.json()) == 2
+
+    api.db["_meta"].update_one({"_id": "snapshot"}, {"$set": {"version": "v2"}})
+    third = client.get("/subscriptions/active")
+
+    assert third.headers["X-Cache"] == "MISS"
+    assert len(third.json()) == 3
+    assert client.get("/cache/stats").json()["invalidations"] == 1
+
+
+def test_cache_byte_budget_and_disabled_cache():
+    cache = api.SnapshotCache(max_bytes=100)
+    cache.observe_version("v1")
+    small, large = ([{"id": "a"}], {}), ([{"id": "x" * 200}], {})
+
+    cache.set(("v1", "/a", ()), small)
+    cache.set(("v1", "/b", ()), small)
+    cache.set(("v1", "/large", ()), large)
+    assert cache.get(("v1", "/large", ()))[0] is False
+    cache.set(("v1", "/c", ()), ([{"id": "y" * 60}], {}))
+
+    # /a, le moins récemment utilisé, sort pour tenir dans les 100 octets
+    assert [cache.get(("v1", path, ()))[0] for path in ("/a", "/b", "/c")] == [False, True, True]
+    assert 0 < cache.stats()["bytes"] <= 100
+
+    disabled = api.SnapshotCache(max_entries=0)
+    disabled.observe_version("v1")
+    disabled.set(("v1", "/a", ()), small)
+    assert disabled.get(("v1", "/a", ()))[0] is False
+
+
+def test_no_cache_header_bypasses_the_cache(client):
+    api.db["_meta"].insert_one({"_id": "snapshot", "version": "v1"})
+
+    client.get("/subscriptions/active")
+    bypass = client.get("/subscriptions/active", headers={"Cache-Control": "no-cache"})
+
+    assert bypass.headers["X-Cache"] == "BYPASS"
+    assert client.get("/subscriptions/active").headers["X-Cache"] == "HIT"
+    assert client.get("/cache/stats").json()["entries"] == 1
+
+
+def test_conditional_get_and_gzip(client):
+    api.db["_meta"].insert_one({"_id": "snapshot", "version": "v1"})
+    api.db.charges.insert_many([{"id": f"ch_{i}", "amount": i, "description": "x" * 50} for i in range(50)])
+
+    first = client.get("/charges", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    etag = first.headers["ETag"]
+
+    again = client.get("/charges", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+    other_params = client.get("/charges", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert other_params.status_code == 200
+    assert other_params.headers["ETag"] != etag
+
+
+def test_snapshot_routes_are_fresh_after_a_rollback(client):
+    sets = [
+        {"_id": f"v{seq}", "collection_set": f"v{seq}", "seq": seq, "version": f"version_{seq}",
+         "collections": {"customers": f"customers__v{seq}"}}
+        for seq in (1, 2)
+    ]
+    api.db["_snapshot_sets"].insert_many(sets)
+    activate_collection_set(api.db, "v2")
+    before = {path: client.get(path) for path in ("/snapshot", "/snapshots")}
+
+    # Rollback puis retour sur v2 : la version redevient "version_2", mais activated_at a changé
+    activate_collection_set(api.db, "v1")
+    activate_collection_set(api.db, "v2")
+
+    for path, first in before.items():
+        again = client.get(path, headers={"If-None-Match": first.headers.get("ETag", "*")})
+        assert again.status_code == 200
+        assert "ETag" not in again.headers
+    assert client.get("/snapshot").json()["activated_at"] != before["/snapshot"].json()["activated_at"]
+
+
+def metric_value(body: str, series: str) -> float:
+    values = [line.rsplit(" ", 1)[1] for line in body.splitlines() if line.startswith(series + " ")]
+    return float(values[0]) if values else 0.0
+
+
+def test_metrics_expose_route_histograms(client):
+    # Registre partagé par tous les tests du module : on compare avant/après
+    cursor_docs = 'api_cursor_documents_sum{route="/subscriptions"}'
+    before = metric_value(client.get("/metrics").text, cursor_docs)
+    client.get("/subscriptions")
+    client.get("/subscriptions", headers={"Accept": "application/x-ndjson"})
+
+    resp = client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert "# TYPE api_request_duration_seconds histogram" in body
+    # Gabarit de route, pas le chemin brut : cardinalité bornée
+    assert 'api_request_duration_seconds_count{route="/subscriptions",method="GET",status="200"}' in body
+    assert 'api_response_size_bytes_count{route="/subscriptions"}' in body
+    assert metric_value(body, cursor_docs) - before == 10
+    assert "ETag" not in resp.headers
+
+
+def test_histogram_render_is_cumulative():
+    from app.api.metrics import Histogram
+
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, '/a"b')
+
+    lines = histogram.render()
+
+    assert 'demo_seconds_bucket{route="/a\\"b",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a\\"b"} 3' in lines
+
+
+def test_fraud_serves_ranked_signals_by_window(client):
+    api.db["fraud_signals"].insert_many([
+        {"_id": f"ch_{i}", "customer_id": "cus_1", "run": "r1",
+         "windows": {"1h": {"score": score}, "24h": {"score": 100 - score}, "7d": {"score": 0}}}
+        for i, score in enumerate([10, 80, 55, 95])
+    ])
+
+    resp = client.get("/charges/fraud", params={"window": "1h", "threshold": 50})
+
+    assert resp.status_code == 200
+    assert [doc["_id"] for doc in resp.json()] == ["ch_3", "ch_1", "ch_2"]
+    assert "run" not in resp.json()[0]
+    assert [doc["_id"] for doc in client.get("/charges/fraud?window=24h&threshold=80&limit=1").json()] == ["ch_0"]
+    assert client.get("/charges/fraud", params={"window": "30d"}).status_code == 422
+
+
+def test_timeseries_buckets_server_side(client, monkeypatch):
+    captured = {}
+
+    def fake_aggregate(collection, pipeline):
+        captured["collection"], captured["pipeline"] = collection.name, pipeline
+        # PyMongo renvoie des dates naïves (UTC)
+        return iter([{"bucket": datetime(2024, 1, 1), "count": 3, "succeeded": 2,
+                      "amount": 300, "revenue": 200}])
+    monkeypatch.setattr(api, "aggregate", fake_aggregate)
+
+    resp = client.get("/stats/timeseries", params={
+        "start": "2024-01-01", "end": "2024-02-01T00:00:00Z", "granularity": "week", "status": "succeeded",
+    })
+
+    assert resp.status_code == 200
+    assert resp.json()["buckets"] == [{"bucket": "2024-01-01T00:00:00", "count": 3, "succeeded": 2,
+                                       "amount": 300, "revenue": 200}]
+    match = captured["pipeline"][0]["$match"]
+    assert captured["collection"] == "charges"
+    assert match["created"]["$gte"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert match["created"]["$lt"] == datetime(2024, 2, 1, tzinfo=timezone.utc)
+    assert match["status"] == "succeeded"
+    assert captured["pipeline"][1]["$group"]["_id"]["$dateTrunc"]["startOfWeek"] == "monday"
+    assert client.get("/stats/timeseries", params={"granularity": "year"}).status_code == 422
+    assert client.get("/stats/timeseries", params={"source": "invoices"}).status_code == 422
+
+
+def test_customer_search_uses_prefix_keys_and_is_not_an_id(client):
+    api.db.customers.insert_many([
+        {"id": "cus_1", "name": "Zoë Martin", "email": "zoe@example.com",
+         "search_keys": ["martin", "zoe@example.com", "zoë", "zoë martin"]},
+        {"id": "cus_2", "name": "Hugo Ørsted", "email": "hugo@example.com",
+         "search_keys": ["hugo", "hugo ørsted", "hugo@example.com", "ørsted"]},
+    ])
+
+    resp = client.get("/customers/search", params={"q": "MAR"})
+
+    assert resp.status_code == 200
+    assert resp.json() == [{"id": "cus_1", "name": "Zoë Martin", "email": "zoe@example.com"}]
+    assert [c["id"] for c in client.get("/customers/search?q=ørs").json()] == ["cus_2"]
+    assert client.get("/customers/search?q=.*").json() == []
+    assert [c["id"] for c in client.get("/customers/search", params={"q": " hugo "}).json()] == ["cus_2"]
+    assert client.get("/customers/search", params={"q": "   "}).status_code == 422
+    assert "search_keys" not in client.get("/customers/cus_1").json()
+
+
+def test_customer_overview_is_a_single_lookup_aggregation():
+    from app.api.queries import CUSTOMER_OVERVIEW_COLLECTIONS, customer_overview_pipeline
+
+    pipeline = customer_overview_pipeline("cus_1", 5)
+    lookups = [stage["$lookup"] for stage in pipeline if "$lookup" in stage]
+
+    assert pipeline[0] == {"$match": {"id": "cus_1"}}
+    assert [lookup["as"] for lookup in lookups] == [*CUSTOMER_OVERVIEW_COLLECTIONS, "charge_totals"]
+    for lookup in lookups:
+        # Jointure sur le champ indexé customer_id, bornée par limit
+        assert (lookup["localField"], lookup["foreignField"]) == ("id", "customer_id")
+    assert {"$limit": 5} in lookups[0]["pipeline"]
+
+
+def test_snapshot_and_as_of_read_a_retained_set(client):
+    api.db["customers__v1"].insert_one({"id": "cus_old", "name": "Old"})
+    api.db["customers__v2"].insert_one({"id": "cus_new", "name": "New"})
+    sets = [
+        {"_id": f"v{seq}", "seq": seq, "version": f"version_{seq}", "loaded_at": datetime(2025, seq, 1),
+         "collections": {"customers": f"customers__v{seq}"}}
+        for seq in (1, 2)
+    ]
+    api.db["_snapshot_sets"].insert_many(sets)
+    api.db["_meta"].insert_one({**sets[1], "_id": "snapshot", "collection_set": "v2"})
+
+    assert [c["id"] for c in client.get("/customers").json()] == ["cus_new"]
+    assert [c["id"] for c in client.get("/customers", params={"snapshot": "v1"}).json()] == ["cus_old"]
+    as_of = client.get("/customers", params={"as_of": "2025-01-15T00:00:00Z"})
+    assert [c["id"] for c in as_of.json()] == ["cus_old"]
+    assert client.get("/customers", params={"snapshot": "v7"}).status_code == 404
+    assert client.get("/customers", params={"snapshot": "latest"}).status_code == 422
+    listing = client.get("/snapshots").json()
+    assert listing["current"] == "v2"
+    assert [entry["_id"] for entry in listing["sets"]] == ["v2", "v1"]
+
+
+def test_customer_overview_joins_physical_collections():
+    from app.api.queries import customer_overview_pipeline
+
+    pipeline = customer_overview_pipeline("cus_1", 5, {"charges": "charges__v3"})
+    lookups = {stage["$lookup"]["as"]: stage["$lookup"]["from"] for stage in pipeline if "$lookup" in stage}
+
+    assert lookups["charges"] == lookups["charge_totals"] == "charges__v3"
+    assert lookups["invoices"] == "invoices"
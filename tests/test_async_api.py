@@ -0,0 +1,159 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+
+import app.api.async_main as async_api
+import app.api.main as api
+
+
+class AsyncCursor:
+    """Curseur mongomock derrière l'interface du curseur AsyncMongoClient."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self.cursor = self.cursor.limit(limit)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self.cursor)
+        return docs if length is None else docs[:length]
+
+    async def __aiter__(self):
+        for doc in self.cursor:
+            yield doc
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(self.collection.aggregate(pipeline, **kwargs))
+
+    async def count_documents(self, *args, **kwargs):
+        return self.collection.count_documents(*args, **kwargs)
+
+    async def estimated_document_count(self, **kwargs):
+        return self.collection.estimated_document_count(**kwargs)
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.db[name])
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.db[name])
+
+    async def command(self, *args, **kwargs):
+        return self.db.command(*args, **kwargs)
+
+
+class AsyncClient:
+    async def close(self):
+        pass
+
+
+# Routes non comparées : compteurs propres à chaque process, ou agrégations que mongomock ne sait pas exécuter
+SKIPPED_ROUTES = {"/metrics", "/ping-mongo", "/cache/stats", "/stats/timeseries", "/customers/{customer_id}/overview"}
+ROUTES = [
+    "/",
+    "/snapshot",
+    "/snapshots",
+    "/charges/fraud?window=1h&threshold=50",
+    "/subscriptions/active?limit=1",
+    "/subscriptions?limit=2&after=sub_0",
+    "/charges?fields=amount",
+    "/payment_intents/3ds",
+    "/customers",
+    "/customers?snapshot=v1",
+    "/customers/search?q=mar",
+    "/customers/search?q=%20%20",
+    "/customers/search",
+    "/customers/cus_1",
+    "/stats/summary",
+    "/stats/revenue/top?limit=1",
+    "/stats/mrr",
+    "/stats/subscriptions/status",
+]
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    db = mongomock.MongoClient()["test_db"]
+    sets = [
+        {"_id": f"v{seq}", "seq": seq, "version": f"version_{seq}", "loaded_at": datetime(2025, seq, 1),
+         "collections": {"customers": f"customers__v{seq}"}}
+        for seq in (1, 2)
+    ]
+    db["_snapshot_sets"].insert_many(sets)
+    db["_meta"].insert_one({**sets[1], "_id": "snapshot", "collection_set": "v2"})
+    db["customers__v1"].insert_one({"id": "cus_0", "name": "Old"})
+    db["customers__v2"].insert_many([
+        {"id": "cus_1", "name": "Zoë Martin", "email": "zoe@example.com", "search_keys": ["martin", "zoë"]},
+        {"id": "cus_2", "name": "Hugo Ørsted", "email": "hugo@example.com", "search_keys": ["hugo", "ørsted"]},
+    ])
+    db.subscriptions.insert_many([
+        {"id": f"sub_{i}", "status": "active" if i % 2 else "canceled", "customer_id": f"cus_{i % 2 + 1}",
+         "items": {"data": [{"plan": {"amount": 1000 * i, "interval": "month"}}]}}
+        for i in range(4)
+    ])
+    db.charges.insert_many([
+        {"id": f"ch_{i}", "customer_id": f"cus_{i % 2 + 1}", "amount": 100 * i, "paid": i != 2, "status": "succeeded"}
+        for i in range(4)
+    ])
+    db.payment_intents.insert_one(
+        {"id": "pi_1", "payment_method_options": {"card": {"request_three_d_secure": "automatic"}}}
+    )
+    db.fraud_signals.insert_many([
+        {"_id": f"ch_{i}", "customer_id": "cus_1", "run": "r1", "windows": {"1h": {"score": score}}}
+        for i, score in enumerate([10, 80, 55])
+    ])
+
+    monkeypatch.setattr(api, "db", db)
+    monkeypatch.setattr(async_api, "db", AsyncDatabase(db))
+    monkeypatch.setattr(async_api, "client", AsyncClient())
+    monkeypatch.setattr(async_api, "verify_indexes", lambda: None)
+    api.cache.clear()
+    async_api.cache.clear()
+    with TestClient(api.app) as sync_client, TestClient(async_api.app) as async_client:
+        yield sync_client, async_client
+
+
+def test_both_apps_declare_the_same_routes():
+    sync_paths, async_paths = set(api.app.openapi()["paths"]), set(async_api.app.openapi()["paths"])
+
+    assert sync_paths == async_paths
+    compared = {path.split("?")[0].replace("cus_1", "{customer_id}") for path in ROUTES}
+    assert compared == sync_paths - SKIPPED_ROUTES
+
+
+@pytest.mark.parametrize("path", ROUTES)
+def test_async_app_serves_the_same_body(clients, path):
+    sync_client, async_client = clients
+
+    expected, actual = sync_client.get(path), async_client.get(path)
+
+    assert actual.status_code == expected.status_code
+    assert actual.json() == expected.json()
+    for header in ("X-Total-Count", "X-Next-Cursor"):
+        assert actual.headers.get(header) == expected.headers.get(header)
@@ -0,0 +1,66 @@
+import json
+import os
+
+from scripts.blob_cache import BlobCache, MappedTextReader
+from scripts.nosql_io import iter_json_collections
+from scripts.storage_backend import LocalBackend
+
+
+class FakeBlob:
+    """StorageObject distant minimal : compte les téléchargements."""
+
+    def __init__(self, backend, name, generation=1):
+        self.backend = backend
+        self.name = name
+        self.generation = generation
+        self.md5_hash = f"md5-{generation}"
+        self.downloads = 0
+
+    def open(self, mode="rb"):
+        self.downloads += 1
+        return self.backend.open(self.name, mode)
+
+
+def remote(tmp_path, name, content: bytes):
+    backend = LocalBackend(tmp_path / "remote")
+    backend.upload(name, content)
+    return FakeBlob(backend, name)
+
+
+def test_cache_hit_skips_download_until_generation_changes(tmp_path):
+    cache = BlobCache(tmp_path / "cache", max_bytes=1 << 20)
+    blob = remote(tmp_path, "dump/db_dump_prod_1.json", b"{}")
+
+    first = cache.fetch(blob)
+    assert cache.fetch(blob) == first
+    assert blob.downloads == 1
+
+    # Blob réécrit : nouvelle génération, nouvelle clé
+    blob.generation = 2
+    assert cache.fetch(blob) != first
+    assert blob.downloads == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = BlobCache(tmp_path / "cache", max_bytes=25)
+    old, recent, new = (remote(tmp_path, f"olap_outputs/{n}.csv", b"x" * 10) for n in ("old", "recent", "new"))
+    old_path = cache.fetch(old)
+    recent_path = cache.fetch(recent)
+    os.utime(old_path, (1, 1))
+    os.utime(recent_path, (2, 2))
+
+    new_path = cache.fetch(new)
+
+    assert not old_path.exists()
+    assert recent_path.exists() and new_path.exists()
+
+
+def test_mapped_reader_feeds_streaming_parser(tmp_path):
+    dump = {"customers": [{"id": "cus_1", "name": "Zoë ☃"}, {"id": "cus_2", "name": "Ørsted"}]}
+    path = tmp_path / "dump.json"
+    path.write_text(json.dumps(dump, ensure_ascii=False), encoding="utf-8")
+
+    with MappedTextReader(path) as fp:
+        batches = list(iter_json_collections(fp, batch_size=1, chunk_size=1))
+
+    assert [doc for _, batch in batches for doc in batch] == dump["customers"]
@@ -0,0 +1,81 @@
+import gzip
+import json
+
+import pytest
+from scripts import nosql_io
+from scripts.dump_parts import iter_parts_parallel, part_collection
+from scripts.storage_backend import LocalBackend
+from scripts.synth_dump import generate_dump
+
+DOCS = {
+    "customers": [{"id": f"cus_{i}", "name": "Zoë"} for i in range(7)],
+    "charges": [{"id": f"ch_{i}", "amount": i * 100} for i in range(5)],
+}
+
+
+def write_parts(backend, folder: str):
+    backend.upload(f"{folder}customers.ndjson.gz", gzip.compress(
+        "".join(json.dumps(doc, ensure_ascii=False) + "\n" for doc in DOCS["customers"]).encode("utf-8")
+    ))
+    # Partie non compressée, avec une ligne vide ignorée
+    backend.upload(f"{folder}charges.0001.ndjson", "\n".join(json.dumps(doc) for doc in DOCS["charges"]) + "\n\n")
+    backend.upload(f"{folder}README.txt", b"not a part")
+
+
+def collect(batches):
+    result = {}
+    for name, batch in batches:
+        result.setdefault(name, []).extend(batch)
+    return result
+
+
+def test_part_names_map_to_collections():
+    assert part_collection("dump/db_dump_prod_1/charges.ndjson.gz") == "charges"
+    assert part_collection("dump/db_dump_prod_1/charges.0003.ndjson.gz") == "charges"
+    assert part_collection("dump/db_dump_prod_1/charges.ndjson.zst") is None
+    assert part_collection("dump/db_dump_prod_1/invoices.ndjson") == "invoices"
+    assert part_collection("dump/db_dump_prod_1/invoices.json") is None
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parts_are_streamed_per_collection(tmp_path, workers, monkeypatch):
+    backend = LocalBackend(tmp_path)
+    write_parts(backend, "dump/db_dump_prod_2/")
+    monkeypatch.setattr(nosql_io, "iter_parts_parallel",
+                        lambda specs, batch_size: iter_parts_parallel(specs, batch_size, workers=workers, queue_size=2))
+
+    dump = nosql_io.get_dump_parts(backend, "dump/db_dump_prod_2/")
+    batches = list(nosql_io.stream_oltp_json_blob(dump, batch_size=3))
+
+    assert len(dump.parts) == 2
+    assert collect(batches) == DOCS
+    assert max(len(batch) for _, batch in batches) == 3
+
+
+def test_split_dump_is_picked_by_listing_and_manifest(tmp_path, monkeypatch):
+    backend = LocalBackend(tmp_path)
+    monkeypatch.setattr(nosql_io, "get_storage_backend", lambda bucket_name=None: backend)
+    backend.upload("dump/db_dump_prod_1.json", json.dumps(DOCS))
+    write_parts(backend, "dump/db_dump_prod_2/")
+
+    # Sans manifest : le dossier le plus récent l'emporte sur le fichier unique
+    assert nosql_io.get_latest_oltp_dump_blob().name == "dump/db_dump_prod_2/"
+
+    nosql_io.publish_latest_dump("dump/db_dump_prod_1.json")
+    assert nosql_io.get_latest_oltp_dump_blob().name == "dump/db_dump_prod_1.json"
+    nosql_io.publish_latest_dump("dump/db_dump_prod_2/")
+    assert nosql_io.get_latest_oltp_dump_blob().name == "dump/db_dump_prod_2/"
+
+
+def test_synthetic_parts_match_single_file(tmp_path):
+    single = generate_dump(tmp_path, seed=3, customers=20, publish=False)
+    split = generate_dump(tmp_path, seed=3, customers=20, fmt="ndjson.gz")
+    backend = LocalBackend(tmp_path)
+
+    with open(single["path"], encoding="utf-8") as f:
+        expected = json.load(f)
+    dump = nosql_io.get_dump_parts(backend, split["name"])
+
+    assert collect(nosql_io.stream_oltp_json_blob(dump)) == expected
+    assert split["counts"] == single["counts"]
+    assert split["bytes"] < single["bytes"]
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from scripts.fraud_scoring import (
+    FRAUD_SIGNALS_COLLECTION,
+    FRAUD_WEIGHTS,
+    FRAUD_WINDOWS,
+    fraud_scoring_pipeline,
+    score_charges,
+    window_signals,
+)
+from scripts.mongo_indexes import INDEXES
+
+# mongomock n'a ni $round ni $setWindowFields : les expressions du score sont évaluées ici
+_OPERATORS = {
+    "$add": lambda values: sum(values),
+    "$subtract": lambda values: values[0] - values[1],
+    "$multiply": lambda values: values[0] * values[1],
+    "$divide": lambda values: values[0] / values[1],
+    "$min": min,
+    "$max": max,
+    "$round": lambda values: round(values[0], values[1]),
+}
+
+
+def evaluate(expression, doc):
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc[expression[1:]]
+    if isinstance(expression, dict):
+        (operator, args), = expression.items()
+        return _OPERATORS[operator]([evaluate(arg, doc) for arg in args])
+    return expression
+
+
+def test_pipeline_windows_and_merge_target():
+    pipeline = fraud_scoring_pipeline("run_1")
+    stages = [next(iter(stage)) for stage in pipeline]
+
+    assert stages.count("$setWindowFields") == 2
+    assert pipeline[-1]["$merge"]["into"] == FRAUD_SIGNALS_COLLECTION
+    projection = next(stage["$project"] for stage in pipeline if "$project" in stage)
+    assert set(projection["windows"]) == set(FRAUD_WINDOWS)
+    assert projection["run"] == {"$literal": "run_1"}
+
+
+def test_unreadable_created_is_not_scored():
+    db = mongomock.MongoClient().db
+    db.charges.insert_many([
+        {"id": "ch_epoch", "created": 1700000000},
+        {"id": "ch_date", "created": datetime(2024, 1, 1)},
+        {"id": "ch_string", "created": "2024-01-01"},
+        {"id": "ch_null", "created": None},
+        {"id": "ch_missing"},
+    ])
+    match = fraud_scoring_pipeline("run_1")[0]["$match"]
+
+    assert sorted(doc["id"] for doc in db.charges.find(match)) == ["ch_date", "ch_epoch"]
+
+
+@pytest.mark.parametrize("signals, expected", [
+    # 3 paiements de plus sur le moyen de paiement (max), z-score 1.5 (moitié), 1 échec sur 2
+    ({"_pm_1h": 4, "_cus_1h": 1, "_fail_1h": 1, "_zscore": 1.5}, 30 + 0 + 15 + 10),
+    # Paiement isolé, montant sous la moyenne : score nul
+    ({"_pm_1h": 1, "_cus_1h": 1, "_fail_1h": 0, "_zscore": -2}, 0),
+    # Tous les signaux au-delà de leur seuil : plafonnés à 100
+    ({"_pm_1h": 50, "_cus_1h": 50, "_fail_1h": 10, "_zscore": 9}, 100),
+])
+def test_window_score_on_known_signals(signals, expected):
+    assert evaluate(window_signals("1h")["score"], signals) == expected
+
+
+class MergingDb:
+    """mongomock sans $merge : l'agrégation de charges écrit une ligne par charge, marquée du run."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        if name != "charges":
+            return self.db[name]
+        target = self.db
+
+        class Charges:
+            def aggregate(self, pipeline, **kwargs):
+                run = next(stage["$project"]["run"]["$literal"] for stage in pipeline if "$project" in stage)
+                into = target[pipeline[-1]["$merge"]["into"]]
+                for charge in target.charges.find():
+                    into.replace_one({"_id": charge["id"]}, {"run": run, "windows": {}}, upsert=True)
+                return iter(())
+
+        return Charges()
+
+
+def test_score_charges_removes_rows_of_earlier_runs():
+    db = mongomock.MongoClient().db
+    db.charges.insert_many([{"id": "ch_1"}, {"id": "ch_2"}])
+    db[FRAUD_SIGNALS_COLLECTION].insert_many([
+        {"_id": "ch_1", "run": "old"},
+        {"_id": "ch_gone", "run": "old"},
+    ])
+
+    stats = score_charges(MergingDb(db))
+
+    rows = list(db[FRAUD_SIGNALS_COLLECTION].find())
+    assert sorted(row["_id"] for row in rows) == ["ch_1", "ch_2"]
+    assert {row["run"] for row in rows} == {stats["run"]}
+    assert stats["scored"] == 2 and stats["removed"] == 1
+
+
+def test_weights_sum_to_100_and_every_window_is_indexed():
+    assert sum(FRAUD_WEIGHTS.values()) == 100
+    indexed = {model.document["name"] for model in INDEXES[FRAUD_SIGNALS_COLLECTION]}
+    assert indexed == {f"score_{window}" for window in FRAUD_WINDOWS}
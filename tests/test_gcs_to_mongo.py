@@ -2,6 +2,7 @@ import mongomock
 import pytest
 from scripts.nosql_io import load_latest_oltp_json_from_gcs
 from scripts.gcp import configure_gcp_credentials
+from scripts.storage_backend import STORAGE_BACKEND
 import os
 from dotenv import load_dotenv
 
@@ -20,7 +21,8 @@ def mock_mongo_db():
 def test_load_and_insert_oltp_json(mock_mongo_db):
     load_dotenv(override=False)
     ENV = os.getenv("ENV", "DEV").upper()
-    configure_gcp_credentials()
+    if STORAGE_BACKEND == "gcs":
+        configure_gcp_credentials()
     data = load_latest_oltp_json_from_gcs()
 
     assert isinstance(data, dict), "Dump should return a dict of collections"
@@ -33,3 +35,46 @@ def test_load_and_insert_oltp_json(mock_mongo_db):
     assert mock_mongo_db["invoices"].count_documents({}) > 0
 
     print("✅ JSON loaded and inserted into MongoDB (mock) successfully.")
+
+
+def test_failed_load_keeps_current_snapshot(monkeypatch):
+    import gcs_to_mongo
+    from snapshot_meta import list_collection_sets, read_snapshot_metadata
+
+    client = mongomock.MongoClient()
+    db = client["test_db"]
+    monkeypatch.setattr(gcs_to_mongo, "MongoClient", lambda *args, **kwargs: client)
+    gcs_to_mongo.insert_collections_into_mongo({"customers": [{"id": "cus_1"}, {"id": "cus_2"}]}, "test_db")
+    before = read_snapshot_metadata(db)
+
+    def failing_dump():
+        yield "customers", [{"id": "cus_3"}]
+        raise ValueError("truncated dump")
+
+    with pytest.raises(ValueError):
+        gcs_to_mongo.insert_collections_into_mongo(failing_dump(), "test_db")
+
+    # Le jeu courant et _meta sont intacts, le nouveau jeu (v2) est supprimé
+    assert read_snapshot_metadata(db) == before
+    assert [entry["_id"] for entry in list_collection_sets(db)] == [before["collection_set"]]
+    assert sorted(doc["id"] for doc in db[before["collections"]["customers"]].find()) == ["cus_1", "cus_2"]
+    assert not [name for name in db.list_collection_names() if name.startswith("customers__")
+                and name != before["collections"]["customers"]]
+
+
+def test_snapshot_load_seeds_delta_hashes_of_its_set(monkeypatch):
+    import gcs_to_mongo
+    from mongo_delta import DELTA_HASHES_COLLECTION, load_known_hashes
+    from snapshot_meta import read_snapshot_metadata
+
+    client = mongomock.MongoClient()
+    db = client["test_db"]
+    monkeypatch.setattr(gcs_to_mongo, "MongoClient", lambda *args, **kwargs: client)
+    gcs_to_mongo.insert_collections_into_mongo({"customers": [{"id": "cus_1"}, {"id": "cus_2"}]}, "test_db")
+
+    collections = read_snapshot_metadata(db)["collections"]
+    known = load_known_hashes(db, "customers", collections["customers"], collections[DELTA_HASHES_COLLECTION])
+
+    # Le premier delta ne réécrira que les documents modifiés
+    assert set(known) == {"cus_1", "cus_2"} and None not in known.values()
+    assert DELTA_HASHES_COLLECTION not in read_snapshot_metadata(db)["counts"]
@@ -0,0 +1,34 @@
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+from scripts.mongo_bulk import bulk_load
+
+
+@pytest.fixture
+def mock_db():
+    return mongomock.MongoClient()["test_db"]
+
+
+def test_bulk_load_chunks_and_reports(mock_db):
+    batches = [
+        ("charges", [{"id": f"ch_{i}"} for i in range(250)]),
+        ("customers", [{"id": "cus_1"}]),
+        ("charges", [{"id": "ch_last"}]),
+    ]
+    prepared = []
+
+    stats = bulk_load(mock_db, iter(batches), chunk_size=100, workers=3, prepare=prepared.append)
+
+    assert prepared == ["charges", "customers"]
+    assert mock_db["charges"].count_documents({}) == 251
+    assert stats["charges"].docs == 251
+    assert stats["charges"].chunks == 4
+    assert stats["customers"].as_dict()["docs"] == 1
+
+
+def test_bulk_load_surfaces_insert_errors(mock_db):
+    mock_db["charges"].create_index("id", unique=True)
+    batches = [("charges", [{"id": "ch_1"}, {"id": "ch_1"}])]
+
+    with pytest.raises(BulkWriteError):
+        bulk_load(mock_db, iter(batches), chunk_size=10, workers=2)
@@ -0,0 +1,40 @@
+from scripts.mongo_delta import DELTA_HASHES_COLLECTION, CollectionDeltaStats, content_hash, diff_records, hash_batches
+
+
+def test_content_hash_ignores_key_order_and_object_id():
+    assert content_hash({"id": "cus_1", "balance": 1}) == content_hash({"balance": 1, "id": "cus_1", "_id": "x"})
+    assert content_hash({"id": "cus_1", "balance": 1}) != content_hash({"id": "cus_1", "balance": 2})
+
+
+def test_diff_records_keeps_only_new_or_changed_docs():
+    known = {
+        "cus_1": content_hash({"id": "cus_1", "balance": 1}),
+        "cus_2": content_hash({"id": "cus_2", "balance": 2}),
+        "cus_3": None,  # chargé en mode snapshot, empreinte inconnue
+    }
+    records = [
+        {"id": "cus_1", "balance": 1},
+        {"id": "cus_2", "balance": 200},
+        {"id": "cus_3", "balance": 3},
+        {"id": "cus_4", "balance": 4},
+        {"balance": 0},
+    ]
+    seen, entry = set(), CollectionDeltaStats("customers")
+
+    changed = [doc_id for doc_id, _, _ in diff_records(records, known, seen, entry)]
+
+    assert changed == ["cus_2", "cus_3", "cus_4"]
+    assert seen == {"cus_1", "cus_2", "cus_3", "cus_4"}
+    assert (entry.upserts, entry.unchanged, entry.skipped) == (3, 1, 1)
+
+
+def test_snapshot_batches_carry_their_hashes():
+    records = [{"id": "cus_1", "balance": 1}, {"balance": 0}]
+
+    batches = list(hash_batches(iter([("customers", records)])))
+
+    assert batches == [
+        ("customers", records),
+        (DELTA_HASHES_COLLECTION, [{"_id": "customers/cus_1", "collection": "customers", "id": "cus_1",
+                                    "hash": content_hash(records[0])}]),
+    ]
@@ -0,0 +1,23 @@
+import mongomock
+
+from scripts.mongo_indexes import (
+    INDEX_SPEC_VERSION, INDEXES, apply_indexes, check_indexes, missing_indexes, record_index_version,
+)
+
+
+def test_applied_spec_is_complete_until_an_index_is_dropped():
+    db = mongomock.MongoClient()["test_db"]
+    collections = {"charges": "charges__v2"}
+    for collection_name in INDEXES:
+        apply_indexes(db, collection_name, collections.get(collection_name))
+    record_index_version(db)
+
+    assert missing_indexes(db, collections) == {}
+    assert check_indexes(db, collections) == {
+        "expected_version": INDEX_SPEC_VERSION, "applied_version": INDEX_SPEC_VERSION, "missing": {}, "ok": True,
+    }
+
+    db["charges__v2"].drop_index("customer_created")
+
+    assert missing_indexes(db, collections) == {"charges": ["customer_created"]}
+    assert check_indexes(db, collections)["ok"] is False
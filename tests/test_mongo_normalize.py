@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+
+from bson.int64 import Int64
+
+from scripts.mongo_normalize import CollectionNormalizeStats, normalize_batch, normalize_batches
+
+
+def test_schema_converts_timestamps_amounts_and_booleans():
+    stats = CollectionNormalizeStats("charges")
+    doc = {"id": "ch_1", "created": 1704067200, "amount": "1250", "amount_refunded": 0, "paid": "true"}
+
+    normalize_batch("charges", [doc], stats)
+
+    assert doc["created"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert doc["amount"] == 1250 and isinstance(doc["amount"], Int64)
+    assert isinstance(doc["amount_refunded"], Int64)
+    assert doc["paid"] is True
+    assert stats.converted == 3
+
+
+def test_out_of_range_epochs_are_invalid_not_fatal():
+    stats = CollectionNormalizeStats("charges")
+    # Millisecondes, flottant démesuré (nombre et chaîne)
+    docs = [
+        {"id": "ch_ms", "created": 1704067200000},
+        {"id": "ch_big", "created": 1e20},
+        {"id": "ch_str", "created": "1e20"},
+    ]
+
+    normalize_batch("charges", docs, stats)
+
+    assert [doc["created"] for doc in docs] == [None, None, None]
+    assert [doc["created_raw"] for doc in docs] == [1704067200000, 1e20, "1e20"]
+    assert stats.invalid == {"created": 3}
+
+
+def test_nested_paths_statuses_and_invalid_values():
+    stats = CollectionNormalizeStats("subscriptions")
+    doc = {
+        "status": "Past Due",
+        "start_date": "2024-01-01T00:00:00Z",
+        "canceled_at": "not a date",
+        "items": {"data": [{"plan": {"amount": 900.0}}, {"plan": {"amount": None}}]},
+    }
+    other = {"status": "exploded"}
+
+    normalize_batch("subscriptions", [doc, other], stats)
+
+    assert doc["status"] == "past_due"
+    assert doc["start_date"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert (doc["canceled_at"], doc["canceled_at_raw"]) == (None, "not a date")
+    assert stats.invalid == {"canceled_at": 1}
+    assert [item["plan"]["amount"] for item in doc["items"]["data"]] == [900, None]
+    assert (other["status"], other["status_raw"]) == ("unknown", "exploded")
+    assert stats.unknown_statuses == 1
+
+
+def test_pruning_is_optional_and_batches_keep_their_order():
+    stats = {}
+    batches = [
+        ("invoices", [{"id": "in_1", "lines": {"data": [1, 2]}, "status": "paid"}]),
+        ("customers", [{"id": "cus_1", "sources": {"data": []}}]),
+    ]
+
+    normalized = list(normalize_batches(batches, stats, prune=True))
+
+    assert [name for name, _ in normalized] == ["invoices", "customers"]
+    assert "lines" not in normalized[0][1][0] and "sources" not in normalized[1][1][0]
+    assert stats["invoices"].pruned == 1 and stats["customers"].docs == 1
+
+
+def test_customers_get_lowercase_search_keys():
+    stats = CollectionNormalizeStats("customers")
+    doc = {"id": "cus_1", "name": "Zoë  Martin", "email": "Zoe.Martin@Example.com"}
+
+    normalize_batch("customers", [doc], stats)
+
+    assert doc["search_keys"] == ["martin", "zoe.martin@example.com", "zoë", "zoë martin"]
@@ -0,0 +1,76 @@
+import pytest
+from scripts import nosql_io
+from scripts.nosql_io import OLAP_TABLES, find_latest_olap_folder, record_olap_output
+from scripts.storage_backend import LocalBackend
+
+OLAP_CSV_FILES = [f"{table}.csv" for table in OLAP_TABLES]
+
+
+class CountingBackend(LocalBackend):
+    """Backend local qui note les listings, pour vérifier que le manifest les évite."""
+
+    def __init__(self, root, names=()):
+        super().__init__(root)
+        self.list_calls = []
+        for name in names:
+            self.upload(name, b"")
+
+    def list(self, prefix, delimiter=None):
+        self.list_calls.append((prefix, delimiter))
+        return super().list(prefix, delimiter)
+
+
+def test_olap_lookup_falls_back_to_folder_listing(tmp_path):
+    backend = CountingBackend(tmp_path, [f"olap_outputs/2024010{i}/{f}" for i in range(1, 4) for f in OLAP_CSV_FILES])
+
+    assert find_latest_olap_folder(backend) == "20240103"
+    assert backend.list_calls == [("olap_outputs/", "/")]
+
+
+def test_olap_manifest_switches_only_when_run_is_complete(tmp_path):
+    backend = CountingBackend(tmp_path)
+    for filename in OLAP_CSV_FILES:
+        record_olap_output(backend, "20240101", filename)
+    record_olap_output(backend, "20240102", OLAP_CSV_FILES[0])
+
+    # Run 20240102 incomplet : le pointeur reste sur 20240101, sans aucun listing
+    assert find_latest_olap_folder(backend) == "20240101"
+    assert backend.list_calls == []
+
+    for filename in OLAP_CSV_FILES[1:]:
+        record_olap_output(backend, "20240102", filename)
+    assert find_latest_olap_folder(backend) == "20240102"
+
+
+def test_olap_manifest_without_complete_run_never_lists(tmp_path, monkeypatch):
+    # Un vieux dossier complet et le premier run suivi par le manifest, encore incomplet
+    backend = CountingBackend(tmp_path, [f"olap_outputs/20240101/{f}" for f in OLAP_CSV_FILES])
+    record_olap_output(backend, "20240102", OLAP_CSV_FILES[0])
+
+    assert find_latest_olap_folder(backend) is None
+    assert backend.list_calls == []
+    monkeypatch.setattr(nosql_io, "get_storage_backend", lambda bucket_name=None: backend)
+    with pytest.raises(FileNotFoundError):
+        nosql_io.get_latest_olap_gcs_path(None)
+
+
+def test_dump_lookup_uses_manifest(tmp_path, monkeypatch):
+    backend = CountingBackend(tmp_path, ["dump/db_dump_prod_1.json", "dump/db_dump_prod_2.json"])
+    monkeypatch.setattr(nosql_io, "get_storage_backend", lambda bucket_name=None: backend)
+
+    nosql_io.publish_latest_dump("dump/db_dump_prod_1.json")
+    backend.list_calls.clear()
+
+    assert nosql_io.get_latest_oltp_dump_blob().name == "dump/db_dump_prod_1.json"
+    assert backend.list_calls == []
+
+    # Dump pointé supprimé : repli sur le listing
+    (tmp_path / "dump/db_dump_prod_1.json").unlink()
+    assert nosql_io.get_latest_oltp_dump_blob().name == "dump/db_dump_prod_2.json"
+
+
+def test_dump_lookup_without_any_dump(tmp_path, monkeypatch):
+    monkeypatch.setattr(nosql_io, "get_storage_backend", lambda bucket_name=None: CountingBackend(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        nosql_io.get_latest_oltp_dump_blob()
@@ -0,0 +1,50 @@
+import io
+
+import pandas as pd
+from scripts import nosql_io
+from scripts.nosql_io import OLAP_TABLES, load_olap_folder, read_olap_csv, read_olap_parquet, write_olap_parquet
+from scripts.storage_backend import LocalBackend
+
+
+CHARGES_CSV = (
+    b"id,customer_id,amount,status,paid,created,extra\n"
+    b"ch_1,cus_1,1200,succeeded,True,1718000000,a\n"
+    b"ch_2,,,failed,False,1718003600,b\n"
+)
+
+
+def test_read_olap_csv_applies_declared_types():
+    df = read_olap_csv(CHARGES_CSV, "dim_charges")
+
+    assert df["id"].dtype == "string[pyarrow]"
+    assert df["status"].dtype == "category"
+    assert df["amount"].dtype == "Int64" and df["amount"].isna().tolist() == [False, True]
+    assert df["paid"].dtype == "boolean"
+    assert df["created"].iloc[0] == pd.Timestamp("2024-06-10 06:13:20", tz="UTC")
+    # Colonne non déclarée : type inféré conservé
+    assert df["extra"].tolist() == ["a", "b"]
+
+
+def test_load_olap_folder_loads_every_table(tmp_path):
+    backend = LocalBackend(tmp_path)
+    for table in OLAP_TABLES:
+        backend.upload(f"olap_outputs/20240101/{table}.csv", CHARGES_CSV)
+    result, timings = load_olap_folder(backend, "olap_outputs/20240101/", workers=4)
+
+    assert sorted(result) == sorted(OLAP_TABLES)
+    assert all(t["rows"] == 2 and t["memory_bytes"] > 0 for t in timings)
+
+
+def test_parquet_round_trip_keeps_types_and_selects_columns(monkeypatch):
+    monkeypatch.setattr(nosql_io, "PARQUET_ROW_GROUP_SIZE", 1)
+    source = pd.read_csv(io.BytesIO(CHARGES_CSV))
+    sink = io.BytesIO()
+    write_olap_parquet(source, "dim_charges", sink)
+
+    df = read_olap_parquet(sink.getvalue(), "dim_charges")
+    expected = read_olap_csv(CHARGES_CSV, "dim_charges")
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+    # write_olap_parquet ne modifie pas le DataFrame de l'appelant
+    assert source["amount"].dtype == "float64"
+
+    assert list(read_olap_parquet(sink.getvalue(), "dim_charges", columns=["id", "amount"]).columns) == ["id", "amount"]
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+from scripts.nosql_io import iter_json_collections
+
+
+DUMP = {
+    "customers": [{"id": f"cus_{i}", "balance": i * 100, "name": "Zoë, \"VIP\" ]"} for i in range(7)],
+    "empty": [],
+    "meta": {"exported_at": 1718000000},
+    "charges": [{"id": "ch_1", "amount": 123456789}, 42, None],
+}
+
+
+def collect(batches):
+    result = {}
+    for name, batch in batches:
+        result.setdefault(name, []).extend(batch)
+    return result
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, 1 << 20])
+def test_stream_matches_json_load(chunk_size):
+    raw = json.dumps(DUMP, indent=2, ensure_ascii=False)
+    result = collect(iter_json_collections(io.StringIO(raw), batch_size=3, chunk_size=chunk_size))
+
+    assert result == {"customers": DUMP["customers"], "charges": DUMP["charges"]}
+
+
+def test_stream_yields_bounded_batches():
+    raw = json.dumps(DUMP)
+    sizes = [len(batch) for name, batch in iter_json_collections(io.StringIO(raw), batch_size=3, chunk_size=5)
+             if name == "customers"]
+
+    assert sizes == [3, 3, 1]
+
+
+def test_stream_rejects_truncated_dump():
+    raw = json.dumps(DUMP)[:-10]
+    with pytest.raises(ValueError):
+        list(iter_json_collections(io.StringIO(raw), batch_size=3, chunk_size=4))
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+from scripts.snapshot_meta import (
+    SNAPSHOT_SETS_COLLECTION, activate_collection_set, evict_collection_sets, find_collection_set,
+    read_snapshot_metadata, reserve_collection_set, versioned_name, write_snapshot_metadata,
+)
+
+
+def load_set(db, customers: int) -> str:
+    collection_set = reserve_collection_set(db)
+    physical = versioned_name("customers", collection_set)
+    db[physical].insert_many([{"id": f"cus_{i}"} for i in range(customers)])
+    write_snapshot_metadata(
+        db, {"name": f"dump_{collection_set}.json"}, {"customers": customers}, "snapshot",
+        collection_set=collection_set, collections={"customers": physical},
+    )
+    return collection_set
+
+
+def test_each_load_is_a_new_set_and_rollback_flips_the_pointer():
+    db = mongomock.MongoClient()["test_db"]
+    first, second = load_set(db, 2), load_set(db, 3)
+
+    assert (first, second) == ("v1", "v2")
+    assert read_snapshot_metadata(db)["collections"] == {"customers": "customers__v2"}
+
+    activate_collection_set(db, first)
+
+    meta = read_snapshot_metadata(db)
+    assert meta["collection_set"] == "v1"
+    assert db[meta["collections"]["customers"]].count_documents({}) == 2
+    # Rollback sans recopie : le jeu v2 est toujours là pour revenir en avant
+    assert db["customers__v2"].count_documents({}) == 3
+
+
+def test_retention_drops_oldest_sets_but_keeps_current():
+    db = mongomock.MongoClient()["test_db"]
+    for customers in (1, 2, 3, 4):
+        load_set(db, customers)
+    activate_collection_set(db, "v1")
+
+    evicted = evict_collection_sets(db, keep=2)
+
+    assert evicted == ["v2"]
+    assert {entry["_id"] for entry in db[SNAPSHOT_SETS_COLLECTION].find()} == {"v1", "v3", "v4"}
+    assert "customers__v2" not in db.list_collection_names()
+    assert "customers__v1" in db.list_collection_names()
+
+
+def test_as_of_picks_last_set_loaded_before_date():
+    db = mongomock.MongoClient()["test_db"]
+    load_set(db, 1)
+    load_set(db, 2)
+    db[SNAPSHOT_SETS_COLLECTION].update_one({"_id": "v1"}, {"$set": {"loaded_at": datetime(2025, 1, 1)}})
+    db[SNAPSHOT_SETS_COLLECTION].update_one({"_id": "v2"}, {"$set": {"loaded_at": datetime(2025, 2, 1)}})
+
+    assert find_collection_set(db, as_of=datetime(2025, 1, 15, tzinfo=timezone.utc))["_id"] == "v1"
+    assert find_collection_set(db, as_of=datetime.now(timezone.utc))["_id"] == "v2"
+    assert find_collection_set(db, as_of=datetime(2025, 1, 1) - timedelta(days=1)) is None
+    assert find_collection_set(db, "v9") is None
+
+
+def test_unversioned_snapshot_becomes_set_v0():
+    db = mongomock.MongoClient()["test_db"]
+    db.customers.insert_one({"id": "cus_legacy"})
+    write_snapshot_metadata(db, {"name": "old.json"}, {"customers": 1}, "snapshot")
+
+    assert load_set(db, 2) == "v1"
+
+    activate_collection_set(db, "v0")
+    assert read_snapshot_metadata(db)["collections"] == {"customers": "customers"}
@@ -0,0 +1,39 @@
+import io
+import json
+
+from scripts.nosql_io import iter_json_collections
+from scripts.synth_dump import COLLECTIONS, generate_dump, write_dump
+
+
+def render(**kwargs) -> str:
+    fp = io.StringIO()
+    write_dump(fp, **kwargs)
+    return fp.getvalue()
+
+
+def test_dump_is_deterministic_and_seed_dependent():
+    assert render(seed=1, customers=20, subscriptions=1.5, charges=3) == render(seed=1, customers=20, subscriptions=1.5, charges=3)
+    assert render(seed=1, customers=20, subscriptions=1.5, charges=3) != render(seed=2, customers=20, subscriptions=1.5, charges=3)
+
+
+def test_dump_has_the_shapes_the_api_reads(tmp_path):
+    result = generate_dump(tmp_path, seed=7, customers=30, subscriptions=1.2, charges=4)
+    with open(result["path"], encoding="utf-8") as f:
+        dump = json.load(f)
+
+    assert list(dump) == COLLECTIONS
+    assert {name: len(docs) for name, docs in dump.items()} == result["counts"]
+    assert result["counts"]["customers"] == 30
+    assert len({doc["id"] for doc in dump["charges"]}) == len(dump["charges"])
+
+    plan = dump["subscriptions"][0]["items"]["data"][0]["plan"]
+    assert {"amount", "interval"} <= set(plan)
+    assert dump["payment_intents"][0]["payment_method_options"]["card"]["request_three_d_secure"] in {"any", "automatic"}
+    # Charges et payment_intents décrivent les mêmes paiements
+    assert [c["payment_intent"] for c in dump["charges"]] == [p["id"] for p in dump["payment_intents"]]
+
+    # Le dump publié est celui que le loader choisit, et il se lit en streaming
+    assert json.loads((tmp_path / "dump/_LATEST.json").read_text())["blob"] == result["name"]
+    with open(result["path"], encoding="utf-8") as f:
+        streamed = sum(len(batch) for _, batch in iter_json_collections(f, batch_size=50))
+    assert streamed == sum(result["counts"].values())